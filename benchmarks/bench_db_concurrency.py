@@ -0,0 +1,80 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of concurrent writers on one db, for each connection profile.
+
+Project: Hypermaq
+
+Mimics the station: several processes write queue rows (queue.py from cron), log rows (db_Handler)
+and measurement rows (worker.py) to the same db at the same time, while another process polls the queue.
+Reports, per connection profile, the writes/s, the slowest single write and the number of failed writes
+(a failed write is what shows up as 'database is locked' on the station).
+
+Usage: python benchmarks/bench_db_concurrency.py [writes per process] [processes per kind]
+"""
+import os
+import sys
+import random
+import shutil
+import tempfile
+import time
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+
+
+def writer(db_file, profile, kind, n_writes, results):
+    db = dbc.connection(db_file, profile = profile, timeout = 1)  # short timeout to make lock contention visible
+    spectrum = [random.randint(0, 65535) for __ in range(dbc.spectrum_pixels)]
+    failed = 0
+    slowest = 0
+    for i in range(n_writes):
+        start = time.time()
+        if kind == 'queue':
+            reply = db.add_to_queue('measure', 2, '')
+        elif kind == 'log':
+            reply = db.add_log('benchmark log line {}'.format(i), 'bench', 'debug')
+        elif kind == 'meas':
+            reply = db.add_meas_many([{'valid': 'y', 'scan_rep': r, 'data': spectrum} for r in range(1, 4)])
+        else:  # reader, polls the queue like the worker does
+            reply = db.get_next_task()
+        slowest = max(slowest, time.time() - start)
+        if not reply[0]:
+            failed += 1
+    db.close()
+    results.put((kind, failed, slowest))
+
+
+def bench_profile(directory, profile, n_writes, n_procs):
+    db_file = os.path.join(directory, 'bench_{}.db'.format(profile))
+    dbc.create_db(db_file, id=('logs', 'queue', 'measurements', 'settings'))
+    results = multiprocessing.Queue()
+    kinds = ['queue', 'log', 'meas'] * n_procs + ['read']
+    procs = [multiprocessing.Process(target = writer, args = (db_file, profile, k, n_writes, results)) for k in kinds]
+    start = time.time()
+    for p in procs:
+        p.start()
+    replies = [results.get() for __ in procs]
+    for p in procs:
+        p.join()
+    duration = time.time() - start
+
+    n_write_procs = len(kinds) - 1
+    failed = sum(r[1] for r in replies if r[0] != 'read')
+    slowest = max(r[2] for r in replies if r[0] != 'read')
+    print('{:8s}: {:8.1f} writes/s, slowest write {:6.3f} s, {} of {} writes failed'.format(
+        profile, n_writes * n_write_procs / duration, slowest, failed, n_writes * n_write_procs))
+
+
+def main(n_writes = 200, n_procs = 2):
+    directory = tempfile.mkdtemp()
+    try:
+        print('{} processes writing {} rows each, plus one reader'.format(3 * n_procs, n_writes))
+        for profile in sorted(dbc.connection_profiles):
+            bench_profile(directory, profile, n_writes, n_procs)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:3]])
@@ -0,0 +1,110 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of a measurement cycle with the head moves in series and pipelined on a device_worker thread.
+
+Project: Hypermaq
+
+Follows the scan loops of measurements2.measurement (serial loop and _run_protocol_pipelined) with:
+- the pan/tilt head: flir_ptu_d48e against ptu_simulator, moving in real time with the speeds set by initialize()
+- storing: add_meas_many of the repetitions (256 values each) in a temporary db
+- preparing a scan and measuring: fixed times standing in for suncalc and the RAMSES measurement
+  (measurements2 itself needs the station hardware and Pysolar)
+Reports the cycle time of both loops.
+
+flir_ptu_d48e is Python 2 code, run with python2.
+Usage: python2 benchmarks/bench_head_pipeline.py [number of scans]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'worker_libs'))  # worker_libs/__init__ needs the station hardware
+import dbc  # noqa: E402
+import flir_ptu_d48e  # noqa: E402
+from device_worker import device_worker  # noqa: E402
+from ptu_simulator import ptu_simulator  # noqa: E402
+
+PREPARE_TIME = 0.02  # s, sun position, keepout and zenith checks
+MEASURE_TIME = 0.3  # s, RAMSES measurement of all repetitions
+REPEAT = 3
+
+
+def prepare(scan):
+    time.sleep(PREPARE_TIME)
+    return {'cycle_scan': '{:02d}'.format(scan['id']), 'prot_azimuth': scan['azimuth'], 'scan_error': [], 'valid': 'y'}
+
+
+def measure(meas_scan, rnd):
+    time.sleep(MEASURE_TIME)
+    rows = []
+    for rep in range(REPEAT):
+        row = dict(meas_scan)
+        row.update({'scan_rep': rep + 1, 'data': [rnd.randint(0, 65535) for __ in range(256)]})
+        rows.append(row)
+    return rows
+
+
+def head_step(head, scan):
+    head.show_parameters()
+    return head.move_position(scan['heading'], scan['elevation'])
+
+
+def serial_cycle(head, db, protocol, rnd):
+    for scan in protocol:
+        meas_scan = prepare(scan)
+        assert head_step(head, scan) == 'OK'
+        db.add_meas_many(measure(meas_scan, rnd))
+
+
+def pipelined_cycle(head, db, protocol, rnd):
+    head_thread = device_worker(name='pan_tilt_head')
+    pending = []
+    try:
+        prepared = prepare(protocol[0])
+        for index, scan in enumerate(protocol):
+            meas_scan = prepared
+            step = head_thread.submit(head_step, head, scan)
+            rows, pending = pending, []
+            db.add_meas_many(rows)  # previous scan, while the head moves
+            if index + 1 < len(protocol):
+                prepared = prepare(protocol[index + 1])
+            assert step.result() == 'OK'
+            pending = measure(meas_scan, rnd)
+    finally:
+        head_thread.close()
+        db.add_meas_many(pending)
+
+
+def main(n_scans=12):
+    rnd = random.Random(5)
+    simulator = ptu_simulator()
+    simulator.start()
+    head = flir_ptu_d48e.pthead(ip="127.0.0.1", port=simulator.port)
+    assert head.setup_socket() and head.initialize(reset=False) == "OK"
+    protocol = [{'id': i + 1, 'azimuth': a, 'heading': (200 + a) % 360, 'elevation': rnd.choice((-60, -40, 20))}
+                for i, a in enumerate(rnd.choice((-135, -90, 90, 135)) for __ in range(n_scans))]
+
+    directory = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(directory, 'pipeline.db')
+        dbc.create_db(db_file, id=('measurements',), spectrum_storage='blob')
+        db = dbc.connection(db_file)
+        for name, cycle in (('serial', serial_cycle), ('pipelined', pipelined_cycle)):
+            head.move_position(0, 0)
+            start = time.time()
+            cycle(head, db, protocol, rnd)
+            print('{:10s}: {:6.2f} s for {} scans'.format(name, time.time() - start, n_scans))
+        assert db.execute('select count(*) from measurements').fetchone()[0] == 2 * REPEAT * n_scans
+        db.close()
+    finally:
+        head.s.close()
+        simulator.stop()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
@@ -0,0 +1,75 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the head telemetry: an O query before every scan against the cached telemetry (pthead.get_telemetry).
+
+Project: Hypermaq
+
+Against ptu_simulator with its moves sped up (time_scale) to leave the command overhead, per scan:
+- query: show_parameters() and move_position(), as measurements did before the telemetry cache
+- cached: move_position() and get_telemetry(), expired telemetry is queried during the move
+Reports the head overhead per scan and the number of O queries for a cycle of scans, and the head_telemetry
+rows stored for the cycle (dbc.add_head_telemetry, in a temporary db without the table).
+
+flir_ptu_d48e is Python 2 code, run with python2.
+Usage: python2 benchmarks/bench_head_telemetry.py [number of scans] [telemetry_ttl in seconds] [time_scale]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+import flir_ptu_d48e  # noqa: E402
+from ptu_simulator import ptu_simulator  # noqa: E402
+
+
+def query_step(head, heading, elevation):
+    head.show_parameters()
+    return head.move_position(heading, elevation)
+
+
+def cached_step(head, heading, elevation):
+    ret = head.move_position(heading, elevation)
+    head.get_telemetry()
+    return ret
+
+
+def main(n_scans=40, ttl=0.1, time_scale=1e-6):
+    simulator = ptu_simulator(time_scale=time_scale)
+    simulator.start()
+    head = flir_ptu_d48e.pthead(ip='127.0.0.1', port=simulator.port)
+    head.telemetry_ttl = ttl  # short, as the cycle takes milliseconds here instead of minutes
+    assert head.setup_socket() and head.initialize(reset=False) == 'OK'
+    targets = [((37 * i) % 170, -40 + (i % 5) * 10) for i in range(n_scans)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        for name, step in (('query', query_step), ('cached', cached_step)):
+            assert head.move_position(0, 0) == 'OK'
+            head.pop_telemetry_samples()
+            start = time.time()
+            for heading, elevation in targets:
+                assert step(head, heading, elevation) == 'OK'
+            per_scan = (time.time() - start) / n_scans
+            samples = head.pop_telemetry_samples()
+            print('{:7s}: {:5.1f} ms head overhead per scan, {:3d} O queries for {} scans in {:.2f} s (telemetry_ttl {} s)'.format(
+                name, 1000 * per_scan, len(samples), n_scans, per_scan * n_scans, ttl))
+
+        db_file = os.path.join(directory, 'telemetry.db')
+        dbc.create_db(db_file, id=('logs',))
+        db = dbc.connection(db_file)
+        assert db.add_head_telemetry('MSO_000001_20260101_120000', samples) == (True, None)
+        rows = db.execute('select timestamp, voltage, temp_head, temp_pan, temp_tilt from head_telemetry').fetchall()
+        assert len(rows) == len(samples)
+        print('head_telemetry: {} rows stored for the cycle, eg {}'.format(len(rows), rows[0]))
+        db.close()
+    finally:
+        head.s.close()
+        simulator.stop()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[f(i) for f, i in zip((int, float, float), sys.argv[1:4])])
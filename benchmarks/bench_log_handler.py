@@ -0,0 +1,57 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the time a log call costs the caller, for db_Handler and async_db_Handler.
+
+Project: Hypermaq
+
+Logs the same DEBUG lines through a logger with db_Handler (INSERT + commit per record)
+and with async_db_Handler (queued, written in batches by a background thread),
+and reports the time per log call and the time to flush the remaining records.
+
+Usage: python benchmarks/bench_log_handler.py [number of records]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'worker_libs'))  # worker_libs/__init__ needs the station hardware
+import dbc  # noqa: E402
+from log_handlers import db_Handler, async_db_Handler  # noqa: E402
+
+
+def bench_handler(name, handler, n_records):
+    log = logging.getLogger('bench_{}'.format(name))
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    log.addHandler(handler)
+    start = time.time()
+    for i in range(n_records):
+        log.debug('head at position {}, sample {} of {}'.format(i, i % 10, 10))
+    emit_time = time.time() - start
+    start = time.time()
+    handler.flush()
+    flush_time = time.time() - start
+    handler.close()
+    log.removeHandler(handler)
+    print('{:16s}: {:8.1f} us per log call, {:6.3f} s to flush'.format(name, 1e6 * emit_time / n_records, flush_time))
+
+
+def main(n_records = 5000):
+    directory = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(directory, 'bench.db')
+        dbc.create_db(db_file, id=('logs',))
+        db = dbc.connection(db_file)
+        bench_handler('db_Handler', db_Handler(db), n_records)
+        bench_handler('async_db_Handler', async_db_Handler(db_file), n_records)
+        print('rows in logs table: {} (expected {})'.format(db.execute('select count(*) from logs').fetchone()[0], 2 * n_records))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
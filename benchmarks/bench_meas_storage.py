@@ -0,0 +1,114 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the measurements table storage modes.
+
+Project: Hypermaq
+
+Inserts the same measurement rows with connection.add_meas in a db using 'columns' storage (256 val_NNN columns)
+and one using 'blob' storage (packed uint16 spectrum), and reports inserted rows/s and db bytes/row for both.
+The rows are then inserted again with connection.add_meas_many, in batches of 10 (the repetitions of one scan).
+Times a plain 'select * from measurements' export of both dbs: with blob storage, the values come from the
+compatibility view, which extracts each value with instr().
+Also times the conversion of the 'columns' db with dbc.convert_spectrum_storage.
+
+Usage: python benchmarks/bench_meas_storage.py [number of rows]
+"""
+import os
+import sys
+import random
+import shutil
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+
+
+def sample_meas(i):
+    """Returns a meas_dict like the ones stored by the measurement cycle."""
+    return {'timestamp': '2020-06-01 12:00:00', 'valid': 'y', 'setup_error': [], 'cycle_id': 'MSO_000001_20200601_120000',
+            'gnss_acquired': '2020-06-01 05:00:00', 'gnss_qual': 1, 'gnss_lat': 51.2, 'gnss_lon': 2.9, 'batt_voltage': 12.6,
+            'head_voltage': '12.1', 'head_temp_hpt': '25.1/26.0/26.2', 'cycle_scan': '01', 'prot_sensor': 'l',
+            'prot_zenith': 40, 'prot_azimuth': 135, 'sun_heading': 180.5, 'sun_elevation': 40.1, 'scan_heading': 315.5,
+            'scan_error': [], 'scan_rep': i % 10 + 1, 'rep_error': '', 'rep_unix': 1591012800.0 + i, 'rep_serial': 'SAM_8166',
+            'data': [random.randint(0, 65535) for __ in range(dbc.spectrum_pixels)]}
+
+
+def db_size(db_file):
+    """Returns the size of the db file and its journal, after moving the WAL content into the db file."""
+    db = dbc.connection(db_file)
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    db.close()
+    size = os.path.getsize(db_file)
+    for suffix in ('-wal', '-journal'):
+        if os.path.isfile(db_file + suffix):
+            size += os.path.getsize(db_file + suffix)
+    return size
+
+
+def bench_storage(directory, mode, rows, batch = 1):
+    db_file = os.path.join(directory, 'bench_{}_{}.db'.format(mode, batch))
+    dbc.create_db(db_file, id=('measurements',), spectrum_storage=mode)
+    empty_size = db_size(db_file)
+    db = dbc.connection(db_file)
+    start = time.time()
+    if batch == 1:
+        for r in rows:
+            db.add_meas(r)
+    else:
+        for i in range(0, len(rows), batch):
+            db.add_meas_many(rows[i:i + batch])
+    duration = time.time() - start
+    db.close()
+    bytes_per_row = float(db_size(db_file) - empty_size) / len(rows)
+    print('{:8s} (batch {:2d}): {:8.1f} rows/s, {:7.1f} bytes/row'.format(mode, batch, len(rows) / duration, bytes_per_row))
+    return db_file
+
+
+def select_all(db_file):
+    """Returns all rows of 'measurements', the connection is closed so it doesn't hold back WAL checkpoints."""
+    db = dbc.connection(db_file)
+    rows = db.execute('select * from measurements order by id').fetchall()
+    db.close()
+    return rows
+
+
+def bench_export(db_file, mode):
+    """Times select_all, as used by csv exports of 'measurements', and returns its rows."""
+    select_all(db_file)  # warm up the page cache
+    start = time.time()
+    rows = select_all(db_file)
+    duration = time.time() - start
+    print('{:8s} export : {:8.1f} rows/s (select * from measurements)'.format(mode, len(rows) / duration))
+    return rows
+
+
+def main(n_rows = 2000):
+    random.seed(1)
+    rows = [sample_meas(i) for i in range(n_rows)]
+    directory = tempfile.mkdtemp()
+    try:
+        print('Inserting {} rows with connection.add_meas'.format(n_rows))
+        columns_db = bench_storage(directory, 'columns', rows)
+        blob_db = bench_storage(directory, 'blob', rows)
+        bench_storage(directory, 'columns', rows, batch = 10)
+        bench_storage(directory, 'blob', rows, batch = 10)
+
+        # both dbs should expose the same values through 'measurements'
+        a = bench_export(columns_db, 'columns')
+        b = bench_export(blob_db, 'blob')
+        assert a == b, 'blob view does not match the columns table'
+
+        start = time.time()
+        result = dbc.convert_spectrum_storage(columns_db)
+        assert result[0], result[1]
+        print('convert: {} rows in {:.2f} s, db size after conversion {:.1f} bytes/row'.format(
+            result[1], time.time() - start, float(db_size(columns_db)) / n_rows))
+        c = select_all(columns_db)
+        assert a == c, 'converted db does not match the original'
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
@@ -0,0 +1,80 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the head time of a measurement cycle, against ptu_simulator: protocol order and scan_planner order.
+
+Project: Hypermaq
+
+Runs the head part of a cycle as measurements2 does it with flir_ptu_d48e: per scan show_parameters() and
+move_position(), then park(). The simulator moves with the speeds and accelerations set by initialize(),
+sped up by time_scale, so the simulated time of a cycle is the wall clock time / time_scale.
+Reports per order the simulated head time, the move time predicted by scan_planner, and the difference
+(command overhead and the position checks after each move).
+
+flir_ptu_d48e is Python 2 code, run with python2.
+Usage: python2 benchmarks/bench_ptu_protocol.py [number of scans] [time_scale]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'worker_libs'))  # worker_libs/__init__ needs the station hardware
+import flir_ptu_d48e  # noqa: E402
+import scan_planner  # noqa: E402
+from bench_scan_planner import OFFSETS, random_protocol  # noqa: E402
+from ptu_simulator import ptu_simulator  # noqa: E402
+
+
+def head_angles(protocol, sun_heading):
+    """Returns {scan id: (heading, elevation)} of the scans within the tilt range."""
+    angles = dict()
+    for scan in protocol:
+        elevation = scan['zenith'] - OFFSETS[scan['instrument']] - 90
+        heading = (sun_heading + scan['azimuth'] - 180) % 360
+        if -90 <= elevation <= 30 and not 174 < heading < 186:  # pan limits are +/- 174 degrees
+            angles[scan['id']] = (heading, elevation)
+    return angles
+
+
+def run_cycle(head, simulator, scans, angles):
+    """Returns the simulated time (s) of show_parameters and move_position for all scans, and park."""
+    start = time.time()
+    for scan in scans:
+        if scan['id'] not in angles:
+            continue
+        head.show_parameters()
+        assert head.move_position(*angles[scan['id']]) == 'OK'
+    assert head.park() == 'OK'
+    return (time.time() - start) / simulator.time_scale
+
+
+def main(n_scans=10, time_scale=0.25):
+    rnd = random.Random(7)
+    simulator = ptu_simulator(time_scale=time_scale)
+    simulator.start()
+    head = flir_ptu_d48e.pthead(ip='127.0.0.1', port=simulator.port)
+    assert head.setup_socket() and head.initialize(reset=False) == 'OK'
+    dynamics = head.get_axis_dynamics()
+
+    protocol = random_protocol(rnd, n_scans)
+    angles = head_angles(protocol, rnd.uniform(0, 360))
+    targets = dict((i, scan_planner.head_positions(h, e, head.pan_resolution, head.tilt_resolution)) for i, (h, e) in angles.items())
+    parked = (0, head.tilt_low_limit)
+    planned, __ = scan_planner.plan_scans(protocol, targets, parked, dynamics)
+
+    try:
+        for name, scans in (('protocol order', protocol), ('planned order', planned)):
+            assert head.park() == 'OK'
+            path = [targets[s['id']] for s in scans if s['id'] in targets] + [parked]
+            predicted = scan_planner.path_time(parked, path, dynamics)
+            simulated = run_cycle(head, simulator, scans, angles)
+            print('{:14s}: {:6.1f} s simulated head time, {:6.1f} s predicted moves, {:4.1f} s overhead ({} scans and park)'.format(
+                name, simulated, predicted, simulated - predicted, len(path) - 1))
+    finally:
+        head.s.close()
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main(*[f(i) for f, i in zip((int, float), sys.argv[1:3])])
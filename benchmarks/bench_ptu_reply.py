@@ -0,0 +1,67 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the pan/tilt head overhead per scan, against ptu_simulator on a local socket.
+
+Project: Hypermaq
+
+The simulator answers every command after a short processing delay, its moves are sped up (time_scale) to leave the command overhead.
+Per scan, measurements2 sends show_parameters() and move_position(), which is O, PP, TP, A, PP, TP.
+Reports the time per scan for flir_ptu_d48e, and for a previous version of it if given
+(eg git show <commit>:flir_ptu_d48e.py > old.py).
+
+flir_ptu_d48e is Python 2 code, run with python2.
+Usage: python2 benchmarks/bench_ptu_reply.py [number of scans] [old flir_ptu_d48e.py]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import flir_ptu_d48e  # noqa: E402
+from ptu_simulator import ptu_simulator  # noqa: E402
+
+
+def scan_time(module, simulator, n_scans):
+    module.ptu_ip, module.ptu_port = "127.0.0.1", simulator.port  # older versions have no ip/port arguments
+    head = module.pthead()
+    assert head.setup_socket()
+    assert head.initialize(reset=False) == "OK"
+    start = time.time()
+    for i in range(n_scans):
+        head.show_parameters()
+        assert head.move_position((37 * i) % 170, -40 + (i % 60)) == "OK"
+    per_scan = (time.time() - start) / n_scans
+    (getattr(head, "s", None) or module.s).close()  # the socket is a module global in older versions
+    return per_scan
+
+
+def main(n_scans=20, old_file=None):
+    simulator = ptu_simulator(time_scale=1e-6)
+    simulator.start()
+    versions = [("buffered reader", flir_ptu_d48e)]
+    if old_file is not None:
+        namespace = {"__name__": "old_flir_ptu_d48e"}
+        with open(old_file) as f:
+            exec(f.read(), namespace)
+        versions.insert(0, ("previous", _Namespace(namespace)))
+    for name, module in versions:
+        per_scan = scan_time(module, simulator, n_scans)
+        print("{:16s}: {:7.1f} ms head overhead per scan (6 commands, {:.0f} ms simulated head processing)".format(name, 1000 * per_scan, 6000 * simulator.delay))
+    simulator.stop()
+
+
+class _Namespace(object):
+    """Module like access to the globals of an exec'd file, so the benchmark can set ptu_ip/ptu_port and read s."""
+
+    def __init__(self, namespace):
+        self.__dict__["namespace"] = namespace
+
+    def __getattr__(self, name):
+        return self.namespace[name]
+
+    def __setattr__(self, name, value):
+        self.namespace[name] = value
+
+
+if __name__ == "__main__":
+    main(*[int(i) for i in sys.argv[1:2]] + sys.argv[2:3])
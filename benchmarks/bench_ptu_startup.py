@@ -0,0 +1,71 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the pan/tilt head start-up, full initialization against a warm start from the stored calibration.
+
+Project: Hypermaq
+
+Uses ptu_simulator, where an axis reset (RT, RP) runs the axis to its end stop and back at the reset speed,
+sped up by time_scale (1 is real time, the resets of a full initialization then take some 25 s).
+- cold: initialize() with axis resets, park(), then calibration() is stored (as measurements does in the settings table)
+- warm: a new pthead, initialize(calibration=...) skips the resets and the resolution/limit queries
+- the stored calibration is not used for another head (serial number), a head that moved after parking
+  or a head that lost power (it reports 0/0)
+
+flir_ptu_d48e is Python 2 code, run with python2.
+Usage: python2 benchmarks/bench_ptu_startup.py [time_scale]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import flir_ptu_d48e  # noqa: E402
+import ptu_simulator  # noqa: E402
+
+
+def start_head(simulator, calibration=None):
+    head = flir_ptu_d48e.pthead(ip="127.0.0.1", port=simulator.port)
+    assert head.setup_socket()
+    start = time.time()
+    assert head.initialize(calibration=calibration) == "OK"
+    return head, time.time() - start
+
+
+def main(time_scale=0.1):
+    simulator = ptu_simulator.ptu_simulator(time_scale=time_scale)
+    simulator.start()
+
+    head, cold = start_head(simulator)
+    assert not head.warm_started and head.park() == "OK"
+    calibration = head.calibration()
+    head.s.close()
+    print("cold start: {:6.2f} s (axis resets at time_scale {})".format(cold, time_scale))
+
+    head, warm = start_head(simulator, calibration)
+    assert head.warm_started and head.calibration() == calibration
+    head.s.close()
+    print("warm start: {:6.2f} s, stored calibration: {}".format(warm, calibration))
+
+    ptu_simulator.serial_number = "5010-0155"
+    head, other = start_head(simulator, calibration)
+    assert not head.warm_started
+    head.s.close()
+    ptu_simulator.serial_number = "5010-0154"
+    head, moved = start_head(simulator, calibration)
+    assert head.move_position(90, -30) == "OK" and head.calibration() != calibration
+    head.s.close()
+    head, moved = start_head(simulator, calibration)  # not parked after the move
+    assert not head.warm_started
+    head.s.close()
+    for axis in simulator.axes.values():
+        axis.start_position = axis.target = 0  # power cycle: with RD, the head reports 0/0 without an axis reset
+    head, power_cycled = start_head(simulator, calibration)
+    assert not head.warm_started
+    head.s.close()
+    print("other head: {:6.2f} s, moved head: {:6.2f} s, power cycled head: {:6.2f} s (full initialization)".format(
+        other, moved, power_cycled))
+    simulator.stop()
+
+
+if __name__ == "__main__":
+    main(*[float(i) for i in sys.argv[1:2]])
@@ -0,0 +1,84 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of picking the next task from a queue table with a long history.
+
+Project: Hypermaq
+
+Fills the queue table with historical (done) tasks, plus a few waiting ones, and times:
+- the old worker path: get_number_of_tasks + get_next_task (two selects per priority) without index
+- claim_next_task without and with the queue_runnable index
+- archive_tasks moving the history to queue_archive, and claim_next_task afterwards
+
+Usage: python benchmarks/bench_queue.py [number of historical tasks]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+
+REPEAT = 200  # number of timed picks
+
+
+def fill_queue(db_file, n_history, index):
+    dbc.create_db(db_file, id=('queue',))
+    db = dbc.connection(db_file)
+    if not index:
+        db.execute('drop index queue_runnable')
+    rows = [(1, 2, 0, 'measure', '', '-{} minutes'.format(30 * (n_history - i))) for i in range(n_history)]
+    db.executemany("insert into queue(done, priority, fails, action, options, timestamp) values (?, ?, ?, ?, ?, datetime('now', 'utc', ?))", rows)
+    db.commit()
+    return db
+
+
+def add_waiting(db):
+    for i in range(REPEAT):
+        db.add_to_queue('measure', 2 if i % 4 else 1, '')
+
+
+def time_old_path(db):
+    start = time.time()
+    for __ in range(REPEAT):
+        db.get_number_of_tasks()
+        task = db.get_next_task()[1]
+        db.set_task_handled(task[0])
+    return (time.time() - start) / REPEAT
+
+
+def time_claim(db):
+    start = time.time()
+    for __ in range(REPEAT):
+        task = db.claim_next_task()[1]
+        db.set_task_handled(task[0])
+    return (time.time() - start) / REPEAT
+
+
+def main(n_history = 100000):
+    directory = tempfile.mkdtemp()
+    try:
+        print('{} historical tasks, {} picks per run (including set_task_handled)'.format(n_history, REPEAT))
+
+        db = fill_queue(os.path.join(directory, 'noindex.db'), n_history, index = False)
+        add_waiting(db)
+        print('get_number_of_tasks + get_next_task, no index: {:8.3f} ms/task'.format(1000 * time_old_path(db)))
+        add_waiting(db)
+        print('claim_next_task, no index:                     {:8.3f} ms/task'.format(1000 * time_claim(db)))
+
+        db = fill_queue(os.path.join(directory, 'index.db'), n_history, index = True)
+        add_waiting(db)
+        print('claim_next_task, queue_runnable index:         {:8.3f} ms/task'.format(1000 * time_claim(db)))
+
+        start = time.time()
+        result = db.archive_tasks(keep_days = 1)
+        print('archive_tasks(keep_days = 1): {} tasks in {:.2f} s'.format(result[1], time.time() - start))
+        add_waiting(db)
+        print('claim_next_task, after archiving:              {:8.3f} ms/task'.format(1000 * time_claim(db)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
@@ -0,0 +1,80 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the scan planner: head move time of random protocols in protocol order and in planned order.
+
+Project: Hypermaq
+
+Protocols are random radiance/irradiance/camera scans (azimuth offsets to the sun, zeniths as in the station protocols),
+for a random sun heading, with the speeds, accelerations and resolution set by flir_ptu_d48e.
+Reports the predicted move time per cycle in protocol order and planned order, the planning time,
+and for groups small enough to try every order, how far nearest neighbour + 2-opt is from the best order.
+
+Usage: python benchmarks/bench_scan_planner.py [number of protocols] [scans per protocol]
+"""
+import os
+import random
+import sys
+import time
+from itertools import permutations
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'worker_libs'))  # worker_libs/__init__ needs the station hardware
+import scan_planner  # noqa: E402
+
+DYNAMICS = {'pan_speed': 3000., 'tilt_speed': 3000., 'pan_acceleration': 2000., 'tilt_acceleration': 2000.}  # PS, TS, PA, TA in flir_ptu_d48e
+RESOLUTION = 92.5714 / 3600  # degrees per position (PR, TR)
+OFFSETS = {'l': 20, 'e': 60, 'c': 0}  # radiance_angle_offset, irradiance_angle_offset
+
+
+def random_protocol(rnd, n_scans):
+    protocol = []
+    for i in range(n_scans):
+        instrument = rnd.choice('lec')
+        protocol.append({'id': i + 1, 'instrument': instrument, 'zenith': rnd.choice((40, 50, 130, 140, 180)),
+                         'azimuth': rnd.choice((-135, -90, 90, 135, 180)), 'repeat': 3, 'wait': 0})
+    return protocol
+
+
+def targets_for(protocol, sun_heading):
+    targets = dict()
+    for scan in protocol:
+        elevation = scan['zenith'] - OFFSETS[scan['instrument']] - 90
+        if -90 <= elevation <= 30:
+            targets[scan['id']] = scan_planner.head_positions((sun_heading + scan['azimuth'] - 180) % 360, elevation, RESOLUTION, RESOLUTION)
+    return targets
+
+
+def main(n_protocols=200, n_scans=12):
+    rnd = random.Random(3)
+    start = (0, int(-90 / RESOLUTION))  # parked
+    protocol_total = planned_total = planning = 0.
+    for __ in range(n_protocols):
+        protocol = random_protocol(rnd, n_scans)
+        targets = targets_for(protocol, rnd.uniform(0, 360))
+        protocol_total += scan_planner.path_time(start, [targets[s['id']] for s in protocol if s['id'] in targets], DYNAMICS)
+        t0 = time.time()
+        planned, predicted = scan_planner.plan_scans(protocol, targets, start, DYNAMICS)
+        planning += time.time() - t0
+        assert sorted(s['id'] for s in planned) == [s['id'] for s in protocol]
+        planned_total += sum(t for t in predicted if t is not None)
+    print('{} protocols of {} scans: move time per cycle {:.1f} s in protocol order, {:.1f} s planned ({:.0f}% less), planning {:.1f} ms'.format(
+        n_protocols, n_scans, protocol_total / n_protocols, planned_total / n_protocols,
+        100 * (1 - planned_total / protocol_total), 1000 * planning / n_protocols))
+
+    excess = []
+    for __ in range(50):
+        targets = [scan_planner.head_positions(rnd.uniform(0, 360), rnd.uniform(-90, 30), RESOLUTION, RESOLUTION) for __ in range(8)]
+        best = min(scan_planner.path_time(start, [targets[i] for i in order], DYNAMICS) for order in permutations(range(8)))
+        heuristic = scan_planner.path_time(start, [targets[i] for i in scan_planner._order_nearest(start, targets, DYNAMICS)], DYNAMICS)
+        excess.append(heuristic / best - 1)
+    print('nearest neighbour + 2-opt on 8 scans: {:.1f}% above the best order on average, {:.1f}% worst case'.format(
+        100 * sum(excess) / len(excess), 100 * max(excess)))
+
+    protocol = random_protocol(rnd, 9)
+    protocol[4]['wait'] = 60
+    planned, __ = scan_planner.plan_scans(protocol, targets_for(protocol, 200.), start, DYNAMICS)
+    assert [s['id'] for s in planned].index(5) == 4 and set(s['id'] for s in planned[:4]) == set(range(1, 5))
+    print('scan with a wait kept in place: {}'.format(','.join(str(s['id']) for s in planned)))
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:3]])
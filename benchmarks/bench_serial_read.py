@@ -0,0 +1,84 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of reading a full SAM spectrum (8 data frames of 64 databytes) from a serial port.
+
+Project: Hypermaq
+
+Writes the frames to a pseudo terminal and reads them on the other side with pyserial, and reports
+the CPU time (process time) and the number of read calls for:
+- the old loop: while ser.inWaiting() > 0: out += ser.read(1)
+- trippy.serial_read: bulk read of the waiting bytes into a bytearray
+
+Usage: python benchmarks/bench_serial_read.py [number of spectra]
+"""
+import os
+import pty
+import random
+import sys
+import time
+
+import serial
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+try:
+    process_time = time.process_time
+except AttributeError:
+    process_time = time.clock  # Python 2
+
+
+class counting_serial(serial.Serial):
+    """Serial port that counts the read() calls."""
+    reads = 0
+
+    def read(self, size = 1):
+        self.reads += 1
+        return serial.Serial.read(self, size)
+
+
+def read_old(ser, n_bytes):
+    out = bytes()
+    while len(out) < n_bytes:
+        while ser.inWaiting() > 0:
+            out += ser.read(1)
+    return out
+
+
+def read_bulk(ser, n_bytes):
+    out = bytearray()
+    while len(out) < n_bytes:
+        trippy.serial_read(ser, timeout = 0.1, buff = out)
+    return bytes(out)
+
+
+def time_read(read, master, ser, frames, n_spectra):
+    ser.reads = 0
+    cpu = 0.
+    for __ in range(n_spectra):
+        os.write(master, frames)
+        time.sleep(0.01)  # let the complete spectrum arrive, like the sleep tick in serial_command_and_parse
+        start = process_time()
+        out = read(ser, len(frames))
+        cpu += process_time() - start
+        assert out == frames
+    return cpu / n_spectra, ser.reads / float(n_spectra)
+
+
+def main(n_spectra = 200):
+    frames = trippy.trios_make_spectrum([random.randint(0, 65535) for __ in range(256)])
+    master, slave = pty.openpty()
+    ser = counting_serial(os.ttyname(slave), 9600, timeout = 0.01)
+    try:
+        print('{} spectra of {} bytes'.format(n_spectra, len(frames)))
+        for name, read in [('read(1) per byte', read_old), ('serial_read     ', read_bulk)]:
+            cpu, reads = time_read(read, master, ser, frames, n_spectra)
+            print('{}: {:8.3f} ms CPU, {:6.1f} read calls per spectrum'.format(name, 1000 * cpu, reads))
+    finally:
+        ser.close()
+        os.close(master)
+        os.close(slave)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
@@ -0,0 +1,79 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of the spectrum path from received packets to the measurements table.
+
+Project: Hypermaq
+
+For the same parsed SAM packets, times per spectrum:
+- concat_data: a list of 256 Python ints, packed with struct for a 'blob' db
+- concat_spectrum: a TriosSpectrum (uint16 array made with frombuffer), stored with tobytes
+and inserts the spectra in a 'blob' and a 'columns' db with add_meas_many, checking the stored values are identical.
+
+Usage: python benchmarks/bench_spectrum.py [number of spectra]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+import trippy  # noqa: E402
+
+
+def make_packets(n):
+    rnd = random.Random(1)
+    packets = []
+    for __ in range(n):
+        stream = trippy.trios_make_spectrum([rnd.randint(1, 65535) for __ in range(256)])
+        packets.append(trippy.trios_parse(stream))
+    return packets
+
+
+def time_path(packets, concat, pack):
+    pack(concat(packets[0]))  # warm up (imports numpy)
+    start = time.time()
+    for p in packets:
+        pack(concat(p))
+    return (time.time() - start) / len(packets)
+
+
+def time_db(directory, name, mode, spectra):
+    db_file = os.path.join(directory, '{}_{}.db'.format(name, mode))
+    dbc.create_db(db_file, id=('measurements',), spectrum_storage=mode)
+    db = dbc.connection(db_file)
+    start = time.time()
+    for i in range(0, len(spectra), 10):
+        db.add_meas_many([{'valid': 'y', 'scan_rep': j + 1, 'data': s} for j, s in enumerate(spectra[i:i + 10])])
+    duration = (time.time() - start) / len(spectra)
+    stored = db.execute('select {} from measurements order by id'.format(', '.join('val_{:03d}'.format(i) for i in range(1, 257)))).fetchall()
+    db.close()
+    return duration, stored
+
+
+def main(n = 2000):
+    packets = make_packets(n)
+    assert all(len(p) == 8 for p in packets)
+    t_list = time_path(packets, trippy.concat_data, dbc.pack_spectrum)
+    t_array = time_path(packets, trippy.concat_spectrum, dbc.pack_spectrum)
+    print('{} spectra'.format(n))
+    print('concat_data + struct pack:        {:7.1f} us per spectrum'.format(1e6 * t_list))
+    print('concat_spectrum + tobytes:        {:7.1f} us per spectrum'.format(1e6 * t_array))
+
+    directory = tempfile.mkdtemp()
+    try:
+        lists = [trippy.concat_data(p) for p in packets]
+        spectra = [trippy.concat_spectrum(p) for p in packets]
+        for mode in ('blob', 'columns'):
+            t_list, stored_list = time_db(directory, 'list', mode, lists)
+            t_array, stored_array = time_db(directory, 'spectrum', mode, spectra)
+            assert stored_list == stored_array == [tuple(l) for l in lists]
+            print('add_meas_many {:7s} list/spectrum: {:7.1f} / {:7.1f} us per row, same values'.format(mode, 1e6 * t_list, 1e6 * t_array))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
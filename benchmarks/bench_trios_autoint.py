@@ -0,0 +1,95 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Number of acquisitions of the trippy auto integration (int_time = -1).
+
+Project: Hypermaq
+
+An in-memory SAM returns spectra with counts = dark + signal * 2**int_it (clipped at 65535), read from the
+integration time in the measurement command. For a cycle of scans at a few geometries with slowly changing
+light, compares the linear search (step int_it from 1 until saturation) with TriosSession.auto_integration,
+checking that both choose the same integration time.
+
+Usage: python benchmarks/bench_trios_autoint.py [cycles]
+"""
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+DARK = 1500
+INT_MAX = 12
+
+
+class fake_sam(object):
+    """Serial port look-alike: replies to the measurement command with a spectrum for the requested integration time."""
+    port = 'fake'
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.signal = [0] * 256
+
+    def isOpen(self):
+        return True
+
+    def flushInput(self):
+        self.buffer = bytearray()
+
+    def write(self, cmd):
+        cmd = bytearray(cmd)
+        int_it = cmd[6]  # 23 00 00 30 78 05 [int] 01
+        spectrum = [min(65535, int(DARK + s * 2**int_it)) for s in self.signal]
+        self.buffer += trippy.trios_make_spectrum(spectrum)
+
+    def inWaiting(self):
+        return len(self.buffer)
+
+    def read(self, size = 1):
+        out = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return out
+
+    def close(self):
+        pass
+
+
+def linear_search(session):
+    """The search before: step int_it up from 1 until a pixel saturates."""
+    acquisitions, found = 0, None
+    for int_it in range(1, INT_MAX + 1):
+        packets = session.read_spectrum(hex(int_it).replace('x', ''))[1]
+        acquisitions += 1
+        if any(v >= 65535 for p in packets for v in p['data']):
+            break
+        found = int_it
+    return found, acquisitions
+
+
+def main(cycles = 20):
+    rnd = random.Random(1)
+    sam = fake_sam()
+    session = trippy.TriosSession('fake', sleep = 0.01, max_time = 1, require_checkbyte = False)
+    session.ser, session.dev = sam, 'SAM_8166'
+    geometries = {'sky': 40., 'water': 4., 'sun': 300.}
+    n_old, n_new, scans = 0, 0, 0
+    for cycle in range(cycles):
+        light = 1 + 0.1 * cycle + rnd.uniform(-0.05, 0.05)  # slowly brightening day
+        for geometry, level in geometries.items():
+            sam.signal = [level * light * (0.2 + 0.8 * rnd.random()) for __ in range(256)]
+            expected, acquisitions = linear_search(session)
+            n_old += acquisitions
+            ret = session.measure(int_time = -1, int_max = INT_MAX, int_key = geometry)
+            n_new += session.acquisitions[0]
+            if expected is None:
+                assert ret[1][0][0] != '', ret[1][0][0]
+            else:
+                assert session.int_times[0] == expected, (geometry, session.int_times[0], expected)
+            scans += 1
+    print('{} scans, {} geometries'.format(scans, len(geometries)))
+    print('linear search:    {:5.2f} acquisitions per repetition'.format(float(n_old) / scans))
+    print('auto_integration: {:5.2f} acquisitions per repetition'.format(float(n_new) / scans))
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
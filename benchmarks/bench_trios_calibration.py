@@ -0,0 +1,109 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Check and benchmark of the RAMSES calibration.
+
+Project: Hypermaq
+
+Writes TriOS style Cal_/Back_ files for two sensors in a temporary directory, then:
+- checks the vectorised calibration against a per spectrum, per pixel loop and times both
+- times the cached tables against loading the files for every call, and checks that a changed file is loaded again
+- calibrates a 'blob' database with calibrate_export.calibrate_db (bulk use over an export), with the integration time
+  of each row, and checks that the rows without integration time (dbs made before rep_int_time was stored) are not calibrated
+
+Usage: python benchmarks/bench_trios_calibration.py [number of spectra]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import calibrate_export  # noqa: E402
+import dbc  # noqa: E402
+import trippy  # noqa: E402
+
+DEVS = ('SAM_8166', 'SAM_8167')
+
+
+def write_dat(filename, dev, columns, rnd):
+    with open(filename, 'w') as f:
+        f.write('[Spectrum]\n[Attributes]\nIDDevice = {}\nc0s = 3.1e+02\nc1s = 3.3\nc2s = 3.5e-04\nc3s = -1.8e-06\n[END] of [Attributes]\n[DATA]\n'.format(dev))
+        for pixel in range(1, 257):
+            values = ['+NAN' if (columns == 1 and pixel < 4) else '{:+.6E}'.format(rnd.uniform(1e-4, 1e-2)) for __ in range(columns)]
+            f.write(' {} {} 0\n'.format(pixel, ' '.join(values)))
+        f.write('[END] of [DATA]\n')
+
+
+def reference(dev, counts, int_time, directory):
+    """Per pixel loop of the TriOS calibration."""
+    cal = trippy.trios_read_dat(os.path.join(directory, 'Cal_{}.dat'.format(dev)))[1]
+    back = trippy.trios_read_dat(os.path.join(directory, 'Back_{}.dat'.format(dev)))[1]
+    c = [counts[i] / 65535. - (back[i][1] + back[i][2] * int_time / 8192.) for i in range(256)]
+    dark = sum(c[236:254]) / 18.
+    return [(c[i] - dark) * 8192. / int_time / cal[i][1] for i in range(256)]
+
+
+def main(n = 2000):
+    rnd = random.Random(1)
+    directory = tempfile.mkdtemp()
+    try:
+        for dev in DEVS:
+            write_dat(os.path.join(directory, 'Cal_{}.dat'.format(dev)), dev, 1, rnd)
+            write_dat(os.path.join(directory, 'Back_{}.dat'.format(dev)), dev, 2, rnd)
+        devs = [DEVS[i % 2] for i in range(n)] + ['SAM_0000']  # the last one has no calibration
+        counts = np.array([[rnd.randint(1000, 60000) for __ in range(256)] for __ in range(n + 1)], dtype = float)
+        int_times = [2.**rnd.randint(2, 13) for __ in range(n + 1)]
+
+        start = time.time()
+        calibrated = trippy.trios_calibrate(devs, counts, int_times, directory = directory)
+        t_vector = time.time() - start
+        start = time.time()
+        expected = [reference(d, c, t, directory) for d, c, t in zip(devs[:200], counts, int_times)]
+        t_loop = (time.time() - start) / 200 * n
+        assert np.allclose(calibrated[:200], expected, equal_nan = True)
+        assert np.isnan(calibrated[-1]).all()
+        print('{} spectra: vectorised {:.3f} s, per pixel loop (extrapolated) {:.2f} s, same values'.format(n, t_vector, t_loop))
+
+        start = time.time()
+        for __ in range(100):
+            trippy.trios_calibration(DEVS[0], directory = directory)
+        t_cached = (time.time() - start) / 100
+        start = time.time()
+        for __ in range(20):
+            trippy.TriosCalibration(DEVS[0], directory = directory)
+        t_load = (time.time() - start) / 20
+        print('calibration tables: cached {:.3f} ms, loading the files {:.2f} ms'.format(1000 * t_cached, 1000 * t_load))
+
+        old = trippy.trios_calibration(DEVS[0], directory = directory).cal.copy()
+        cal_file = os.path.join(directory, 'Cal_{}.dat'.format(DEVS[0]))
+        write_dat(cal_file, DEVS[0], 1, rnd)
+        os.utime(cal_file, (time.time() + 10, time.time() + 10))
+        assert not np.allclose(trippy.trios_calibration(DEVS[0], directory = directory).cal, old, equal_nan = True)
+        print('changed calibration file loaded again')
+
+        db_file = os.path.join(directory, 'export.db')
+        dbc.create_db(db_file, id = ('measurements',), spectrum_storage = 'blob')
+        db = dbc.connection(db_file)
+        row_int_times = [None if i % 10 == 0 else t for i, t in enumerate(int_times)]  # every 10th: no integration time, as in dbs made before rep_int_time was stored
+        db.add_meas_many([{'valid': 'y', 'rep_serial': d, 'rep_int_time': t, 'data': c.astype(int).tolist()}
+                          for d, c, t in zip(devs, counts, row_int_times)])
+        start = time.time()
+        n, unknown = calibrate_export.calibrate_db(db_file, directory)
+        print('calibrate_db: {} measurements in {:.3f} s, {} without integration time not calibrated'.format(n, time.time() - start, unknown))
+        assert unknown == sum(t is None for t in row_int_times) and n == len(devs) - unknown
+        stored = db.execute('select id, int_time, spectrum from calibrated_spectra order by id').fetchall()
+        assert [r[1] for r in stored] == [t for t in row_int_times if t is not None]
+        index = stored[1][0] - 1  # measurement ids start at 1
+        expected = trippy.trios_calibrate([devs[index]], counts[index:index + 1], [int_times[index]], directory = directory)[0]
+        assert np.allclose(np.frombuffer(bytes(stored[1][2]), dtype = '<f4'), expected, rtol = 1e-6, equal_nan = True)
+        db.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
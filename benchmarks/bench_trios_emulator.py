@@ -0,0 +1,57 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Acquisition benchmark suite on the TriOS emulator.
+
+Project: Hypermaq
+
+Runs TriosSession measurements against trippy.TriosEmulator on a pseudo terminal for a set of scenarios
+(SAM, SAMIP with interleaved IP frames, dropped and corrupted frames, saturation with the trippy auto integration)
+and reports per scenario:
+- end-to-end repetitions/s and the number of repetitions without error
+- CPU time of the acquiring thread per repetition (serial reads, filtering, parsing and concatenation)
+
+Usage: python benchmarks/bench_trios_emulator.py [repetitions per scenario] [baudrate]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+try:
+    thread_time = time.thread_time
+except AttributeError:
+    thread_time = time.clock  # Python 2: process time, includes the emulator thread
+
+SCENARIOS = [
+    # name, emulator options, measure options
+    ('SAM',                    {}, {'int_time': 4}),
+    ('SAMIP',                  {'samip': True}, {'int_time': 4}),
+    ('SAM, 5% dropped',        {'drop_rate': 0.05}, {'int_time': 4}),
+    ('SAM, 5% corrupted',      {'corrupt_rate': 0.05}, {'int_time': 4}),
+    ('SAM, auto int (sat.)',   {'signal': 2000.}, {'int_time': -1, 'int_max': 6}),
+]
+
+
+def run(name, emulator_options, measure_options, repeat, baudrate):
+    with trippy.TriosEmulator(baudrate = baudrate, seed = 1, **emulator_options) as emulator:
+        with trippy.TriosSession(emulator.port, baudrate = baudrate, sleep = 0.5, max_time = 2) as session:
+            session.measure(repeat = 1, **measure_options)  # warm up: identification and imports
+            start, cpu, ok = time.time(), thread_time(), 0
+            for __ in range(repeat):
+                ret = session.measure(repeat = 1, **measure_options)
+                ok += (not ret[0]) and ret[1][0][0] == ''
+            duration, cpu = time.time() - start, thread_time() - cpu
+    print('{:22s}: {:6.2f} repetitions/s, {:3d}/{} ok, {:6.2f} ms CPU per repetition'.format(
+        name, repeat / duration, ok, repeat, 1000 * cpu / repeat))
+
+
+def main(repeat = 20, baudrate = 9600):
+    print('{} repetitions per scenario at {} baud'.format(repeat, baudrate))
+    for name, emulator_options, measure_options in SCENARIOS:
+        run(name, emulator_options, measure_options, repeat, baudrate)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:3]])
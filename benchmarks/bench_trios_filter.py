@@ -0,0 +1,68 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of trios_filter.
+
+Project: Hypermaq
+
+Throughput in MB/s of the loop (loop=True), the single pass filter and trios_filter_chunk on a synthetic SAM stream.
+The output of the filters is compared with the original implementation in tests/test_trios_filter.py.
+
+Usage: python benchmarks/bench_trios_filter.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+def random_parts(rnd, sbuff, max_size = 8):
+    parts, i = [], 0
+    while i < len(sbuff):
+        n = rnd.randint(1, max_size)
+        parts.append(sbuff[i:i+n])
+        i += n
+    return parts
+
+
+def filter_parts(parts):
+    out, carry = [], b''
+    for part in parts:
+        filtered, carry = trippy.trios_filter_chunk(part, carry)
+        out.append(filtered)
+    return b''.join(out) + carry  # a trailing @ at the end of the stream is kept as is
+
+
+def throughput(func, sbuff, repeat):
+    start = time.time()
+    for __ in range(repeat):
+        func(sbuff)
+    return len(sbuff) * repeat / (time.time() - start) / 1e6
+
+
+def main():
+    if sys.version_info[0] == 2:
+        ## the loop only runs on Python 3, compare with the Python 2 replace path instead
+        def reference(sbuff):
+            for escape, value in [(b'@f', b'\x11'), (b'@g', b'\x13'), (b'@e', b'\x23'), (b'@d', b'\x40')]:
+                sbuff = sbuff.replace(escape, value)
+            return sbuff
+    else:
+        reference = lambda sbuff: trippy.trios_filter(sbuff, loop = True)
+
+    rnd = random.Random(2)
+    stream = b''
+    while len(stream) < 200000:
+        stream += trippy.trios_make_spectrum([rnd.randint(0, 65535) for __ in range(256)])
+    parts = random_parts(random.Random(3), stream, max_size = 512)  # serial reads
+    print('{} byte SAM stream, {} escapes'.format(len(stream), stream.count(b'@')))
+    print('reference:          {:8.2f} MB/s'.format(throughput(reference, stream, 1)))
+    print('trios_filter:       {:8.2f} MB/s'.format(throughput(trippy.trios_filter, stream, 20)))
+    start = time.time()
+    filter_parts(parts)
+    print('trios_filter_chunk: {:8.2f} MB/s ({} parts)'.format(len(stream) / (time.time() - start) / 1e6, len(parts)))
+
+
+if __name__ == '__main__':
+    main()
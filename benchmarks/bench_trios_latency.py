@@ -0,0 +1,67 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Per-repetition latency of a SAM reading on a simulated instrument.
+
+Project: Hypermaq
+
+trippy.TriosEmulator plays a SAM on a pseudo terminal: after a measurement command it waits the integration time
+and sends the 8 data frames at 9600 baud. For every repetition the benchmark reports the time from
+sending the command until serial_command_and_parse returns, and how long after the last byte that was:
+- before: read and parse, then a fixed sleep tick (TRIOS_SLEEP_TIME), until all packets are in
+- after: serial_command_and_parse, waiting on the port and returning when the last packet is decoded
+
+Usage: python benchmarks/bench_trios_latency.py [repetitions] [sleep]
+"""
+import os
+import sys
+import time
+
+import serial
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+MEASURE_CMD = '23 00 00 30 78 05 06 01 23 00 00 80 A8 00 81 01'  # integration time 6: 128 ms
+
+
+def command_and_parse_ticks(ser, cmd_hex, req_packets, max_time, sleep):
+    """The acquisition loop before waiting on the port: parse, then sleep a fixed tick."""
+    ser.write(bytearray.fromhex(cmd_hex))
+    decoder = trippy.TriosDecoder(packet_size = 64)
+    tw = sleep
+    while (tw < max_time) & (len(decoder.packets) < req_packets):
+        decoder.feed(trippy.serial_read(ser))
+        if len(decoder.packets) >= req_packets:
+            break
+        time.sleep(sleep)
+        tw += sleep
+    return decoder.packets[:req_packets]
+
+
+def run(name, read, emulator, repeat):
+    total, excess = [], []
+    for __ in range(repeat):
+        start = time.time()
+        packets = read()
+        end = time.time()
+        assert len(packets) == 8
+        total.append(end - start)
+        excess.append(end - emulator.last_byte)
+    print('{}: {:7.1f} ms per repetition, {:6.1f} ms after the last byte (max {:6.1f} ms)'.format(
+        name, 1000 * sum(total) / repeat, 1000 * sum(excess) / repeat, 1000 * max(excess)))
+
+
+def main(repeat = 10, sleep = 0.5):
+    with trippy.TriosEmulator(delay = 0) as emulator:
+        ser = serial.Serial(emulator.port, emulator.baudrate, timeout = 0.01)
+        try:
+            print('{} repetitions, sleep {} s, integration 128 ms'.format(repeat, sleep))
+            run('before (sleep ticks)', lambda: command_and_parse_ticks(ser, MEASURE_CMD, 8, 18, sleep), emulator, repeat)
+            run('after (wait on port)', lambda: trippy.serial_command_and_parse(ser, MEASURE_CMD, 8, packet_size = 64,
+                                                                               sleep = sleep, max_time = 18), emulator, repeat)
+        finally:
+            ser.close()
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]] + [float(i) for i in sys.argv[2:3]])
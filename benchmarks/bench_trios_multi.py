@@ -0,0 +1,47 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Cycle time of measuring irradiance and radiance one after the other and at the same time.
+
+Project: Hypermaq
+
+Two trippy.TriosEmulator threads play a SAM on a pseudo terminal each: they reply to the serial number query with an
+information frame, and to a measurement command with 8 data frames after the integration time, paced at 9600 baud.
+Times an Ed/Lu/Lsky like step: trios_single on each port, and trios_multi on both ports.
+
+Usage: python benchmarks/bench_trios_multi.py [repetitions]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+INT_TIME = 7  # 256 ms
+
+
+def main(repeat = 3):
+    emulators = [trippy.TriosEmulator(serial_number) for serial_number in (0x8166, 0x8167)]
+    ports = [emulator.port for emulator in emulators]
+    for emulator in emulators:
+        emulator.start()
+    try:
+        print('{} repetitions, integration {} ms'.format(repeat, 2**(1 + INT_TIME)))
+        start = time.time()
+        for port in ports:
+            ret = trippy.trios_single(port, int_time = INT_TIME, repeat = repeat, require_checkbyte = False, sleep = 0.5, max_time = 18)
+            assert not ret[0] and all(r[0] == '' for r in ret[1]), ret
+        print('trios_single per port:  {:6.2f} s'.format(time.time() - start))
+
+        start = time.time()
+        ret = trippy.trios_multi(ports, int_time = INT_TIME, repeat = repeat, require_checkbyte = False, sleep = 0.5, max_time = 18)
+        print('trios_multi both ports: {:6.2f} s'.format(time.time() - start))
+        assert not ret[0] and all(r[0] == '' for rep in ret[1] for r in rep), ret
+        print('devices {}, trigger times aligned: {}'.format([r[1] for r in ret[1][0]], all(rep[0][2] == rep[1][2] for rep in ret[1])))
+    finally:
+        for emulator in emulators:
+            emulator.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
@@ -0,0 +1,66 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Check and microbenchmark of trios_parse_packet.
+
+Project: Hypermaq
+
+- compares the TriosPacket records with the dicts of the previous implementation (given as a file,
+  eg git show <commit>:trippy/trios_parse_packet.py > old.py), for data frames and information frames of every module type
+- packets/s for data and information frames, with and without reading the data values
+
+Usage: python benchmarks/bench_trios_packet.py [old trios_parse_packet.py]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+REPEAT = 20000
+
+
+def make_packets(rnd):
+    data = [trippy.trios_filter(trippy.trios_make_packet(bytes(bytearray(rnd.randint(0, 255) for __ in range(64))), framebyte = f))
+            for f in range(8)]
+    info = [trippy.trios_filter(trippy.trios_make_info((top << 11) + rnd.randint(0, 2047), firmware = (1, 2)))
+            for top in range(32)]
+    return data, info
+
+
+def check(old_parse, packets):
+    for p in packets:
+        old, new = old_parse(p), trippy.trios_parse_packet(p)
+        assert dict(old) == new.to_dict(), (old, new)
+        assert all(old[k] == new[k] for k in old)
+    print('{} packets: same fields and values as the previous implementation'.format(len(packets)))
+
+
+def rate(parse, packets, read_data):
+    start = time.time()
+    for __ in range(REPEAT // len(packets)):
+        for p in packets:
+            packet = parse(p)
+            if read_data:
+                packet['data']
+    return REPEAT // len(packets) * len(packets) / (time.time() - start)
+
+
+def main(old_file = None):
+    data, info = make_packets(random.Random(1))
+    parsers = [('trios_parse_packet', trippy.trios_parse_packet)]
+    if old_file is not None:
+        namespace = {}
+        with open(old_file) as f:
+            exec(f.read(), namespace)
+        old_parse = namespace['trios_parse_packet']
+        check(old_parse, data + info)
+        parsers.insert(0, ('previous          ', old_parse))
+    for name, parse in parsers:
+        print('{}: data {:9.0f} packets/s ({:9.0f} reading data), information {:9.0f} packets/s'.format(
+            name, rate(parse, data, False), rate(parse, data, True), rate(parse, info, False)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,85 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Benchmark of parsing a TriOS serial stream that arrives in chunks.
+
+Project: Hypermaq
+
+Builds a synthetic SAM/SAMIP stream with trios_encode (data frames and interleaved information frames),
+splits it in random chunk sizes like serial reads, and times:
+- the old serial_command_and_parse path: filter and parse the whole buffer after every read
+- TriosDecoder: filter and parse only the newly read bytes
+Both should give the same packets.
+
+Usage: python benchmarks/bench_trios_parser.py [number of spectra]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+
+def make_stream(n_spectra, rnd):
+    stream = b''
+    for i in range(n_spectra):
+        if i % 4 == 0:
+            stream += trippy.trios_make_info(0x8166, firmware=(2, 1))
+        spectrum = [rnd.randint(0, 65535) for __ in range(256)]
+        stream += trippy.trios_make_spectrum(spectrum, timeflag=(i % 256, 0))
+    return stream
+
+
+def make_chunks(stream, rnd):
+    chunks, i = [], 0
+    while i < len(stream):
+        n = rnd.randint(1, 200)
+        chunks.append(stream[i:i+n])
+        i += n
+    return chunks
+
+
+def parse_old(chunks):
+    out, packets = b'', []
+    for chunk in chunks:
+        out += chunk
+        tmp_packets = []
+        srem = trippy.trios_filter(out)
+        while len(srem) > 0:
+            srem, p = trippy.trios_parse_buffer(srem)
+            if len(p) > 0:
+                pret = trippy.trios_parse_packet(p)
+                if len(pret) > 0:
+                    tmp_packets.append(pret)
+        packets = tmp_packets
+    return packets
+
+
+def parse_decoder(chunks):
+    decoder = trippy.TriosDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.packets
+
+
+def main(n_spectra = 20):
+    rnd = random.Random(1)
+    stream = make_stream(n_spectra, rnd)
+    chunks = make_chunks(stream, rnd)
+    print('{} spectra, {} bytes in {} reads'.format(n_spectra, len(stream), len(chunks)))
+
+    start = time.time()
+    old = parse_old(chunks)
+    t_old = time.time() - start
+    start = time.time()
+    new = parse_decoder(chunks)
+    t_new = time.time() - start
+
+    print('whole buffer each read: {:8.3f} s, {} packets'.format(t_old, len(old)))
+    print('TriosDecoder:           {:8.3f} s, {} packets'.format(t_new, len(new)))
+    print('same packets: {}'.format(old == new))
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
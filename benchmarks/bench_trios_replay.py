@@ -0,0 +1,68 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Capture and replay of raw TriOS serial traffic.
+
+Project: Hypermaq
+
+Without a capture file: records a few repetitions of trippy.TriosEmulator (SAMIP, with corrupted frames) through
+a TriosSession with a TriosRecorder, plain and gzip compressed, checks that replaying the capture gives the
+same packets as the acquisition, and replays it once in real time.
+With a capture file (eg from the station, see TRIOS_CAPTURE_FILE in measurements2): replays it at full speed.
+Reports capture size, replay throughput and parser CPU.
+
+Usage: python benchmarks/bench_trios_replay.py [capture file]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+REPEAT = 5
+
+
+def record(filename):
+    with trippy.TriosRecorder(filename) as recorder:
+        with trippy.TriosEmulator(samip = True, corrupt_rate = 0.05, seed = 1) as emulator:
+            with trippy.TriosSession(emulator.port, require_checkbyte = False, sleep = 0.5, max_time = 2, recorder = recorder) as session:
+                ret = session.measure(int_time = 4, repeat = REPEAT, return_buffer = True)
+    return emulator.port, ret
+
+
+def replay(filename, packet_size = None, **options):
+    n_bytes = sum(len(r[3]) for r in trippy.trios_capture_records(filename) if r[1] == 'rx')
+    start, cpu = time.time(), time.process_time() if hasattr(time, 'process_time') else time.clock()
+    packets = trippy.trios_replay(filename, packet_size = packet_size, **options)
+    duration = time.time() - start
+    cpu = (time.process_time() if hasattr(time, 'process_time') else time.clock()) - cpu
+    print('{}: {} bytes, {} packets in {:.3f} s ({:.2f} MB/s, {:.3f} s CPU)'.format(
+        os.path.basename(filename), n_bytes, sum(len(p) for p in packets.values()), duration, n_bytes / duration / 1e6, cpu))
+    return packets
+
+
+def main(capture_file = None):
+    if capture_file is not None:
+        replay(capture_file)
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        for name in ('capture.bin', 'capture.bin.gz'):
+            filename = os.path.join(directory, name)
+            port, ret = record(filename)
+            assert not ret[0], ret
+            print('{}: {} repetitions, {} bytes on disk'.format(name, REPEAT, os.path.getsize(filename)))
+            packets = replay(filename, require_checkbyte = False, packet_size = 64)[port]  # the data frames
+            acquired = [p for r in ret[1] for p in r[5]]  # return_buffer: [error, dev, time, data, buffer, packets]
+            assert packets == acquired
+            print('replayed data frames identical to the acquisition')
+        replay(filename, realtime = True, speed = 2., require_checkbyte = False)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,50 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Per-scan overhead of opening the port and identifying the sensor, with and without a TriosSession.
+
+Project: Hypermaq
+
+Uses trippy.TriosEmulator on a pseudo terminal and times a protocol of scans:
+- trios_single per scan: open the port, query the serial number, measure, close
+- one TriosSession for the cycle: open and identify once, then measure every scan
+
+Usage: python benchmarks/bench_trios_session.py [scans] [repetitions per scan]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+OPTIONS = {'require_checkbyte': False, 'sleep': 0.5, 'max_time': 18}
+INT_TIME = 7  # 256 ms
+
+
+def main(scans = 5, repeat = 1):
+    emulator = trippy.TriosEmulator()
+    emulator.start()
+    port = emulator.port
+    try:
+        print('{} scans of {} repetitions'.format(scans, repeat))
+        start = time.time()
+        for __ in range(scans):
+            ret = trippy.trios_single(port, int_time = INT_TIME, repeat = repeat, **OPTIONS)
+            assert not ret[0] and all(r[0] == '' for r in ret[1]), ret
+        t_single = time.time() - start
+        print('trios_single per scan: {:6.2f} s, {:6.3f} s per scan'.format(t_single, t_single / scans))
+
+        start = time.time()
+        with trippy.TriosSession(port, **OPTIONS) as session:
+            for __ in range(scans):
+                ret = session.measure(int_time = INT_TIME, repeat = repeat)
+                assert not ret[0] and all(r[0] == '' for r in ret[1]), ret
+        t_session = time.time() - start
+        print('TriosSession:          {:6.2f} s, {:6.3f} s per scan ({} identification)'.format(t_session, t_session / scans, session.identifications))
+        print('overhead removed:      {:6.3f} s per scan'.format((t_single - t_session) / scans))
+    finally:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:3]])
@@ -4,4 +4,5 @@ sleep 10
 /usr/bin/python -u /home/hypermaq/scripts/queue.py -a set_station_params,1 >> /home/hypermaq/data/cronlog.log 2>&1  # add task with priority 1
 sleep 20
 _date=$(date +"%Y%m%d_%H%M%S")
+/usr/bin/sqlite3 /home/hypermaq/data/hypermaq.db "PRAGMA wal_checkpoint(TRUNCATE);" >> /home/hypermaq/data/cronlog.log 2>&1  # db uses WAL, move committed data into the db file before the backup
 tar -czPf /home/hypermaq/data/backups/backup_$_date.tar.gz /home/hypermaq/data/cronlog.log /home/hypermaq/data/hypermaq.db
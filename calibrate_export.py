@@ -0,0 +1,83 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Calibrates the RAMSES spectra of a database (eg an export) to radiance/irradiance.
+
+Project: Hypermaq
+
+The raw counts of the valid measurements are calibrated per sensor (rep_serial) with its TriOS calibration files
+(Cal_<serial>.dat and Back_<serial>.dat), see trippy.trios_calibration, in batches of one vectorised pass per sensor.
+The results are written to the calibrated_spectra table of the same database: measurement id, rep_serial,
+integration time and the 256 calibrated values as a little endian float32 blob (nan where there is no calibration).
+
+Each spectrum is calibrated with its own integration time (rep_int_time, with the TriOS auto integration the one
+reported in the SAM header). Measurements without integration time are not calibrated: dbs made before rep_int_time
+was stored don't have it. Their number is reported.
+The station can also calibrate each scan right after measuring it, see the trios_calibrate setting.
+
+Options:
+-f: database file (default: /home/hypermaq/data/hypermaq.db)
+-d: directory with the calibration files (default: /home/hypermaq/data/calibration)
+"""
+import sys  # access to arguments
+import getopt  # tool to parse arguments
+import dbc
+import trippy
+
+batch_size = 1000
+
+
+def calibrate_db(db_file, directory):
+    """Calibrates the valid measurements with an integration time, returns (number calibrated, number without integration time)."""
+    import numpy as np
+    db = dbc.connection(db_file)
+    db.upgrade_measurements()  # rep_int_time column (all NULL) for dbs made before it was stored
+    db.execute(dbc.calibrated_spectra_table_command)
+    if db.get_spectrum_storage() == 'blob':
+        table, spectrum_columns = dbc.spectrum_table, 'spectrum'
+    else:
+        table, spectrum_columns = 'measurements', ', '.join('val_{:03d}'.format(i) for i in range(1, dbc.spectrum_pixels + 1))
+    select_command = "select id, rep_serial, rep_int_time, {} from {} where id > ? and valid = 'y' and rep_int_time > 0 order by id limit ?".format(
+        spectrum_columns, table)
+    unknown = db.execute("select count(*) from {} where valid = 'y' and coalesce(rep_int_time, 0) <= 0".format(table)).fetchone()[0]
+
+    last_id, n = 0, 0
+    while True:
+        rows = db.execute(select_command, (last_id, batch_size)).fetchall()
+        if len(rows) == 0: break
+        if len(rows[0]) == 4:
+            counts = np.vstack([np.frombuffer(bytes(r[3]), dtype='<u2') for r in rows])
+        else:
+            counts = np.array([r[3:] for r in rows], dtype=float)
+        calibrated = trippy.trios_calibrate([r[1] for r in rows], counts, [r[2] for r in rows], directory = directory)
+        ok, err = db.add_calibrated_spectra([(r[0], r[1], r[2], c) for r, c in zip(rows, calibrated)])
+        if not ok: raise Exception(err)
+        last_id, n = rows[-1][0], n + len(rows)
+    db.close()
+    return n, unknown
+
+
+"""Main"""
+if __name__ == "__main__":
+    try:
+        opts, arg = getopt.getopt(sys.argv[1:], "f:d:")  # returns a list with each option,argument combination
+        db_file = dbc.database_location
+        directory = trippy.calibration_directory
+        for option, argument in opts:
+            if option == "-f":
+                db_file = argument
+            elif option == "-d":
+                directory = argument
+
+        print("Calibrating the measurements in {}...".format(db_file))
+        print("Done, {} measurements calibrated, {} without integration time not calibrated.".format(*calibrate_db(db_file, directory)))
+
+    except getopt.GetoptError:  # invalid arguments have been provided at the command line.
+        print("""
+    Calibrates the RAMSES spectra of a database to the calibrated_spectra table.
+
+    Options:
+    -f: database file (default: {})
+    -d: directory with the calibration files (default: {})
+
+    Example: "calibrate_export.py -f /home/hypermaq/data/export.db"
+    """.format(dbc.database_location, trippy.calibration_directory))
@@ -13,14 +13,88 @@ Copyright?
 import sqlite3  # Because ... Well...
 import logging
 import os
+import struct  # to (un)pack spectra stored as blob
+from contextlib import contextmanager  # claimed_task
 from datetime import datetime
 from subprocess import call  # to do the actual export
+from time import sleep  # to back off when the db is locked by another process
+from wakeup import notify_worker  # to let the worker know a task was added
 
 __metaclass__ = type  # new-style classes
 
 """Define constants."""
 database_location = "/home/hypermaq/data/hypermaq.db"
-valid_tables = ("protocol", "settings", "measurements", "queue", "logs")
+valid_tables = ("protocol", "settings", "measurements", "queue", "logs", "head_telemetry")
+spectrum_storage_modes = ("columns", "blob")  # 256 val_NNN integer columns or one packed uint16 blob per row
+spectrum_pixels = 256  # number of values in a RAMSES spectrum
+spectrum_table = "measurements_blob"  # table holding the rows when spectra are stored as blob
+meas_item_types = {'rep_int_time': 'real'}  # column types of the meas_items added after the first release, see upgrade_measurements
+meas_items = ('timestamp', 'valid', 'setup_error', 'cycle_id', 'gnss_acquired', 
+            'gnss_qual', 'gnss_lat', 'gnss_lon', 'batt_voltage', 'head_voltage',
+            'head_temp_hpt', 'cycle_scan', 'prot_sensor',
+            'prot_zenith', 'prot_azimuth', 'sun_heading', 'sun_elevation', 'scan_heading', 
+            'scan_error', 'scan_rep', 'rep_error', 'rep_unix', 'rep_serial', 
+            'rep_int_time')  # measurement columns, excluding id and spectrum
+connection_profiles = {
+    # sqlite defaults: rollback journal, writers block readers and each other
+    'default': {},
+    # for the station: queue.py (cron), worker.py and its log handler write to the same file, they ask for it explicitly.
+    # WAL lets readers and a writer work concurrently, synchronous NORMAL is safe in WAL mode (a power cut can only lose the last commits),
+    # cache and mmap sizes are kept small for the BeagleBone.
+    'station': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -4000, 'mmap_size': 33554432, 
+                'temp_store': 'MEMORY', 'busy_timeout': 5000},
+}
+default_profile = 'default'  # exports and CLI tools (migrate_db, calibrate_export) keep the rollback journal, their files can be copied as is
+queue_index_command = "create index if not exists queue_runnable on queue(done, fails, priority, id)"
+head_telemetry_table_command = ("create table if not exists head_telemetry(id integer primary key autoincrement, " +
+                "timestamp date, " +
+                "cycle_id text, " +
+                "voltage real, " +
+                "temp_head real, " +
+                "temp_pan real, " +
+                "temp_tilt real)")  # pan/tilt head voltage and temperatures (degrees C) during the measurement cycles
+calibrated_spectra_table_command = ("create table if not exists calibrated_spectra(id integer primary key, " +
+                "rep_serial text, " +
+                "int_time real, " +
+                "spectrum blob)")  # id of the measurement, integration time in ms and the 256 calibrated values as little endian float32
+queue_max_fails = 3  # tasks that failed this many times are not tried again
+lock_retries = 5  # number of retries for a write when the db is locked
+lock_retry_delay = 0.05  # seconds before the first retry, doubled for each next retry
+lock_retry_max_delay = 1  # maximum seconds between retries
+default_settings = (  # settings table of a new db (create_db), added to older dbs by add_default_settings
+    ('station_id', "MSO"),
+    ('manual', 1),
+    ('measurements_start_hour', 6),
+    ('measurements_stop_hour', 19),
+    ('max_sun_zenith', 90),
+    ('email_enabled', 1),
+    ('email_recipient', ''),
+    ('email_server_port', ''),
+    ('email_user', ''),
+    ('email_password', ''),
+    ('email_min_level', 'warning'),
+    ('ftp_server', ''),
+    ('ftp_user', ''),
+    ('ftp_password', ''),
+    ('ftp_working_dir', 'hypermaq'),
+    ('head_true_north_offset',180),
+    ('head_calibration', ''),
+    ('head_telemetry_ttl', 60),
+    ('scan_planner', 0),
+    ('trios_calibrate', 0),
+    ('radiance_angle_offset',20),
+    ('irradiance_angle_offset',60),
+    ('keepout_heading_low', 0),
+    ('keepout_heading_high', 0),
+    ('gnss_acquired', 'none'),
+    ('gnss_lat', 51.2),
+    ('gnss_lon', 2.9),
+    ('gnss_qual', 0),
+    ('gnss_mag_var', 0),
+    ('id_last_backup_meas', 0),
+    ('id_last_backup_log', 0),
+    ('system_set_up', 0)
+    )
 log = logging.getLogger("__main__.{}".format(__name__))
 
 
@@ -29,13 +103,62 @@ log = logging.getLogger("__main__.{}".format(__name__))
 """Functions."""
 
 class connection(sqlite3.Connection):
-    def __init__(self, database = database_location, **kwargs):
+    def __init__(self, database = database_location, profile = default_profile, **kwargs):
+        """Opens the db and applies the pragmas of [profile] (a key of connection_profiles or a dict of pragmas)."""
         super(connection, self).__init__(database = database, **kwargs)
         self.__c = self.cursor()  # cursor object
+        self.__spectrum_storage = None  # determined when first needed, see get_spectrum_storage()
+        self.__meas_insert_command = None  # built when first needed, see __get_meas_insert_command()
+        self.__meas_columns = None  # meas_items that are columns of the measurements table, see __get_meas_insert_command()
+        self.__settings = None  # settings cache, see __load_settings()
+        self.__settings_version = None  # PRAGMA data_version when the settings cache was loaded
+        self.__apply_profile(profile)
     
+    def __apply_profile(self, profile):
+        """Sets the pragmas defined in the profile.
+        
+        The busy timeout is set first, so that switching the journal mode waits for other connections.
+        Failing pragmas are logged but don't prevent using the connection.
+        """
+        pragmas = connection_profiles[profile] if not type(profile) == dict else profile
+        for pragma in sorted(pragmas, key = lambda p: p != 'busy_timeout'):
+            try:
+                self.__c.execute('PRAGMA {} = {}'.format(pragma, pragmas[pragma]))
+                self.__c.fetchall()
+            except sqlite3.DatabaseError as e:
+                log.warning('Could not set PRAGMA {} = {}: {}'.format(pragma, pragmas[pragma], e))
+
     def __commit_db(self):
         self.commit()
 
+    def __write(self, func, *args):
+        """Executes func(*args) and commits.
+        
+        If another process holds the lock for longer than the busy timeout, the transaction is rolled back and retried,
+        waiting lock_retry_delay seconds (doubled each retry, max lock_retry_max_delay) in between, max lock_retries times.
+        Other exceptions (and the last lock error) are raised to the caller.
+        Nothing is logged here: the db log handler writes through this function as well.
+        """
+        delay = lock_retry_delay
+        attempt = 0
+        while True:
+            try:
+                func(*args)
+                self.__commit_db()
+                return
+            except Exception as e:
+                self.rollback()
+                locked = isinstance(e, sqlite3.OperationalError) and ('locked' in str(e) or 'busy' in str(e))
+                if attempt >= lock_retries or not locked:
+                    raise
+                attempt += 1
+                sleep(delay)
+                delay = min(delay * 2, lock_retry_max_delay)
+
+    def __set_setting_statements(self, setting, value):
+        self.__c.execute("insert or ignore into settings(setting) VALUES(?)", (setting,))  # creates a new setting (row) if it doesn't exist, else does nothing
+        self.__c.execute("update settings set value = ? where setting = ?", (value, setting))
+
     def __close_db(self):
         self.close()
 
@@ -64,17 +187,17 @@ class connection(sqlite3.Connection):
             log.error(e)
 
     def get_setting(self, setting):
-        '''Returns the value of a setting in the 'settings' database.'''
-        try:
-            self.__c.execute("SELECT value FROM settings WHERE setting = ?", (setting,))
-            reply = self.__c.fetchone()[0]
+        '''Returns the value of a setting in the 'settings' database.
 
-            try:  # check if the value is an integer, if so return it as int
-                return(True, int(reply))
-            except:
-                return(True, reply)
+        Values are served from the settings cache (see __load_settings), integers are returned as int.
+        '''
+        try:
+            settings = self.__load_settings()
+            if not setting.lower() in settings:
+                raise KeyError('not in settings table')
+            return(True, settings[setting.lower()])
 
-        except TypeError as e:
+        except KeyError as e:
             err_str = 'Error while getting setting for {}, is setting in db? {}'.format(setting, e)
             log.error(err_str)
             return(False, 'ERROR (GET_SETTING): ' + err_str)
@@ -84,12 +207,76 @@ class connection(sqlite3.Connection):
             log.error(err_str)
             return(False, 'ERROR (GET_SETTING): ' + err_str)
 
+    def get_optional_setting(self, setting, default):
+        '''Returns (True, value) of a setting that dbs created before it was added may not have, 
+        (True, default) if it's not in the settings table. Only other errors are logged.
+        '''
+        try:
+            return(True, self.__load_settings().get(setting.lower(), default))
+
+        except Exception as e:
+            err_str = 'Error while getting setting for {}: {}'.format(setting, e)
+            log.error(err_str)
+            return(False, 'ERROR (GET_OPTIONAL_SETTING): ' + err_str)
+
+    def add_default_settings(self):
+        '''Adds the default settings (see create_db) that are missing, for dbs created before these were added.
+        Settings that are in the table keep their value. Returns (True, list of added settings) or (False, error message).
+        '''
+        try:
+            self.__c.execute('SELECT setting FROM settings')
+            existing = [s.lower() for (s,) in self.__c.fetchall()]
+            missing = [(s, v) for s, v in default_settings if not s.lower() in existing]
+            if len(missing) > 0:
+                self.__write(self.__c.executemany, "insert or ignore into settings(setting, value) values (?, ?)", missing)
+                self.__settings = None  # read again when needed
+            return(True, [s for s, v in missing])
+
+        except Exception as e:
+            err_str = 'Error while adding default settings: {}'.format(e)
+            log.error(err_str)
+            return(False, 'ERROR (ADD_DEFAULT_SETTINGS): ' + err_str)
+
+    def get_settings(self, settings):
+        '''Returns a dict {setting: value} for each setting in [settings] (list/tuple of names).
+
+        Returns (False, error message) if any of the settings is not in the db.
+        '''
+        try:
+            cached = self.__load_settings()
+            missing = [s for s in settings if not s.lower() in cached]
+            if len(missing) > 0:
+                raise KeyError('not in settings table: {}'.format(', '.join(missing)))
+            return(True, dict((s, cached[s.lower()]) for s in settings))
+
+        except Exception as e:
+            err_str = 'Error while getting settings {}: {}'.format(settings, e)
+            log.error(err_str)
+            return(False, 'ERROR (GET_SETTINGS): ' + err_str)
+
+    def __load_settings(self):
+        """Returns the settings cache, a dict {lower case setting: typed value}.
+
+        The whole settings table is read when the cache is empty or when another connection has committed
+        changes to the db since it was read (PRAGMA data_version changes).
+        Our own changes are written through to the cache by set_setting.
+        """
+        self.__c.execute('PRAGMA data_version')
+        reply = self.__c.fetchone()
+        version = reply[0] if reply else None  # None if not supported by this sqlite version: always reload
+        if self.__settings is None or version is None or version != self.__settings_version:
+            self.__c.execute('SELECT setting, value FROM settings')
+            self.__settings = dict((s.lower(), _typed_setting(v)) for s, v in self.__c.fetchall())
+            self.__settings_version = version
+        return self.__settings
+
     def set_setting(self, setting, value):
         '''Adds or changes settings in the the 'settings' table.'''
         try:
-            self.__c.execute("insert or ignore into settings(setting) VALUES(?)", (setting,))  # creates a new setting (row) if it doesn't exist, else does nothing
-            self.__c.execute("update settings set value = ? where setting = ?", (value, setting))
-            self.__commit_db()
+            self.__write(self.__set_setting_statements, setting, value)
+            if self.__settings is not None:  # write through, as stored (and converted) by sqlite
+                self.__c.execute("SELECT value FROM settings WHERE setting = ?", (setting,))
+                self.__settings[setting.lower()] = _typed_setting(self.__c.fetchone()[0])
 
         except Exception as e:
             err_str = 'Error while setting setting for {}: {}'.format(setting, e)
@@ -102,10 +289,11 @@ class connection(sqlite3.Connection):
 
         Takes argument action to define the type of task. Optional arguments are options to specify additional parameters and priority (default 2)
         Valid "actions": "measure", "set_clock_gnss", "zero".
+        Wakes up the worker (if it's waiting) after adding the task.
         """
         try:
-            self.execute("insert into queue(priority, action, options) values (? ,? ,?)", (priority, action, options))
-            self.__commit_db()
+            self.__write(self.execute, "insert into queue(priority, action, options) values (? ,? ,?)", (priority, action, options))
+            notify_worker()
         except Exception as e:
             err_str = 'Error while adding task ({},{},{}) to queue table: {}'.format(action, priority, options, e)
             log.error(err_str)
@@ -131,14 +319,132 @@ class connection(sqlite3.Connection):
             self.__c.execute("select id, priority, action, options, fails from queue where done == 0 and priority == 2 and fails < 3 order by id limit 1")
             return (True, self.__c.fetchone())
 
+    def claim_next_task(self):
+        """Claims the next runnable task and marks it as in progress.
+
+        The next task is the one with done = 0 and less than queue_max_fails fails, with the lowest priority and then the lowest id.
+        It is claimed by setting done = 2, in one update that only succeeds if nobody else claimed it in the meantime.
+        Returns (True, (id, priority, action, options, fails)), or (True, None) if there's no runnable task.
+        Finish a claimed task with set_task_handled, which sets done to 1 or (if failed) back to 0.
+
+        Done col values: 1 = done, 0 = to be done, 2 = in progress
+        """
+        try:
+            while True:
+                self.__c.execute("select id, priority, action, options, fails from queue where done == 0 and fails < ? order by priority, id limit 1", (queue_max_fails,))
+                task = self.__c.fetchone()
+                if task is None:
+                    return (True, None)
+                self.__write(self.__c.execute, "update queue set done = 2 where id == ? and done == 0", (task[0],))
+                if self.__c.rowcount == 1:
+                    return (True, task)
+                # claimed by another process in between, try the next one
+
+        except Exception as e:
+            err_str = 'Error while claiming next task: {}'.format(e)
+            log.error(err_str)
+            return(False, 'ERROR (CLAIM_NEXT_TASK): ' + err_str)
+
+    @contextmanager
+    def claimed_task(self, task):
+        """Context for the handling of a task returned by claim_next_task.
+
+        If the handling raises an exception, the task is released (done = 0) with one more fail (see set_task_handled)
+        and the exception is raised again, so it is retried until it has failed queue_max_fails times.
+        A task left in progress (eg KeyboardInterrupt) is released by release_claimed_tasks when the worker starts.
+        """
+        try:
+            yield task
+        except Exception:
+            self.set_task_handled(task[0], failed = True, fails = int(task[4]))
+            raise
+
+    def release_claimed_tasks(self):
+        """Sets tasks that are still marked as in progress (done = 2) back to 0.
+        
+        To be used when the worker starts, tasks claimed by a worker that was killed would otherwise never run.
+        """
+        try:
+            self.__write(self.__c.execute, "update queue set done = 0 where done == 2")
+            return (True, self.__c.rowcount)
+
+        except Exception as e:
+            err_str = 'Error while releasing claimed tasks: {}'.format(e)
+            log.error(err_str)
+            return(False, 'ERROR (RELEASE_CLAIMED_TASKS): ' + err_str)
+
+    def archive_tasks(self, keep_days = 7, archive = True):
+        """Removes finished tasks older than [keep_days] from the queue table.
+
+        Finished tasks are done (done = 1) or have failed queue_max_fails times.
+        If archive is True, these are moved to the queue_archive table (created if needed) instead of just deleted.
+        Returns (True, number of removed tasks) or (False, error message).
+        """
+        finished = "(done == 1 or fails >= {}) and timestamp < datetime('now', 'utc', ?)".format(queue_max_fails)
+        age = '-{} days'.format(int(keep_days))
+
+        def statements():
+            if archive:
+                self.execute("insert into queue_archive select * from queue where " + finished, (age,))
+            self.__c.execute("delete from queue where " + finished, (age,))
+
+        try:
+            if archive:
+                self.execute("create table if not exists queue_archive as select * from queue where 0")
+            self.__write(statements)
+            return (True, self.__c.rowcount)
+
+        except Exception as e:
+            err_str = 'Error while archiving tasks: {}'.format(e)
+            log.error(err_str)
+            return(False, 'ERROR (ARCHIVE_TASKS): ' + err_str)
+
+    def upgrade_measurements(self):
+        """Adds the meas_items columns that create_db makes to the measurements table of dbs created before these were added.
+
+        In 'blob' mode the columns are added to the measurements_blob table and the measurements view is made again.
+        Returns (True, list of added columns) or (False, error message).
+        """
+        table = spectrum_table if self.get_spectrum_storage() == 'blob' else 'measurements'
+
+        def statements():
+            for column in added:
+                self.__c.execute("alter table {} add column {} {}".format(table, column, meas_item_types.get(column, '')))
+            if table == spectrum_table:
+                self.__c.execute("drop view measurements")
+                self.__c.execute(_measurements_view_command())
+
+        try:
+            added = [i for i in meas_items if i not in _table_columns(self, table)]
+            if len(added) > 0:
+                self.__write(statements)
+                self.__meas_insert_command = None
+            return (True, added)
+
+        except Exception as e:
+            err_str = 'Error while adding measurement columns: {}'.format(e)
+            log.error(err_str)
+            return(False, 'ERROR (UPGRADE_MEASUREMENTS): ' + err_str)
+
+    def create_indexes(self):
+        """Creates the indexes that create_db makes, for dbs created before these were added."""
+        try:
+            self.__write(self.execute, queue_index_command)
+            return (True, None)
+
+        except Exception as e:
+            err_str = 'Error while creating indexes: {}'.format(e)
+            log.error(err_str)
+            return(False, 'ERROR (CREATE_INDEXES): ' + err_str)
+
     def get_all_tasks(self):
         '''Queries the db for all tasks.
 
-        Queries the 'queue' table in the database_location db for tasks where done = '0'.
+        Queries the 'queue' table in the database_location db for tasks that are not done (done = '0' or in progress).
         Sorting is done first done by priority, then by id (thus order of creation).
         Returns jobs as a tuple of tuples (id, priority, action, options).
         '''
-        self.__c.execute('select priority, id, action, options from queue where done == 0 order by priority asc, id asc')
+        self.__c.execute('select priority, id, action, options from queue where done != 1 order by priority asc, id asc')
         reply = self.__c.fetchall()
 
         return (True, reply)
@@ -191,14 +497,63 @@ class connection(sqlite3.Connection):
         Arguments: source = calling module, logtext = str.
         """
         try:
-            self.execute("insert into logs(level, source, log) values (?, ?, ?)", (level, source, logtext))
-            self.__commit_db()
+            self.__write(self.execute, "insert into logs(level, source, log) values (?, ?, ?)", (level, source, logtext))
         except Exception as e:
             err_str = 'Error while adding log to db: {}'.format(e)
             log.error(err_str)
             return(False, 'ERROR (ADD_LOG): ' + err_str)
         return (True, None)
 
+    def add_logs(self, rows, log_errors = True):
+        """Adds a list of (level, source, logtext) rows into the logs table, in one transaction.
+        log_errors is False for the db log handler, an error logged from here would be sent back to it.
+        """
+        try:
+            self.__write(self.executemany, "insert into logs(level, source, log) values (?, ?, ?)", rows)
+        except Exception as e:
+            err_str = 'Error while adding {} logs to db: {}'.format(len(rows), e)
+            if log_errors:
+                log.error(err_str)
+            return(False, 'ERROR (ADD_LOGS): ' + err_str)
+        return (True, None)
+
+    def add_head_telemetry(self, cycle_id, samples):
+        """Adds the pan/tilt head telemetry of a measurement cycle into the head_telemetry table (created if needed), in one transaction.
+
+        samples is a list of (unix time, dict with 'voltage', 'temp_head', 'temp_pan', 'temp_tilt'), see pthead.pop_telemetry_samples.
+        """
+        if len(samples) == 0:
+            return (True, None)
+
+        try:
+            rows = [(datetime.utcfromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S'), cycle_id, round(p['voltage'], 1),
+                     round(p['temp_head'], 1), round(p['temp_pan'], 1), round(p['temp_tilt'], 1)) for t, p in samples]
+            self.execute(head_telemetry_table_command)
+            self.__write(self.executemany, "insert into head_telemetry(timestamp, cycle_id, voltage, temp_head, temp_pan, temp_tilt) values (?, ?, ?, ?, ?, ?)", rows)
+        except Exception as e:
+            err_str = 'Error while adding {} head telemetry samples to db: {}'.format(len(samples), e)
+            log.error(err_str)
+            return(False, 'ERROR (ADD_HEAD_TELEMETRY): ' + err_str)
+        return (True, None)
+
+    def add_calibrated_spectra(self, rows):
+        """Adds (measurement id, rep_serial, int_time in ms, calibrated spectrum) rows into the calibrated_spectra table (created if needed), in one transaction.
+
+        The calibrated spectrum is an array of 256 values (eg from trippy.trios_calibrate_spectra), stored as little endian float32.
+        """
+        if len(rows) == 0:
+            return (True, None)
+
+        try:
+            rows = [(i, serial, int_time, sqlite3.Binary(spectrum.astype('<f4').tobytes())) for i, serial, int_time, spectrum in rows]
+            self.execute(calibrated_spectra_table_command)
+            self.__write(self.executemany, "insert or replace into calibrated_spectra(id, rep_serial, int_time, spectrum) values (?, ?, ?, ?)", rows)
+        except Exception as e:
+            err_str = 'Error while adding {} calibrated spectra to db: {}'.format(len(rows), e)
+            log.error(err_str)
+            return(False, 'ERROR (ADD_CALIBRATED_SPECTRA): ' + err_str)
+        return (True, None)
+
     def add_meas(self, meas_dict):
         '''Stores the measurement results in the database.
         meas_dict is expected to be a dictionary containing any combination of the following keys:
@@ -224,61 +579,107 @@ class connection(sqlite3.Connection):
             'scan_rep', 
             'rep_error', 
             'rep_unix', 
-            'rep_serial'
+            'rep_serial',
+            'rep_int_time' (integration time in ms, None if unknown, eg TriOS auto integration)
             'data' (containing a list of 255 values)
+        Depending on get_spectrum_storage(), data is stored in the val_NNN columns or packed in the spectrum blob.
+        Returns (True, id of the new measurement).
         '''
         if not type(meas_dict) == dict:
             err_str = 'Error while adding measurement: no dictionary provided'
             log.warning(err_str)
             return(False, 'ERROR (ADD_MEAS): ' + err_str)
 
-        logged_items = ['timestamp', 'valid', 'setup_error', 'cycle_id', 'gnss_acquired', 
-                    'gnss_qual', 'gnss_lat', 'gnss_lon', 'batt_voltage', 'head_voltage',
-                    'head_temp_hpt', 'cycle_scan', 'prot_sensor',
-                    'prot_zenith', 'prot_azimuth', 'sun_heading', 'sun_elevation', 'scan_heading', 
-                    'scan_error', 'scan_rep', 'rep_error', 'rep_unix', 'rep_serial']
-        d = dict()
+        reply = self.add_meas_many([meas_dict])
+        if not reply[0]:
+            return(False, reply[1].replace('ERROR (ADD_MEAS_MANY): ', 'ERROR (ADD_MEAS): '))
+        return (True, reply[1][0])
 
-        for i in logged_items:
-            if i in meas_dict:  # check if it is in the provided dict
-                if i in ('scan_error', 'setup_error'):  # these are lists to accomodate multiple errors
-                    d[i] = ' | '.join(meas_dict[i])  # so join them into a string
-                else: 
-                    d[i] = meas_dict[i]  # store the value from the provided dict
-            else:
-                d[i] = ''
-
-        try:  # add measurement data
-            for i in range(1, len(meas_dict['data']) + 1):
-                d['val_{:03d}'.format(i)] = meas_dict['data'][i-1]
-        except KeyError:  # there's no 'data' key in the dict
-            pass
-
-        # create parts of sqLite command:
-        columns = ''
-        values = []
-        placeholders = ''
-        for i in d:
-            columns += '{}, '.format(i)
-            values.append(d[i])
-            placeholders += '?, '
+    def add_meas_many(self, meas_dicts):
+        """Stores a list of measurement dicts (see add_meas) in the database.
+
+        All rows are inserted with one executemany and committed in one transaction,
+        so storing all repetitions of a scan costs one commit instead of one per repetition.
+        If anything goes wrong, none of the rows are stored.
+        Returns (True, list of the ids of the new measurements).
+        """
+        if not type(meas_dicts) in (list, tuple) or not all(type(m) == dict for m in meas_dicts):
+            err_str = 'Error while adding measurements: no list of dictionaries provided'
+            log.warning(err_str)
+            return(False, 'ERROR (ADD_MEAS_MANY): ' + err_str)
+
+        if len(meas_dicts) == 0:
+            return (True, [])
 
         try:
-            self.execute('insert into measurements({}) values ({})'.format(columns[:-2], placeholders[:-2]), values)
-            self.__commit_db()
+            command = self.__get_meas_insert_command()
+            self.__write(self.executemany, command, [self.__meas_row(m) for m in meas_dicts])
+            last_id = self.execute('select last_insert_rowid()').fetchone()[0]  # the rows of one transaction get consecutive ids
 
         except Exception as e:
-            err_str = 'Error while adding measurement to db: {}'.format(e)
+            err_str = 'Error while adding {} measurement(s) to db: {}'.format(len(meas_dicts), e)
             log.error(err_str)
-            return(False, 'ERROR (ADD_MEAS): ' + err_str)
+            return(False, 'ERROR (ADD_MEAS_MANY): ' + err_str)
 
-        return (True, None)
+        return (True, list(range(last_id - len(meas_dicts) + 1, last_id + 1)))
+
+    def __get_meas_insert_command(self):
+        """Returns the insert command for a measurement row, built once per connection (and storage mode).
+        Columns of meas_items that the table doesn't have (db created before they were added, see upgrade_measurements) are left out.
+        """
+        if self.__meas_insert_command is None:
+            table = spectrum_table if self.get_spectrum_storage() == 'blob' else 'measurements'
+            existing = _table_columns(self, table)
+            self.__meas_columns = [i for i in meas_items if i in existing]
+            if table == spectrum_table:
+                columns = self.__meas_columns + ['spectrum']
+            else:
+                columns = self.__meas_columns + ['val_{:03d}'.format(i) for i in range(1, spectrum_pixels + 1)]
+            self.__meas_insert_command = 'insert into {}({}) values ({})'.format(table, ', '.join(columns), ', '.join(['?'] * len(columns)))
+        return self.__meas_insert_command
+
+    def __meas_row(self, meas_dict):
+        """Returns the values of meas_dict in the column order of __get_meas_insert_command()."""
+        row = []
+        for i in self.__meas_columns:
+            if i in meas_dict:  # check if it is in the provided dict
+                if i in ('scan_error', 'setup_error'):  # these are lists to accomodate multiple errors
+                    row.append(' | '.join(meas_dict[i]))  # so join them into a string
+                else: 
+                    row.append(meas_dict[i])  # store the value from the provided dict
+            else:
+                row.append('')
+
+        data = meas_dict.get('data')
+        if (data is not None) and (len(data) > spectrum_pixels):
+            data = data[:spectrum_pixels]
+        if self.get_spectrum_storage() == 'blob':  # add measurement data as one packed blob
+            row.append(None if data is None else sqlite3.Binary(pack_spectrum(data)))
+        else:  # add measurement data, columns without value are left NULL
+            data = (data.tolist() if hasattr(data, 'tolist') else list(data)) if data is not None else []
+            row.extend(data + [None] * (spectrum_pixels - len(data)))
+        return row
+
+    def get_spectrum_storage(self):
+        """Returns how spectra are stored in this db: 'columns' (val_001 to val_256) or 'blob'.
+
+        In 'blob' mode, 'measurements' is a view on the measurements_blob table.
+        The result is cached once the measurements table/view has been found.
+        """
+        if self.__spectrum_storage is None:
+            self.__c.execute("select type from sqlite_master where name = 'measurements'")
+            reply = self.__c.fetchone()
+            if reply is None:  # no measurements table (yet), don't cache
+                return 'columns'
+            self.__spectrum_storage = 'blob' if reply[0] == 'view' else 'columns'
+        return self.__spectrum_storage
 
     def set_task_handled(self, id=-1, failed = False, fails = 0):
         '''Marks a task in the queue table as done (or adds to the fail counter).
 
         Takes the task id as argument. 
-        Optional argument failed = True adds one to fails and updates task fails in db
+        Optional argument failed = True adds one to fails and updates task fails in db, 
+        and releases the task (done = 0) if it was claimed with claim_next_task.
         '''
         if type(id) != int or id < 0:  # check if a valid id is passed
             log.warning('No valid queue ID provided ({})'.format(id))
@@ -287,10 +688,9 @@ class connection(sqlite3.Connection):
         try:
             # try to set the task to done
             if failed: 
-                self.__c.execute("update queue set fails = ? where id == ?", (fails + 1, id))
+                self.__write(self.__c.execute, "update queue set fails = ?, done = 0 where id == ?", (fails + 1, id))
             else:
-                self.__c.execute("update queue set done = '1' where id == ?", (id,))
-            self.__commit_db()
+                self.__write(self.__c.execute, "update queue set done = '1' where id == ?", (id,))
             return (True, None)
 
         except Exception as e:
@@ -333,8 +733,11 @@ class connection(sqlite3.Connection):
             for line in table_ids:
                 assert len(line) == 3, 'not enough fields, tables_ids should be a list of [table,start_id,stop_id] items'
                 table, start_id, stop_id = line  # unpack list
+                if table == 'measurements' and self.get_spectrum_storage() == 'blob':
+                    table = spectrum_table  # copy the compact rows, the target db gets the same view
                 
-                command = 'INSERT INTO {} SELECT * FROM {}'.format('target_db.' + table, table)  # base command for the export
+                columns = ', '.join(c for c in _table_columns(self, table) if c in _table_columns(self, table, 'target_db'))  # by name, older dbs lack newer columns
+                command = 'INSERT INTO {}({}) SELECT {} FROM {}'.format('target_db.' + table, columns, columns, table)  # base command for the export
                 # need to use '{}'.format(...) instead of ? substitution since that can only be used for variables, not table names
                 substitution = ()
 
@@ -370,7 +773,7 @@ class connection(sqlite3.Connection):
                 tables_dict[i[0]] = 1
             tables = list(tables_dict.keys())
 
-            result = create_db(db_file=target_db_name, id=tables, populate_settings=False)
+            result = create_db(db_file=target_db_name, id=tables, populate_settings=False, spectrum_storage=self.get_spectrum_storage())
             if result[0]:
                 return(True, None)
             else:
@@ -391,11 +794,13 @@ class connection(sqlite3.Connection):
             log.error(err_str)
             return(False, err_str)
 
-def create_db(db_file = database_location, id=('all',), populate_settings=True):
+def create_db(db_file = database_location, id=('all',), populate_settings=True, spectrum_storage='columns'):
     """Creates the database tables or db if it doesn't exist.
 
-    id is a tuple containing the different tables "logs", "queue", "measurements", "protocol", "settings" or "all"
+    id is a tuple containing the different tables "logs", "queue", "measurements", "protocol", "settings", "head_telemetry" or "all"
     db_file should be the full path
+    spectrum_storage is "columns" (one integer column per pixel) or "blob" (packed spectrum in the measurements_blob table, 
+    with a "measurements" view exposing the val_NNN columns)
     Available datatypes: text, integer, real, blob, NULL
     Options:  "not null", "primary key", "autoincrement", "default '' ", "collate {nocase|binary|reverse}" (how sorting is done)
     After colums: unique(combination), check xxx
@@ -406,6 +811,11 @@ def create_db(db_file = database_location, id=('all',), populate_settings=True):
         log.warning(msg)
         return(False, "ERROR (CREATE_DB) "+ msg)
 
+    if spectrum_storage not in spectrum_storage_modes:
+        msg = "invalid spectrum_storage {}. Valid: {}".format(spectrum_storage, spectrum_storage_modes)
+        log.warning(msg)
+        return(False, "ERROR (CREATE_DB) "+ msg)
+
     try:
         db = sqlite3.connect(db_file)
         with db:    # using context manager to automatically commit or roll back changes.
@@ -425,36 +835,18 @@ def create_db(db_file = database_location, id=('all',), populate_settings=True):
                 "timestamp date default (datetime('now', 'utc')), " +
                 "action text not null collate nocase, " +
                 "options text default null collate nocase)")
+                db.execute(queue_index_command)
 
             if any(x in ('measurements', 'all') for x in id):  # measurement table
-                base_command = ("create table measurements(id integer primary key autoincrement, " +
-                "timestamp date default (datetime('now', 'utc')), " +
-                "valid text default 'n' collate nocase, " +
-                "setup_error text collate nocase, " +
-                "cycle_id text, " +
-                "gnss_acquired date,"
-                "gnss_qual integer, " +
-                "gnss_lat real, " +
-                "gnss_lon real, " +
-                "batt_voltage," +
-                "head_voltage real, " +
-                "head_temp_hpt text, " +
-                "cycle_scan integer, " +
-                "prot_sensor text, " +
-                "prot_zenith integer, " +
-                "prot_azimuth integer," +
-                "sun_heading real, " +
-                "sun_elevation real, " +
-                "scan_heading real, " +
-                "scan_error text, " +
-                "scan_rep integer, " +
-                "rep_error text, " +
-                "rep_unix real, " +
-                "rep_serial text, ")
-                for i in range(1,257): 
-                    base_command+= "val_{:03d} integer, ".format(i)  # add the 256 value columns
-                complete_command = base_command[:-2] + ")"  # remove the comma and space at the end, replace by closing brackets
-                db.execute(complete_command)
+                if spectrum_storage == 'blob':
+                    db.execute(_measurements_table_command(spectrum_table) + "spectrum blob)")
+                    db.execute(_measurements_view_command())
+                else:
+                    base_command = _measurements_table_command('measurements')
+                    for i in range(1, spectrum_pixels + 1): 
+                        base_command+= "val_{:03d} integer, ".format(i)  # add the 256 value columns
+                    complete_command = base_command[:-2] + ")"  # remove the comma and space at the end, replace by closing brackets
+                    db.execute(complete_command)
 
             if any(x in ('protocol', 'all') for x in id):  # protocol table
                 db.execute("create table protocol(id integer primary key autoincrement, " +
@@ -469,37 +861,10 @@ def create_db(db_file = database_location, id=('all',), populate_settings=True):
                 db.execute("create table settings(setting text primary key not null collate nocase, " +
                 "value text collate nocase)")
                 if populate_settings:  # don't set default settings if this is a db for exporting data
-                    default_settings = (
-                        ('station_id', "MSO"),
-                        ('manual', 1), 
-                        ('measurements_start_hour', 6), 
-                        ('measurements_stop_hour', 19), 
-                        ('max_sun_zenith', 90), 
-                        ('email_enabled', 1), 
-                        ('email_recipient', ''), 
-                        ('email_server_port', ''), 
-                        ('email_user', ''), 
-                        ('email_password', ''),
-                        ('email_min_level', 'warning'),
-                        ('ftp_server', ''),
-                        ('ftp_user', ''),
-                        ('ftp_password', ''),
-                        ('ftp_working_dir', 'hypermaq'),
-                        ('head_true_north_offset',180), 
-                        ('radiance_angle_offset',20), 
-                        ('irradiance_angle_offset',60), 
-                        ('keepout_heading_low', 0),
-                        ('keepout_heading_high', 0),
-                        ('gnss_acquired', 'none'), 
-                        ('gnss_lat', 51.2), 
-                        ('gnss_lon', 2.9), 
-                        ('gnss_qual', 0), 
-                        ('gnss_mag_var', 0),
-                        ('id_last_backup_meas', 0),
-                        ('id_last_backup_log', 0),
-                        ('system_set_up', 0)
-                        )
-                    db.executemany("insert into settings(setting,value) values (?, ?)", (default_settings))
+                    db.executemany("insert into settings(setting,value) values (?, ?)", default_settings)
+
+            if any(x in ('head_telemetry', 'all') for x in id):  # head_telemetry table
+                db.execute(head_telemetry_table_command)
 
             if 'all' in id:
                 from file_utils import change_own_perm
@@ -517,6 +882,149 @@ def create_db(db_file = database_location, id=('all',), populate_settings=True):
         log.error(err_str)
         return(False, 'ERROR (CREATE_DB) ' + err_str)
 
+def _typed_setting(value):
+    """Settings are stored as text, return integers as int."""
+    try:  # check if the value is an integer, if so return it as int
+        return int(value)
+    except:
+        return value
+
+def _measurements_table_command(table):
+    """Returns the start of the create command for a measurements table, up to the spectrum column(s)."""
+    return ("create table {}(id integer primary key autoincrement, ".format(table) +
+            "timestamp date default (datetime('now', 'utc')), " +
+            "valid text default 'n' collate nocase, " +
+            "setup_error text collate nocase, " +
+            "cycle_id text, " +
+            "gnss_acquired date,"
+            "gnss_qual integer, " +
+            "gnss_lat real, " +
+            "gnss_lon real, " +
+            "batt_voltage," +
+            "head_voltage real, " +
+            "head_temp_hpt text, " +
+            "cycle_scan integer, " +
+            "prot_sensor text, " +
+            "prot_zenith integer, " +  # zenith of the sensor of the row, also for the 'e' rows of a 'b' scan (see measurements2)
+            "prot_azimuth integer," +
+            "sun_heading real, " +
+            "sun_elevation real, " +
+            "scan_heading real, " +
+            "scan_error text, " +
+            "scan_rep integer, " +
+            "rep_error text, " +
+            "rep_unix real, " +
+            "rep_serial text, " +
+            "rep_int_time real, ")
+
+def _table_columns(db, table, schema = 'main'):
+    """Returns the list of column names of [table] (table or view) in [schema] (eg an attached db)."""
+    return [row[1] for row in db.execute("PRAGMA {}.table_info({})".format(schema, table)).fetchall()]
+
+def _measurements_view_command():
+    """Returns the command that creates the 'measurements' view on top of the measurements_blob table.
+
+    The view has the same columns as the 'columns' measurements table, so existing queries and csv exports keep working.
+    SQLite has no function to read a byte from a blob as an integer, but instr() on blobs works bytewise:
+    the position of a single byte in a blob containing all 256 byte values is that byte value + 1.
+    This makes a 'select * from measurements' export several times slower than from the columns table,
+    see benchmarks/bench_meas_storage.py.
+    """
+    byte_values = "X'{}'".format(''.join('{:02X}'.format(i) for i in range(256)))
+    byte_at = "(instr({}, substr(spectrum, {{}}, 1)) - 1)".format(byte_values)
+    columns = ['id'] + list(meas_items)
+    for i in range(1, spectrum_pixels + 1):  # little endian: low byte first
+        value = "case when length(spectrum) >= {} then {} + 256 * {} end".format(2*i, byte_at.format(2*i - 1), byte_at.format(2*i))
+        columns.append("{} as val_{:03d}".format(value, i))
+    return "create view measurements as select {} from {}".format(", ".join(columns), spectrum_table)
+
+def pack_spectrum(data):
+    """Packs a list of (max 256) uint16 values into a little endian byte string.
+    Arrays and trippy.TriosSpectrum objects (anything with tobytes()) are taken as little endian uint16 and not unpacked.
+    """
+    if hasattr(data, 'astype'):  # numpy array
+        return data.astype('<u2').tobytes()
+    if hasattr(data, 'tobytes'):
+        return data.tobytes()
+    return struct.pack('<{}H'.format(len(data)), *data)
+
+def unpack_spectrum(blob):
+    """Unpacks a blob created by pack_spectrum to a tuple of ints."""
+    blob = bytes(blob)
+    return struct.unpack('<{}H'.format(len(blob) // 2), blob)
+
+def convert_spectrum_storage(db_file = database_location, batch_size = 500, vacuum = True):
+    """Converts the measurements table of an existing db from 'columns' to 'blob' storage.
+
+    Rows are copied (keeping their id) to the measurements_blob table with the 256 values packed in one blob,
+    then the measurements table is dropped and replaced by the compatibility view.
+    Trailing NULL values are left out of the blob, the view returns NULL past its end. A NULL value before the last value
+    can't be stored in a blob (0 would read as an incomplete data frame), the conversion then fails and lists these rows.
+    Everything is done in one transaction, so an interrupted conversion leaves the db untouched.
+    If vacuum is True, the db file is vacuumed afterwards to release the freed pages.
+    Returns (True, number of converted rows) or (False, error message).
+    """
+    try:
+        db = connection(db_file)
+        if db.get_spectrum_storage() == 'blob':
+            db.close()
+            return(True, 0)
+
+        items = [i for i in meas_items if i in _table_columns(db, 'measurements')]  # older dbs lack newer columns, these are left NULL
+        value_columns = ['val_{:03d}'.format(i) for i in range(1, spectrum_pixels + 1)]
+        select_command = 'select id, {}, {} from measurements where id > ? order by id limit ?'.format(', '.join(items), ', '.join(value_columns))
+        insert_command = 'insert into {}(id, {}, spectrum) values ({})'.format(spectrum_table, ', '.join(items), ', '.join(['?'] * (len(items) + 2)))
+        n_meta = len(items) + 1  # id and meta columns
+        converted = 0
+        last_id = -1
+        null_pixel_ids = []  # rows with a NULL value before the last value
+
+        db.isolation_level = None  # handle the transaction ourselves, the sqlite3 module would commit before each create/drop
+        db.execute('BEGIN')
+        try:
+            db.execute(_measurements_table_command(spectrum_table) + "spectrum blob)")
+            while True:
+                rows = db.execute(select_command, (last_id, batch_size)).fetchall()
+                if len(rows) == 0:
+                    break
+                batch = []
+                for row in rows:
+                    values = row[n_meta:]
+                    n_values = len(values)
+                    while n_values > 0 and values[n_values - 1] is None:
+                        n_values -= 1
+                    if n_values == 0:  # row without spectrum (failed scan, camera, ...)
+                        spectrum = None
+                    elif None in values[:n_values]:
+                        null_pixel_ids.append(row[0])
+                        continue
+                    else:
+                        spectrum = sqlite3.Binary(pack_spectrum(values[:n_values]))
+                    batch.append(tuple(row[:n_meta]) + (spectrum,))
+                db.executemany(insert_command, batch)
+                converted += len(batch)
+                last_id = rows[-1][0]
+            if null_pixel_ids:
+                raise Exception('{} measurements have NULL pixel values, not converted (ids {}{})'.format(
+                    len(null_pixel_ids), ', '.join(str(i) for i in null_pixel_ids[:10]), ', ...' if len(null_pixel_ids) > 10 else ''))
+            db.execute('drop table measurements')
+            db.execute(_measurements_view_command())
+            db.execute('COMMIT')
+        except:
+            db.execute('ROLLBACK')
+            raise
+
+        if vacuum:
+            db.execute('VACUUM')
+        db.close()
+        log.info('Converted {} measurements in {} to blob storage'.format(converted, db_file))
+        return(True, converted)
+
+    except Exception as e:
+        err_str = 'Error while converting {} to blob storage: {}'.format(db_file, e)
+        log.error(err_str)
+        return(False, 'ERROR (CONVERT_SPECTRUM_STORAGE): ' + err_str)
+
 def export_table_csv(table = 'measurements', date = False):
     '''Exports the [table] to comma-separated-value file .
 
@@ -533,7 +1041,7 @@ def export_table_csv(table = 'measurements', date = False):
     If the target file already exists, a new filename is generated.
     returns (True, path + filename) if successful, (False, error message) if there's an error.'''
 
-    tables_with_timestamp = ('measurements', 'queue', 'logs')
+    tables_with_timestamp = ('measurements', 'queue', 'logs', 'head_telemetry')
     data_path = os.path.join('/', 'home', 'hypermaq', 'data')
     extention = '.csv'
     sqlite3_full_path = '/usr/bin/sqlite3'
@@ -20,18 +20,19 @@ import sys  # only for line number in exception display
 class pthead(object):
     """Pan/tilt head PTU-D48 from FLIR."""
 
-    def __init__(self, ip = '192.168.100.105'):
+    def __init__(self, ip = '192.168.100.105', port = 4000):
         """Init."""
         self.ip = ip
+        self.port = port
 
     def setup_socket(self):
         print('Opening socket...')
         try:
-            self.s = socket.create_connection((self.ip, 4000),5)  # create the socket object
+            self.s = socket.create_connection((self.ip, self.port),5)  # create the socket object
             self.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 ) # disable Nagle's algorithm
             self.__empty_rcv_socket(self.s)
         except Exception as e:
-            message = "Problem setting up socket for pan/tilt head with ip {}: {}".format(self.ip, e)
+            message = "Problem setting up socket for pan/tilt head with ip {} (port {}): {}".format(self.ip, self.port, e)
             print(message)
             return "ERROR (SETUP_SOCKET) " + message
         return True
@@ -194,11 +195,12 @@ class pthead(object):
 """Main loop."""
 
 if __name__ == "__main__":
-    opts, arg = getopt.getopt(sys.argv[1:], '',[])  # returns a list with each option,argument combination
+    opts, arg = getopt.getopt(sys.argv[1:], 'p:',[])  # returns a list with each option,argument combination
     if len(arg) != 1:  # no valid arguments have been provided
         print('Please provide current IP address of head as option (example: "python ./flir_configure.py 192.168.100.198")')
+        print('-p <port> if the head (or ptu_simulator.py) is not on port 4000')
         exit()
-    p = pthead(arg[0])
+    p = pthead(arg[0], port = int(dict(opts).get('-p', 4000)))
     p.setup_socket()
     print('\r\nConfiguring head with ip {}'.format(arg[0]))
     reply = p.configure()
@@ -33,7 +33,7 @@ Adjust holding power, checking current consumption
 import logging
 import socket
 import select
-from time import sleep
+from time import sleep, time
 import sys  # only for line number in exception display
 
 """Define constants."""
@@ -45,18 +45,14 @@ pan_max_speed = 4000
 tilt_max_speed = 4000
 pan_reset_speed = 4000
 tilt_reset_speed = 4000
+ptu_reply_terminator = "\r\n"  # every reply of the head ends with <CR><LF>
+ptu_recv_size = 1024  # bytes asked from the socket per recv call
+telemetry_ttl = 60  # seconds the voltage and temperatures are reused before they are queried again, see get_telemetry()
 
 
 """Define variables."""
-all_clear = "False"  # set to True after succesful initialization and calibration procedure
-pan_resolution = 0  # intial setting of 0 prohibits angular calculations
-tilt_resolution = 0  # intial setting of 0 prohibits angular calculations
 pan_position_north = 0  # offset between True North and pan position 0
 tilt_position_level = 0  # offset between level and tilt position 0
-tilt_low_limit = 1  # setting this to position 1 limits the head to > 0
-tilt_high_limit = 1  # setting this to position 1 limits the head to < 0
-pan_low_limit = 1  # setting this to position 1 limits the head to > 0
-pan_high_limit = 1  # setting this to position 1 limits the head to < 0
 true_north_offset = 0  # heading in degrees when pan is set to position 0. Values: 0 <= x < 360. 90 means head is pointing East.
 level_offset = 0.00  # elevation in degrees when tilt is set to position 0. Values: +/-90. -90 means pointing down. (head coordinate system)
 
@@ -65,33 +61,84 @@ log = logging.getLogger("__main__.{}".format(__name__))
 class pthead(object):
     """Pan/tilt head PTU-D48 from FLIR."""
 
-    def __init__(self, reset=True):
-        """Init."""
+    def __init__(self, reset=True, ip=None, port=None):
+        """Init.
+
+        ip and port of the head default to ptu_ip and ptu_port (eg "127.0.0.1" and the port of a ptu_simulator to run without the head).
+        """
+        self.ip = ip or ptu_ip
+        self.port = port or ptu_port
+        self.s = None  # socket to the head, see setup_socket()
+        self.rx_buffer = ""  # received characters that are not part of a complete reply line yet
+        self.all_clear = False  # set to True after succesful initialization and calibration procedure
+        self.warm_started = False  # True if the last initialization used a stored calibration instead of an axis reset
+        self.head_id = None  # "<firmware version>/<serial number>" of the head, see identify()
+        self.pan_resolution = 0  # intial setting of 0 prohibits angular calculations
+        self.tilt_resolution = 0  # intial setting of 0 prohibits angular calculations
+        self.tilt_low_limit = 1  # setting this to position 1 limits the head to > 0
+        self.tilt_high_limit = 1  # setting this to position 1 limits the head to < 0
+        self.pan_low_limit = 1  # setting this to position 1 limits the head to > 0
+        self.pan_high_limit = 1  # setting this to position 1 limits the head to < 0
+        self.parked_position = None  # (pan, tilt) position in steps where park() left the head, None after a move
+        self.telemetry_ttl = telemetry_ttl
+        self.telemetry = None  # last result of show_parameters()
+        self.telemetry_time = 0  # unix time of self.telemetry
+        self.telemetry_samples = []  # (unix time, show_parameters() dict) of every query, see pop_telemetry_samples()
 
     def __empty_rcv_socket(self, socket):
-        """Uses select.select to check if there's data in the receive buffer on [socket] and clears it."""
+        """Uses select.select to check if there's data in the receive buffer on [socket] and clears it, together with self.rx_buffer."""
+        self.rx_buffer = ""
         while True:
             read, __, __ = select.select([socket],[],[], 0)
             if len(read)==0: 
                 return True
-            socket.recv(1)
+            if socket.recv(ptu_recv_size) == "":  # connection closed, nothing more to clear
+                return True
+
+    def __read_line(self, deadline):
+        """Returns the next reply line from the head (without the <CR><LF> terminator), or None if no complete line was received before deadline.
+
+        The socket is read in chunks of up to ptu_recv_size bytes, waiting in select.select until data arrives or the deadline passes.
+        Characters received after the line are kept in self.rx_buffer for the next call.
+        """
+        while True:
+            end = self.rx_buffer.find(ptu_reply_terminator)
+            if end >= 0:
+                line = self.rx_buffer[:end]
+                self.rx_buffer = self.rx_buffer[end + len(ptu_reply_terminator):]
+                return line
+            remaining = deadline - time()
+            if remaining <= 0:
+                return None
+            read, __, __ = select.select([self.s],[],[], remaining)
+            if len(read) > 0:
+                chunk = self.s.recv(ptu_recv_size)
+                if chunk == "":  # connection closed by the head
+                    return None
+                self.rx_buffer += chunk
 
     def setup_socket(self):
-        global s
         try:
-            s = socket.create_connection((ptu_ip, ptu_port),5)  # create the socket object
-            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 ) # disable Nagle's algorithm
-            self.__empty_rcv_socket(s)
+            self.s = socket.create_connection((self.ip, self.port),5)  # create the socket object
+            self.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 ) # disable Nagle's algorithm
+            self.__empty_rcv_socket(self.s)
         except Exception, e:
-            message = "Problem setting up socket for pan/tilt head: {}".format(e)
+            message = "Problem setting up socket for pan/tilt head at {}:{}: {}".format(self.ip, self.port, e)
             log.error(message, exc_info = True)
             return False
         
         return True
 
-    def initialize(self, reset=True):
+    def initialize(self, reset=True, calibration=None):
         """Initializes the head.
 
+        calibration is a string returned by calibration() after an earlier initialization (eg stored in the settings table).
+        If it was made on this head (same firmware version and serial number) after parking it and the head still reports
+        the parked position, the head is warm started: the auto step and axis reset commands (WTA, WPA, RT, RP, RD)
+        and the PR/TR/PN/PX/TN/TX queries are skipped and the stored resolution and limits are used.
+        A head that lost power reports 0/0 (RD disables the reset on boot), which is not the parked position.
+        Otherwise the head is fully initialized, with axis resets if reset is True.
+
         Commands:
         ED = disable host command echo
         PCE = pan continuous enable, needs limits disables according to manual, but 
@@ -122,8 +169,6 @@ class pthead(object):
 
         Returns "OK" if successful, error message if not.
         """
-        global all_clear
-        global s
 
         initialization_commands = ["FT", "PHL", "THR", "PML", "TMH", "CEC", "PA2000", "TA2000",
         "PU{}".format(pan_max_speed), 
@@ -132,80 +177,137 @@ class pthead(object):
         "TS{}".format(tilt_constant_speed),
         "RPS{}".format(pan_reset_speed),
         "RTS{}".format(tilt_reset_speed),]
-        axis_reset_commands = ["RT", "RP"]  # these will need a longer timeout
-
-        if reset:
-            initialization_commands.extend(["WTA", "WPA", "RT", "RP", "RD"])  # add reset and calibration commands to be executed
-        initialization_commands.extend(["TNU-27999", "TXU9333", "PNU-27067", "PXU27067", "LU"])  # limit settings need to be done after axis resets have been done, so put these at the end of the list
+        reset_commands = ["WTA", "WPA", "RT", "RP", "RD"]  # reset and calibration commands
+        limit_commands = ["TNU-27999", "TXU9333", "PNU-27067", "PXU27067", "LU"]  # limit settings need to be done after axis resets have been done
 
+        self.all_clear = False
+        self.warm_started = False
+        self.parked_position = None
         try:
-            s.send("ED\r")  # disable host command echo
+            self.s.send("ED\r")  # disable host command echo
             sleep(0.6)
-            for i in initialization_commands:
-                self.__empty_rcv_socket(s)
-                s.send(i + "\r")  # send the command
-                if i in axis_reset_commands:  # axis reset/calib commands will trigger !t or !p errors and need more time
-                    reply = self.__await_reply(25, True)
-                else:
-                    reply = self.__await_reply(3)
+            self.__send_initialization_commands(initialization_commands)
+
+            if calibration and self.__load_calibration(calibration):
+                self.__send_initialization_commands(limit_commands)
+                self.warm_started = True
+                self.all_clear = True
+                return "OK"
 
-                if reply <> "OK": raise Exception("Problem while executing command {}".format(i))
-                    
+            self.__send_initialization_commands((reset_commands if reset else []) + limit_commands)
             if not self.__calculate_resolution():  # try to calculate the ratio angle/step
                 raise Exception("Cannot calculate resolution")
             if not self.__get_limits():  # try to get movement limits
                 raise Exception("Cannot get limits")
 
-            all_clear = True
+            self.head_id = self.identify()
+            self.all_clear = True
             return "OK"
 
         except Exception, e:
-            all_clear = False  # no further movement unless a succesful reset has been performed
+            self.all_clear = False  # no further movement unless a succesful reset has been performed
             log.error("{}".format(e), exc_info= True)
             return "ERROR (INITIALIZE): {}".format(e)
 
+    def __send_initialization_commands(self, commands):
+        """Sends the commands one by one, raises an Exception if one is not acknowledged."""
+        axis_reset_commands = ["RT", "RP"]  # these will need a longer timeout
+        for i in commands:
+            self.__empty_rcv_socket(self.s)
+            self.s.send(i + "\r")  # send the command
+            if i in axis_reset_commands:  # axis reset/calib commands will trigger !t or !p errors and need more time
+                reply = self.__await_reply(25, True)
+            else:
+                reply = self.__await_reply(3)
+
+            if reply <> "OK": raise Exception("Problem while executing command {}".format(i))
+
+    def identify(self):
+        """Returns "<firmware version>/<serial number>" of the head (V and VS queries), None if the head did not answer."""
+        firmware = self.send_query("V", 2)
+        serial_number = self.send_query("VS", 2)
+        if firmware[:5] == "ERROR" or serial_number[:5] == "ERROR":
+            return None
+        return "{}/{}".format(firmware, serial_number)
+
+    def calibration(self):
+        """Returns the resolution, limits and parked position of the initialized head as a string, to pass to initialize() at a next start.
+
+        Format: <pan resolution>;<tilt resolution>;<pan low limit>;<pan high limit>;<tilt low limit>;<tilt high limit>;
+        <parked pan>;<parked tilt>;<head id>, the parked position is empty if the head was not parked since its last move.
+        Only a calibration with a parked position allows a warm start, store it again after park().
+        Returns None if the head is not initialized or could not be identified.
+        """
+        if not self.all_clear or self.head_id is None:
+            return None
+        parked_pan, parked_tilt = self.parked_position or ("", "")
+        return "{!r};{!r};{};{};{};{};{};{};{}".format(self.pan_resolution, self.tilt_resolution, self.pan_low_limit, 
+            self.pan_high_limit, self.tilt_low_limit, self.tilt_high_limit, parked_pan, parked_tilt, self.head_id)
+
+    def __load_calibration(self, calibration):
+        """Uses the resolution and limits in calibration (see calibration()) if it was made on this head.
+
+        Returns True if the calibration was loaded and the head reports the stored parked position, False if a full initialization is needed.
+        """
+        try:
+            values = calibration.split(";", 8)
+            if len(values) < 9 or values[6] == "" or values[7] == "":
+                log.info("Stored head calibration has no parked position, head needs a reset")
+                return False
+            head_id = self.identify()
+            if head_id is None or values[8] <> head_id:
+                log.info("Stored head calibration is for head {}, not {}".format(values[8], head_id))
+                return False
+
+            self.head_id = head_id
+            self.pan_resolution, self.tilt_resolution = float(values[0]), float(values[1])
+            self.pan_low_limit, self.pan_high_limit, self.tilt_low_limit, self.tilt_high_limit = [int(i) for i in values[2:6]]
+            parked_position = (int(values[6]), int(values[7]))
+            pos = self.get_position()
+            if (pos["pan_pos"], pos["tilt_pos"]) <> parked_position:
+                log.info("Head position {0[pan_pos]} pan, {0[tilt_pos]} tilt is not the parked position {1[0]} pan, {1[1]} tilt, head needs a reset".format(pos, parked_position))
+                return False
+            self.parked_position = parked_position
+            return True
+
+        except Exception, e:
+            log.warning("Stored head calibration not used: {}".format(e))
+            return False
+
     def __await_reply(self, amount=3, expect_limit_error=False):
         r"""Waits for a fully formed reply.
 
-        Checks the receive buffer for amount seconds, waiting for line starting with "\n*" and ending with "\r\n"
+        Waits at most amount seconds for a line starting with "\n*" and ending with "\r\n"
         If reply is more than 5 characters, the reply (minus leading space) is returned.
         If expect_limit_error is True (used when doing axis reset commands), expected line starts with "\n!" and ends with "\r\n"
         Returns OK if response is as expected, or received response if not.
+        The first complete line decides: any other line is an unexpected answer, returned as soon as it has been received.
         """
-        global s
-        socket_rx_buffer_str = ""
-        amount = amount * 10  # amount is in seconds, but we're going to work in 0.1 second steps
-
-        while amount:  # if timeout has not been passed
-            read, __, __ = select.select([s],[],[], 0)
-            while len(read) > 0:
-                socket_rx_buffer_str += s.recv(1)  # read the buffer, character by character
-                if not expect_limit_error and socket_rx_buffer_str[:2] == "\n*" and socket_rx_buffer_str[-2:] == "\r\n":
-                    # for non axis-reset/calib commands, reply should have these start and endings
-                    if len(socket_rx_buffer_str) < 5:  # if there's no reply (to a query)
-                        return "OK"
-                    else:
-                        return socket_rx_buffer_str[3: -2]  # return the reply
-
-                if expect_limit_error and socket_rx_buffer_str[:2] == "\n!" and socket_rx_buffer_str[-2:] == "\r\n":
-                    # for axis-reset/calib commands, these start/endings are expected
+        line = self.__read_line(time() + amount)
+
+        if line is not None:
+            if not expect_limit_error and line[:2] == "\n*":
+                # for non axis-reset/calib commands, reply should have these start and endings
+                if len(line) < 3:  # if there's no reply (to a query)
                     return "OK"
-                read, __, __ = select.select([s],[],[], 0)
-                
-            amount -= 1
-            sleep(0.1)
+                else:
+                    return line[3:]  # return the reply
+
+            if expect_limit_error and line[:2] == "\n!":
+                # for axis-reset/calib commands, these start/endings are expected
+                return "OK"
+        else:
+            line = self.rx_buffer  # incomplete line at timeout
 
-        message = "received unexpected answer: {}".format(socket_rx_buffer_str[3: -2])
+        message = "received unexpected answer: {}".format(line[3:])
         log.error(message)
         return ("ERROR (AWAIT_REPLY): " + message)
 
     def send_command(self, command, timeout=3):
         """Sends command with argument. Waits for response. Returns True/False if success/fail."""
-        global s
 
-        self.__empty_rcv_socket(s)
-        s.send(command + "\r")  # send the command
-        sleep(0.1)  # needed pause for reply
+        self.__empty_rcv_socket(self.s)
+        self.s.send(command + "\r")  # send the command
         reply = self.__await_reply(timeout)  # for default commands (non-movement/reset), a timeout of 3 seconds is presumed
         if reply == "OK":  # no valid response received
             return "OK"
@@ -215,9 +317,8 @@ class pthead(object):
 
     def send_query(self, query, timeout=3):
         """Sends query. Waits for response. Returns reply if any."""
-        self.__empty_rcv_socket(s)
-        s.send(query + "\r")
-        sleep(0.1)  # needed pause for reply
+        self.__empty_rcv_socket(self.s)
+        self.s.send(query + "\r")
         reply = self.__await_reply(timeout)
         if reply[:5] == "ERROR":
             log.error("Unexpected anwer received for query '{}': {}".format(query, reply)) # debug
@@ -229,18 +330,15 @@ class pthead(object):
         """Calculates the resolution of steps (in degrees per position).
         PR and TR queries return the resolution in arc degrees per position. Divide by 3600 to get degrees per position.
         """
-        global pan_resolution
-        global tilt_resolution
-        global all_clear
 
         try:
             pan_resolution_arc = float(self.send_query("PR", 2))
             tilt_resolution_arc = float(self.send_query("TR", 2))
-            pan_resolution = pan_resolution_arc / 3600  # conversion from degrees arc-seconds to degrees
-            tilt_resolution = tilt_resolution_arc / 3600  # conversion from degrees arc-seconds to degrees
+            self.pan_resolution = pan_resolution_arc / 3600  # conversion from degrees arc-seconds to degrees
+            self.tilt_resolution = tilt_resolution_arc / 3600  # conversion from degrees arc-seconds to degrees
             return True
         except:
-            all_clear = False
+            self.all_clear = False
             log.error("Problems during calculate_resolution")
             return "ERROR (CALCULATE_RESOLUTION): Problems during calculate_resolution"
 
@@ -248,27 +346,22 @@ class pthead(object):
         """Gets the pan/tilt limits, in steps.
         Returns True if successful, error message if failed
         """
-        global tilt_low_limit
-        global tilt_high_limit
-        global pan_low_limit
-        global pan_high_limit
-        global all_clear
 
         try:
             # get limits from device
-            pan_low_limit = int(self.send_query("PN", 2))
-            pan_high_limit = int(self.send_query("PX", 2))
-            tilt_low_limit = int(self.send_query("TN", 2))
-            tilt_high_limit = int(self.send_query("TX", 2))
+            self.pan_low_limit = int(self.send_query("PN", 2))
+            self.pan_high_limit = int(self.send_query("PX", 2))
+            self.tilt_low_limit = int(self.send_query("TN", 2))
+            self.tilt_high_limit = int(self.send_query("TX", 2))
             return True
         except Exception, e:
-            all_clear = False
+            self.all_clear = False
             message = "Problems while getting movement limits: {}".format(e)
             log.error(message)
             return "ERROR " + message
 
     def show_parameters(self):
-        """Returns some parameters and info in a dict.
+        """Returns some parameters and info in a dict (O query), kept as the telemetry of the head (see get_telemetry).
         Items in returned dict: ["voltage"], ["temp_head"}], ["temp_pan"], ["temp_tilt"]
         """
         return_dict = dict()
@@ -279,23 +372,53 @@ class pthead(object):
         return_dict["temp_pan"] = (float(voltage_and_temps[2])-32) /1.8
         return_dict["temp_tilt"] = (float(voltage_and_temps[3])-32) /1.8
 
+        self.telemetry = return_dict
+        self.telemetry_time = time()
+        self.telemetry_samples.append((self.telemetry_time, return_dict))
+        return return_dict
+
+    def telemetry_expired(self):
+        """Returns True if the telemetry is older than telemetry_ttl seconds (or was never queried)."""
+        return self.telemetry is None or not 0 <= time() - self.telemetry_time < self.telemetry_ttl
+
+    def get_telemetry(self):
+        """Returns the voltage and temperatures (dict, see show_parameters), only queried when they have expired (telemetry_ttl).
+        move_position refreshes expired telemetry while the head is moving, so normally this doesn't talk to the head.
+        """
+        if self.telemetry_expired():
+            return self.show_parameters()
+        return self.telemetry
+
+    def pop_telemetry_samples(self):
+        """Returns the list of (unix time, show_parameters() dict) queried since the last call and clears it."""
+        samples, self.telemetry_samples = self.telemetry_samples, []
+        return samples
+
+    def get_axis_dynamics(self):
+        """Returns the speeds (positions per second) and accelerations (positions per second^2) set in the head, in a dict.
+        Items in returned dict: ["pan_speed"], ["tilt_speed"], ["pan_acceleration"], ["tilt_acceleration"] (PS, TS, PA and TA queries)
+        """
+        return_dict = dict()
+        for key, query in (("pan_speed", "PS"), ("tilt_speed", "TS"), ("pan_acceleration", "PA"), ("tilt_acceleration", "TA")):
+            return_dict[key] = float(self.send_query(query))
+
         return return_dict
 
     def pan_degrees(self, degrees):
         """Pan the head [degrees] relative to current position.
         Degrees can be int or float. Timeout passed for the command is 32 seconds.
         """
-        global all_clear
 
         try:
-            if not all_clear: 
+            if not self.all_clear: 
                 raise Exception("Not all clear, perform reset!")
 
-            pan_movement = int(degrees / pan_resolution)  # calculate needed steps to pan "degrees"
+            pan_movement = int(degrees / self.pan_resolution)  # calculate needed steps to pan "degrees"
             current_pan_position = int(self.get_position()["pan_pos"])  # query position before movement
             target_position = current_pan_position + pan_movement
 
-            if pan_low_limit <= target_position <= pan_high_limit:  # end position is within movement limits
+            if self.pan_low_limit <= target_position <= self.pan_high_limit:  # end position is within movement limits
+                self.parked_position = None
                 reply = self.send_command("PO" + str(int(pan_movement)), 32)  # execute pan
             else: 
                 raise Exception("End point not within movement limits")
@@ -322,16 +445,16 @@ class pthead(object):
 
         Degrees can be int or float. Timeout passed for the command is 25 seconds.
         """
-        global all_clear
         try:
-            if not all_clear:
+            if not self.all_clear:
                 raise Exception("Not all clear, perform reset!")
 
-            tilt_movement = int(degrees / tilt_resolution)  # calculate needed steps to tilt "degrees"
+            tilt_movement = int(degrees / self.tilt_resolution)  # calculate needed steps to tilt "degrees"
             current_tilt_position = int(self.get_position()["tilt_pos"])  # query position before movement
             target_position = current_tilt_position + tilt_movement
 
-            if tilt_low_limit <= target_position <= tilt_high_limit:  # end position is within movement limits
+            if self.tilt_low_limit <= target_position <= self.tilt_high_limit:  # end position is within movement limits
+                self.parked_position = None
                 reply = self.send_command("TO" + str(tilt_movement), 20)  # execute tilt
             else:
                raise Exception("End point not within movement limits")
@@ -359,11 +482,13 @@ class pthead(object):
         Heading should be 0 <= heading < 360
         Elevation should be -30 <= elevation <= 90
         If one of (heading, elevation) is not defined, that axis isn't moved.
+        Expired telemetry (see get_telemetry) is queried after the move has started and before awaiting its end (A),
+        so the query overlaps with the move.
         """
 
         commands_list= []
         try:        
-            if not all_clear: raise Exception("Not all clear, perform reset")
+            if not self.all_clear: raise Exception("Not all clear, perform reset")
         
             ## first check heading and elevation
             if heading <> "":  # heading was provided
@@ -372,9 +497,9 @@ class pthead(object):
 
                 if 180 <= float(heading) <= 360:  # first convert 0 - 360 degrees to +/- 180 degrees (and check if reasonable heading was given)
                     heading = heading - 360
-                pan_target_position = int(float(heading) / pan_resolution)  # convert to head position
+                pan_target_position = int(float(heading) / self.pan_resolution)  # convert to head position
 
-                if not pan_low_limit <= pan_target_position <= pan_high_limit:
+                if not self.pan_low_limit <= pan_target_position <= self.pan_high_limit:
                     message = "target heading {:06.2f} (position {}) is out of bounds".format(heading, pan_target_position)
                     logging.warning(message)
                     return "ERROR " + message
@@ -383,9 +508,9 @@ class pthead(object):
             if elevation <> "":
                 if not -90 <= float(elevation) <= 30:  # was a reasonable angle passed?
                     raise Exception("{} is an invalid elevation (should be -90 <= x <= 30)".format(elevation))          
-                tilt_target_position = int(float(elevation) / tilt_resolution)  # convert to head position
+                tilt_target_position = int(float(elevation) / self.tilt_resolution)  # convert to head position
 
-                if not tilt_low_limit <= tilt_target_position <= tilt_high_limit:  # end position is within movement limits
+                if not self.tilt_low_limit <= tilt_target_position <= self.tilt_high_limit:  # end position is within movement limits
                     # raise Exception("target elevation {:05.2f} (position {}) is out of bounds".format(elevation, tilt_target_position)) # end position is outside of movement limits
                     message = "target elevation {:05.2f} (position {}) is out of bounds".format(elevation, tilt_target_position)
                     log.warning(message)
@@ -395,7 +520,10 @@ class pthead(object):
             # at this point, tilt_target_position and pan_target_position have been determined and checked.
             commands_list.append("A")  # last command is to wait until the move has finished
 
+            self.parked_position = None
             for i in commands_list:
+                if i == "A" and self.telemetry_expired():
+                    self.__refresh_telemetry()
                 reply = self.send_command(i, 32)
                 if reply <> "OK": raise Exception("Invalid response from command {}: {}".format(i, reply))
             
@@ -419,18 +547,30 @@ class pthead(object):
             return "ERROR " + message
         
 
+    def __refresh_telemetry(self):
+        """Queries the telemetry, logs a warning instead of raising an exception (the move goes on)."""
+        try:
+            self.show_parameters()
+        except Exception, e:
+            log.warning("Could not refresh head telemetry: {}".format(e))
+
     def park(self):
-        """Pan to zero and tilts to its lowest limit to guard the sensors from fouling."""
+        """Pan to zero and tilts to its lowest limit to guard the sensors from fouling.
+
+        On success the position is kept as parked_position, see calibration().
+        """
         try:
-            park_commands = ("PP0", "TP{}".format(tilt_low_limit), "A")
+            self.parked_position = None
+            park_commands = ("PP0", "TP{}".format(self.tilt_low_limit), "A")
             
             for i in park_commands:
                 reply = self.send_command(i, 30)  # Pan to zero and tilt to lower limits
                 if reply <> "OK": raise Exception("invalid reply from command {}: {}".format(i, reply))
                 
             pos = self.get_position()
-            if not ((int(pos["tilt_pos"]) == tilt_low_limit) and (int(pos["pan_pos"]) == 0)):  # check end position compared to expected end position
+            if not ((int(pos["tilt_pos"]) == self.tilt_low_limit) and (int(pos["pan_pos"]) == 0)):  # check end position compared to expected end position
                 raise Exception("not at correct position after parking, but at {0[tilt_pos]} tilt, {0[pan_pos]} pan".format(pos))
+            self.parked_position = (int(pos["pan_pos"]), int(pos["tilt_pos"]))
             
         except Exception, e:
             log.error("{}".format(e) )  # debug
@@ -448,8 +588,8 @@ class pthead(object):
         """
         pan_position = int(self.send_query("PP"))
         tilt_position = int(self.send_query("TP"))
-        heading = (pan_position * pan_resolution) % 360
-        elevation = tilt_position * tilt_resolution
+        heading = (pan_position * self.pan_resolution) % 360
+        elevation = tilt_position * self.tilt_resolution
 
         pos_dict = dict()
         pos_dict["pan_pos"] = pan_position
@@ -475,9 +615,9 @@ if __name__ == "__main__":
     if head.initialize() == "OK":
         print("\n" + ("#" * 30))
         print("Pan/tilt head initialization successful\n")
-        print("Pan/tilt resolution: {:.8f} / {:.8f} degrees per step".format(pan_resolution, tilt_resolution))
-        print("Pan low/high position limits (degrees): {: 6} ({:06.2f}) / {: 6} ({:06.2f})".format(pan_low_limit, (pan_low_limit * pan_resolution), pan_high_limit, (pan_high_limit * pan_resolution)))
-        print("Tilt low/high position limits (degrees): {: 6} ({:06.2f}) / {: 6} ({:06.2f})".format(tilt_low_limit, (tilt_low_limit * tilt_resolution), tilt_high_limit, (tilt_high_limit * tilt_resolution)))
+        print("Pan/tilt resolution: {:.8f} / {:.8f} degrees per step".format(head.pan_resolution, head.tilt_resolution))
+        print("Pan low/high position limits (degrees): {: 6} ({:06.2f}) / {: 6} ({:06.2f})".format(head.pan_low_limit, (head.pan_low_limit * head.pan_resolution), head.pan_high_limit, (head.pan_high_limit * head.pan_resolution)))
+        print("Tilt low/high position limits (degrees): {: 6} ({:06.2f}) / {: 6} ({:06.2f})".format(head.tilt_low_limit, (head.tilt_low_limit * head.tilt_resolution), head.tilt_high_limit, (head.tilt_high_limit * head.tilt_resolution)))
         print("#" * 30)
 
     else:
@@ -104,7 +104,7 @@ def get_nmea(timeout = 45):
     uart_buffer_str = ""  # will use this a buffer for the incoming data
     valid_gga = []  # list that will hold the valid GGA data
     valid_rmc = []  # list that will hold the valid RMC data
-    timeout = timeout * 2  # using 0.5s sleep time
+    deadline = time.time() + timeout
     global parsed
 
     serport.close()  # reset port, got random "device reports readiness to read but returned no data (device disconnected or multiple access on port?)" errors
@@ -112,37 +112,46 @@ def get_nmea(timeout = 45):
     serport.flushInput()  # clear the input buffer
     
 
-    while timeout:
-        while serport.inWaiting() > 0:  # Loop as long as there are chars in serial port buffer
-            uart_buffer_str += serport.read(1)  # Read from the buffer, one character at a time
-
-            if uart_buffer_str[-2:] == "\r\n":  # If a newline is found
-                full_string = uart_buffer_str.strip()  # Put message without newline chars in variable
-                uart_buffer_str = ""  # Clear the buffer to receive a new line
-
-                if full_string[0:7] == "$GPGGA,":  # Check if it is a GGA message
-                    if __check_checksum(full_string):
-                        if __check_gps_quality(full_string) > 0:  # check the message for checksum errors and invalid fixes
-                            valid_gga = full_string[:-3].split(",")  # store the string as a valid gga message
-
-                if full_string[0:7] == "$GPRMC," and valid_gga <> "":  # we only want to check the RMC message after a valid gps fix
-                    if __check_checksum(full_string):  # Check if it is a (valid) RMC message
-                        valid_rmc = full_string[:-3].split(",")  # store the string as a valid rmc message
-
-                if valid_gga and valid_rmc:  # we have valid gga and rmc messages, so let's parse the data
-                    dt_result = __parse_datetime(valid_gga, valid_rmc)
-                    ch_result = __parse_coordinates_height(valid_gga, valid_rmc)
-                    qu_result = __parse_qual_mag_var(valid_rmc, valid_gga)
-                    if dt_result and ch_result and qu_result:
-                        return parsed
-                    else:
-                        pass
-        time.sleep(0.5)
-        timeout -= 1
+    while time.time() < deadline:
+        uart_buffer_str += __read_waiting()  # Read all chars waiting in the serial port buffer at once
+
+        while "\r\n" in uart_buffer_str:  # Loop over the complete lines in the buffer
+            full_string, uart_buffer_str = uart_buffer_str.split("\r\n", 1)  # Take the first line, keep the rest in the buffer
+            full_string = full_string.strip()  # Put message without newline chars in variable
+
+            if full_string[0:7] == "$GPGGA,":  # Check if it is a GGA message
+                if __check_checksum(full_string):
+                    if __check_gps_quality(full_string) > 0:  # check the message for checksum errors and invalid fixes
+                        valid_gga = full_string[:-3].split(",")  # store the string as a valid gga message
+
+            if full_string[0:7] == "$GPRMC," and valid_gga <> "":  # we only want to check the RMC message after a valid gps fix
+                if __check_checksum(full_string):  # Check if it is a (valid) RMC message
+                    valid_rmc = full_string[:-3].split(",")  # store the string as a valid rmc message
+
+            if valid_gga and valid_rmc:  # we have valid gga and rmc messages, so let's parse the data
+                dt_result = __parse_datetime(valid_gga, valid_rmc)
+                ch_result = __parse_coordinates_height(valid_gga, valid_rmc)
+                qu_result = __parse_qual_mag_var(valid_rmc, valid_gga)
+                if dt_result and ch_result and qu_result:
+                    return parsed
+                else:
+                    pass
         
     return False
 
 
+def __read_waiting():
+    """Returns all chars waiting in the serial port buffer, read at once.
+
+    With nothing waiting, blocks until the first char arrives or the port timeout passes, no fixed sleep needed between reads.
+    """
+    try:
+        waiting = serport.in_waiting
+    except AttributeError:  # pyserial before 3.0 only has inWaiting()
+        waiting = serport.inWaiting()
+    return serport.read(max(1, waiting))
+
+
 
 def __check_checksum(source):
     """NMEA string checksum.
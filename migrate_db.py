@@ -0,0 +1,75 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Converts an existing database to a new storage layout.
+
+Project: Hypermaq
+Dieter Vansteenwegen, VLIZ Belgium
+Copyright?
+
+Options:
+-s: convert the measurements table to blob storage (one packed uint16 spectrum per row instead of 256 val_NNN columns).
+    A 'measurements' view keeps exposing the val_NNN columns for existing queries and exports.
+-u: adds what newer versions of create_db make to an older database (measurement columns such as rep_int_time,
+    default settings such as head_calibration), the worker does this as well when it starts.
+-f: database file (default: /home/hypermaq/data/hypermaq.db)
+-n: don't vacuum the database after the conversion
+
+Stop the worker (and cron jobs using the db) before converting, and make a backup first.
+"""
+import sys  # access to arguments
+import getopt  # tool to parse arguments
+import dbc
+
+
+"""Main"""
+if __name__ == "__main__":
+    try:
+        opts, arg = getopt.getopt(sys.argv[1:], "sunf:")  # returns a list with each option,argument combination
+        if len(opts) == 0:  # no valid options have been provided
+            raise getopt.GetoptError("No valid options have been provided.")
+
+        db_file = dbc.database_location
+        vacuum = True
+        tasks = []
+        for option, argument in opts:
+            if option == "-f":
+                db_file = argument
+            elif option == "-n":
+                vacuum = False
+            elif option == "-s":
+                tasks.append("spectrum_storage")
+            elif option == "-u":
+                tasks.append("upgrade")
+
+        if "upgrade" in tasks:
+            print("Upgrading {}...".format(db_file))
+            db = dbc.connection(db_file)
+            for name, upgrade in (("measurement columns", db.upgrade_measurements), ("default settings", db.add_default_settings)):
+                result = upgrade()
+                if not result[0]:
+                    print(result[1])
+                    exit(1)
+                print("{} added: {}".format(name, ", ".join(result[1]) or "none"))
+            db.close()
+
+        if "spectrum_storage" in tasks:
+            print("Converting measurements in {} to blob storage...".format(db_file))
+            result = dbc.convert_spectrum_storage(db_file, vacuum = vacuum)
+            if result[0]:
+                print("Done, {} measurements converted.".format(result[1]))
+            else:
+                print(result[1])
+                exit(1)
+
+    except getopt.GetoptError:  # invalid arguments have been provided at the command line.
+        print("""
+    Converts an existing database to a new storage layout.
+
+    Options:
+    -s: convert the measurements table to blob storage
+    -u: add what newer versions make to an older database
+    -f: database file (default: {})
+    -n: don't vacuum after the conversion
+
+    Example: "migrate_db.py -s -f /home/hypermaq/data/hypermaq.db"
+    """.format(dbc.database_location))
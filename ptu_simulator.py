@@ -0,0 +1,272 @@
+#! /usr/bin/python
+# coding: utf-8
+"""TCP stand-in for the FLIR PTU-D48E pan/tilt head, to run flir_ptu_d48e and flir_configure without the head.
+
+Project: Hypermaq
+
+Speaks the ASCII protocol as flir_ptu_d48e expects it from the head (echo disabled, terse feedback):
+- a command is <command>[<parameter>] followed by <CR> (or a space)
+- a successful command replies "\\n*\\r\\n", a query "\\n* <result>\\r\\n", an error "\\n! <message>\\r\\n"
+- an axis reset (R, RT, RP) replies with the limit errors of the axes hitting their end stops ("\\n!T\\r\\n", "\\n!P\\r\\n")
+
+Simulated:
+- positions in steps, with the resolution of the head (PR/TR, arc seconds per position)
+- moves (PP, TP, PO, TO) start at once (immediate execution mode) and follow a trapezoidal speed profile
+  with the speed (PS/TS) and acceleration (PA/TA) set, A replies when both axes have stopped.
+  A new target during a move starts a new profile from the current position, from standstill.
+- user limits (PNU/PXU/TNU/TXU, enforced after LU), positions outside of the limits are refused
+- the axis reset runs the axis to its end stop and back to 0 at the reset speed (RPS/RTS)
+- voltage and temperatures (O), firmware version (V) and serial number (VS)
+Hold/move power, step mode and the other configuration commands are accepted and stored, without effect.
+
+time_scale speeds up the simulation: 0.1 makes every move and reset take a tenth of the simulated time.
+
+Usage: python ptu_simulator.py [port]  (default 4000, serves until interrupted)
+"""
+import socket
+import select
+import threading
+from time import sleep, time
+
+"""Define constants."""
+pan_resolution_arc = 23.1428  # seconds arc per position, eighth step (auto step mode)
+tilt_resolution_arc = 11.5714
+factory_limits = {"P": (-27999, 27999), "T": (-27999, 9333)}  # positions of the end stops
+axis_names = {"P": "Pan", "T": "Tilt"}
+settings_defaults = {"S": 1000, "A": 2000, "U": 4000, "B": 0, "RS": 1000}  # desired speed, acceleration, upper speed, base speed, reset speed
+firmware_version = "Pan-Tilt Controller v3.4.3, (C)2010-2014 FLIR Commerical Systems, Inc., All Rights Reserved"
+serial_number = "5010-0154"
+parameters = "12.0,86.0,87.8,89.6"  # voltage, head/pan/tilt temperature (Fahrenheit), as returned by O
+
+
+"""Functions."""
+class axis(object):
+    """Position and motion of one axis, in simulated seconds."""
+
+    def __init__(self, name):
+        self.name = name
+        self.settings = dict(settings_defaults)
+        self.user_limits = factory_limits[name]
+        self.start_position = 0
+        self.target = 0
+        self.start_time = 0.
+        self.speed = 1.
+        self.acceleration = 1.
+
+    def profile(self, distance):
+        """Returns (acceleration time, cruise time) to move distance positions (trapezoidal, or triangular if the speed isn't reached)."""
+        speed, acceleration = float(self.speed), float(self.acceleration)
+        if distance <= speed ** 2 / acceleration:
+            return (distance / acceleration) ** 0.5, 0.
+        return speed / acceleration, distance / speed - speed / acceleration
+
+    def duration(self):
+        """Returns the simulated time the current move takes."""
+        accelerate, cruise = self.profile(abs(self.target - self.start_position))
+        return 2 * accelerate + cruise
+
+    def position(self, now):
+        """Returns the position at simulated time now."""
+        distance = abs(self.target - self.start_position)
+        elapsed = now - self.start_time
+        if distance == 0 or elapsed >= self.duration():
+            return self.target
+        accelerate, cruise = self.profile(distance)
+        if elapsed < accelerate:
+            travelled = self.acceleration * elapsed ** 2 / 2.
+        elif elapsed < accelerate + cruise:
+            travelled = self.acceleration * accelerate ** 2 / 2. + self.acceleration * accelerate * (elapsed - accelerate)
+        else:
+            remaining = 2 * accelerate + cruise - elapsed
+            travelled = distance - self.acceleration * remaining ** 2 / 2.
+        direction = 1 if self.target > self.start_position else -1
+        return int(round(self.start_position + direction * travelled))
+
+    def move(self, target, now, speed = None):
+        """Starts a move to target from the current position."""
+        self.start_position = self.position(now)
+        self.target = target
+        self.start_time = now
+        self.speed = speed or self.settings["S"]
+        self.acceleration = self.settings["A"]
+
+    def end_time(self):
+        return self.start_time + self.duration()
+
+
+class ptu_simulator(threading.Thread):
+    """Serves the simulated head on (host, port), one connection at a time. Port 0 picks a free port, see self.port."""
+
+    def __init__(self, host = "127.0.0.1", port = 0, delay = 0.002, time_scale = 1.):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.delay = delay  # processing time per command (seconds, not scaled)
+        self.time_scale = time_scale
+        self.axes = {"P": axis("P"), "T": axis("T")}
+        self.limits_enforced = False
+        self.echo = True
+        self.settings = dict()  # other configuration commands, as received
+        self.commands = 0  # number of commands handled
+        self.running = True
+        self.t0 = time()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(1)
+        self.host, self.port = self.server.getsockname()[:2]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join()
+        self.server.close()
+
+    def now(self):
+        """Returns the simulated time."""
+        return (time() - self.t0) / self.time_scale
+
+    def wait_until(self, simulated_time):
+        remaining = simulated_time - self.now()
+        if remaining > 0:
+            sleep(remaining * self.time_scale)
+
+    def limits(self, name):
+        return self.axes[name].user_limits if self.limits_enforced else factory_limits[name]
+
+    def reply(self, command):
+        """Returns the reply to one command (without the delimiter)."""
+        command = command.upper()
+        if command == "":
+            return ""
+        self.commands += 1
+        try:
+            return self.handle(command)
+        except ValueError:
+            return "\n! Illegal argument\r\n"
+
+    def handle(self, command):
+        ok = "\n*\r\n"
+        now = self.now()
+        if command in ("ED", "EE"):
+            self.echo = command == "EE"
+            return ok
+        if command == "A":  # await position command completion
+            self.wait_until(max(a.end_time() for a in self.axes.values()))
+            return ok
+        if command in ("R", "RT", "RP"):
+            return self.reset(command[1:] or "TP")
+        if command == "O":
+            return "\n* {}\r\n".format(parameters)
+        if command == "V":
+            return "\n* {}\r\n".format(firmware_version)
+        if command == "VS":
+            return "\n* {}\r\n".format(serial_number)
+        if command in ("LU", "LE"):
+            self.limits_enforced = True
+            return ok
+        if command == "LD":
+            self.limits_enforced = False
+            return ok
+
+        name, rest = command[:1], command[1:]
+        if name in self.axes:
+            a = self.axes[name]
+            if rest == "R":  # resolution
+                return "\n* {}\r\n".format(pan_resolution_arc if name == "P" else tilt_resolution_arc)
+            if rest in ("P", "O") or rest[:1] in ("P", "O") and self.is_number(rest[1:]):
+                if rest in ("P", "O"):  # position query (PO/TO without argument: offset 0)
+                    return "\n* {}\r\n".format(a.position(now)) if rest == "P" else ok
+                target = int(rest[1:]) + (a.position(now) if rest[0] == "O" else 0)
+                low, high = self.limits(name)
+                if not low <= target <= high:
+                    return "\n! Illegal {} position argument\r\n".format(axis_names[name])
+                a.move(target, now)
+                return ok
+            if rest in ("N", "X"):  # limit queries
+                return "\n* {}\r\n".format(self.limits(name)[0 if rest == "N" else 1])
+            if rest[:2] in ("NU", "XU"):
+                value = int(rest[2:])
+                a.user_limits = (value, a.user_limits[1]) if rest[0] == "N" else (a.user_limits[0], value)
+                return ok
+            for key in ("S", "A", "U", "B"):
+                if rest[:1] == key and self.is_number(rest[1:]):
+                    if rest[1:] == "":
+                        return "\n* {}\r\n".format(a.settings[key])
+                    if key == "S" and abs(int(rest[1:])) > a.settings["U"]:
+                        return "\n! Maximum allowable {} speed exceeded\r\n".format(axis_names[name])
+                    a.settings[key] = int(rest[1:])
+                    return ok
+        if command[:3] in ("RPS", "RTS") and self.is_number(command[3:]):
+            a = self.axes[command[1]]
+            if command[3:] == "":
+                return "\n* {}\r\n".format(a.settings["RS"])
+            a.settings["RS"] = int(command[3:])
+            return ok
+        if command in ("FT", "FV", "CEC", "CED", "RD", "RE", "DS", "DR", "DF", "FD", "PCE", "PCD", "I", "S") or \
+                (command[:1] in ("P", "T", "W") and command[1:] in ("HO", "HL", "HR", "MO", "ML", "MR", "MH", "TA", "PA", "TF", "PF", "TH", "PH", "TQ", "PQ", "TE", "PE")):
+            self.settings[command[:2]] = command
+            return ok
+        return "\n! Illegal command\r\n"
+
+    def is_number(self, text):
+        return text == "" or text.lstrip("-").isdigit()
+
+    def reset(self, names):
+        """Runs the axes in names to their end stop and back to 0, replies with their limit errors."""
+        replies = []
+        for name in names:
+            a = self.axes[name]
+            for target in (factory_limits[name][1], 0):
+                a.move(target, self.now(), a.settings["RS"])
+                self.wait_until(a.end_time())
+            replies.append("!" + name)
+        return "\n{}\r\n".format("".join(replies))
+
+    def run(self):
+        while self.running:
+            if not select.select([self.server], [], [], 0.05)[0]:
+                continue
+            conn, __ = self.server.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.serve(conn)
+            conn.close()
+
+    def serve(self, conn):
+        buff = ""
+        while self.running:
+            if not select.select([conn], [], [], 0.05)[0]:
+                continue
+            data = conn.recv(1024)
+            if not data:
+                return
+            buff += data.decode("ascii", "replace")
+            while "\r" in buff or " " in buff:
+                end = min(i for i in (buff.find("\r"), buff.find(" ")) if i >= 0)
+                command, buff = buff[:end].strip(), buff[end + 1:]
+                sleep(self.delay)
+                reply = self.reply(command)
+                if self.echo:
+                    reply = command + reply
+                if reply:
+                    conn.sendall(reply.encode("ascii"))
+
+
+"""Main loop."""
+
+if __name__ == "__main__":
+    import sys
+    simulator = ptu_simulator(host = "0.0.0.0", port = int(sys.argv[1]) if len(sys.argv) > 1 else 4000)
+    print("Simulated PTU-D48E on port {}".format(simulator.port))
+    simulator.start()
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
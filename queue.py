@@ -10,7 +10,7 @@ Copyright?
 
 Provides access to the queue database table. Allows one to add items to the queue, or return what is still queued.
 Options:
--a: add to queue, possible values: measure/set_clock_gnss/set_station_params
+-a: add to queue, possible values: measure/set_clock_gnss/set_station_params/vacuum_db/backup_ftp/archive_tasks
 -l: display a list of all (undone) items in the queue
 -c: used by cron when calling each 30 minutes. First checks if currently between configured start/stop time of day, then adds measurement to queue
 """
@@ -43,7 +43,7 @@ def setup_logging(email = False):
     h1.setLevel(logging.DEBUG)
     h1.setFormatter(logging.Formatter(fmt, datefmt))  
     log.addHandler(h1)  # add both handlers to the logger
-    with connection() as db:
+    with connection(profile = 'station') as db:
         if email and db.get_setting('email_enabled')[1]:
             from worker_libs.log_handlers import buffered_SMTP_Handler
 
@@ -70,7 +70,7 @@ try:
     if len(opts) == 0:  # no valid options have been provided
         raise getopt.GetoptError("No valid options have been provided.")
     
-    with connection() as db: 
+    with connection(profile = 'station') as db: 
         for option, argument in opts:
             """Next we check what option was chosen and execute it."""
 
@@ -98,7 +98,7 @@ try:
                 log = setup_logging(email=False)
                 split_argument = argument.split(",")  # returns a list of all comma-separated fields of the argument: [0] = task, [1] = priority, [2:] are options
                 
-                if not split_argument[0] in ("backup_ftp", "measure", "set_clock_gnss", "set_station_params", "vacuum_db"):  # only these task are possible
+                if not split_argument[0] in ("backup_ftp", "measure", "set_clock_gnss", "set_station_params", "vacuum_db", "archive_tasks"):  # only these task are possible
                     log.warning("No valid task for option -a was provided.")
                     exit()
 
@@ -140,13 +140,14 @@ except getopt.GetoptError:  # invalid arguments have been provided at the comman
     Provides access to the queue database table. Allows one to add items to the queue, or return what is still queued.
     
     Options:
-    -a: add 1 task to the queue, possible values: measure/set_clock_gnss/set_station_params/vacuum_db
+    -a: add 1 task to the queue, possible values: measure/set_clock_gnss/set_station_params/vacuum_db/backup_ftp/archive_tasks
     -l: display a list of all (undone) items in the queue
     -c: used by cron
     -b: used after sytem restart (when clock and location are not yet set up)
 
     To add options and priority to a task (-a), use the argument task,priority,option
     Example: "queue.py -a measure,1,option" 
+    Example: "queue.py -a archive_tasks,2,30" archives finished tasks older than 30 days
     """)
 except KeyboardInterrupt:
     print("(QUEUE) Keyboard interrupt (CTRL+C) detected, now exiting...")
@@ -0,0 +1,71 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of the task claiming in dbc, as used by the worker loop.
+
+Project: Hypermaq
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+
+
+class claimed_task_test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        db_file = os.path.join(self.directory, 'queue.db')
+        dbc.create_db(db_file, id=('queue',))
+        self.db = dbc.connection(db_file)
+        self.db.add_to_queue('measure')
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def task_state(self, id):
+        return self.db.execute('select done, fails from queue where id == ?', (id,)).fetchone()
+
+    def handle_raising(self):
+        """Claims the next task and handles it like the worker loop, with handling that raises."""
+        task = self.db.claim_next_task()[1]
+        try:
+            with self.db.claimed_task(task):
+                self.assertEqual(self.task_state(task[0]), (2, task[4]))  # in progress while handled
+                raise RuntimeError('handling failed')
+        except RuntimeError:
+            pass
+        return task
+
+    def test_raising_task_is_released_with_a_fail(self):
+        task = self.handle_raising()
+        self.assertEqual(self.task_state(task[0]), (0, 1))
+        self.assertEqual(self.db.claim_next_task()[1][0], task[0])  # runnable again
+
+    def test_raising_task_stops_after_max_fails(self):
+        for __ in range(dbc.queue_max_fails):
+            task = self.handle_raising()
+        self.assertEqual(self.task_state(task[0]), (0, dbc.queue_max_fails))
+        self.assertEqual(self.db.claim_next_task(), (True, None))
+
+    def test_exception_is_raised_again(self):
+        task = self.db.claim_next_task()[1]
+        with self.assertRaises(RuntimeError):
+            with self.db.claimed_task(task):
+                raise RuntimeError('handling failed')
+
+    def test_handled_task_is_left_alone(self):
+        task = self.db.claim_next_task()[1]
+        with self.db.claimed_task(task):
+            self.db.set_task_handled(task[0])
+        self.assertEqual(self.task_state(task[0]), (1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of the spectrum storage modes of dbc: the 'blob' table and its 'measurements' view against the 'columns' table.
+
+Project: Hypermaq
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+
+
+def sample_meas(rnd, i):
+    """Returns a meas_dict like the ones stored by the measurement cycle, with pixel values over the full uint16 range."""
+    return {'timestamp': '2020-06-01 12:00:00', 'valid': 'y', 'setup_error': [], 'cycle_id': 'MSO_000001_20200601_120000',
+            'cycle_scan': '01', 'prot_sensor': 'l', 'prot_zenith': 40, 'prot_azimuth': 135, 'scan_error': [],
+            'scan_rep': i % 10 + 1, 'rep_error': '', 'rep_unix': 1591012800.0 + i, 'rep_serial': 'SAM_8166', 'rep_int_time': 256.,
+            'data': [0, 1, 255, 256, 65535] + [rnd.randint(0, 65535) for __ in range(dbc.spectrum_pixels - 5)]}
+
+
+class spectrum_storage_test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rnd = random.Random(1)
+        self.rows = [sample_meas(rnd, i) for i in range(25)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create(self, mode):
+        db_file = os.path.join(self.directory, '{}.db'.format(mode))
+        dbc.create_db(db_file, id=('measurements',), spectrum_storage=mode)
+        db = dbc.connection(db_file)
+        self.assertEqual(db.get_spectrum_storage(), mode)
+        for i in range(0, len(self.rows), 10):
+            self.assertTrue(db.add_meas_many(self.rows[i:i + 10])[0])
+        db.close()
+        return db_file
+
+    def select(self, db_file, command='select * from measurements order by id'):
+        db = dbc.connection(db_file)
+        rows = db.execute(command).fetchall()
+        db.close()
+        return rows
+
+    def test_view_equals_columns_table(self):
+        columns, blob = self.select(self.create('columns')), self.select(self.create('blob'))
+        self.assertEqual(len(columns), len(self.rows))
+        self.assertEqual(blob, columns)
+
+    def test_blob_holds_the_packed_spectrum(self):
+        stored = self.select(self.create('blob'), 'select spectrum from {} order by id'.format(dbc.spectrum_table))
+        self.assertEqual([dbc.unpack_spectrum(r[0]) for r in stored], [tuple(m['data']) for m in self.rows])
+
+    def test_view_values(self):
+        pixels = ', '.join('val_{:03d}'.format(i) for i in range(1, dbc.spectrum_pixels + 1))
+        stored = self.select(self.create('blob'), 'select {} from measurements order by id'.format(pixels))
+        self.assertEqual(stored, [tuple(m['data']) for m in self.rows])
+
+    def test_converted_db_equals_columns_table(self):
+        db_file = self.create('columns')
+        expected = self.select(db_file)
+        self.assertEqual(dbc.convert_spectrum_storage(db_file), (True, len(self.rows)))
+        self.assertEqual(self.select(db_file), expected)
+        db = dbc.connection(db_file)
+        self.assertEqual(db.get_spectrum_storage(), 'blob')
+        db.close()
+
+    def test_converted_short_spectrum(self):
+        self.rows[3]['data'] = self.rows[3]['data'][:100]  # val_101 to val_256 are NULL
+        db_file = self.create('columns')
+        expected = self.select(db_file)
+        self.assertEqual(expected[3][-156:], (None,) * 156)
+        self.assertEqual(dbc.convert_spectrum_storage(db_file), (True, len(self.rows)))
+        self.assertEqual(self.select(db_file), expected)
+
+    def test_null_pixel_is_not_converted(self):
+        db_file = self.create('columns')
+        db = dbc.connection(db_file)
+        db.execute('update measurements set val_010 = NULL where id = 4')
+        db.commit()
+        db.close()
+        expected = self.select(db_file)
+        result = dbc.convert_spectrum_storage(db_file)
+        self.assertFalse(result[0])
+        self.assertIn('1 measurements have NULL pixel values, not converted (ids 4)', result[1])
+        self.assertEqual(self.select(db_file), expected)  # untouched
+        db = dbc.connection(db_file)
+        self.assertEqual(db.get_spectrum_storage(), 'columns')
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of async_db_Handler when writing to the db fails.
+
+Project: Hypermaq
+
+log_handlers is Python 2 code, the tests are skipped on Python 3.
+Usage: python2 -m unittest discover tests
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'worker_libs'))  # worker_libs/__init__ needs the station hardware
+import dbc  # noqa: E402
+
+if sys.version_info[0] == 2:
+    from log_handlers import async_db_Handler  # noqa: E402
+
+
+@unittest.skipIf(sys.version_info[0] > 2, 'log_handlers is Python 2 code')
+class async_db_Handler_test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, 'logs.db')
+        dbc.create_db(self.db_file, id=('queue',))  # no logs table yet: writing fails
+        self.stderr, sys.stderr = sys.stderr, open(os.path.join(self.directory, 'stderr.txt'), 'w+')
+        self.log = logging.getLogger('test_async_db_Handler')
+        self.log.propagate = False
+        self.log.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        self.handler.close()
+        self.log.removeHandler(self.handler)
+        sys.stderr.close()
+        sys.stderr = self.stderr
+        shutil.rmtree(self.directory)
+
+    def add_handler(self, max_buffer=100):
+        self.handler = async_db_Handler(self.db_file, batch_size=100, flush_interval=0.1, max_buffer=max_buffer)
+        self.log.addHandler(self.handler)
+
+    def stored(self):
+        db = dbc.connection(self.db_file)
+        rows = db.execute('select log from logs order by id').fetchall()
+        db.close()
+        return [r[0] for r in rows]
+
+    def stderr_text(self):
+        sys.stderr.seek(0)
+        return sys.stderr.read()
+
+    def test_failed_write_is_retried(self):
+        self.add_handler()
+        for i in range(5):
+            self.log.info('record {}'.format(i))
+        self.handler.flush(timeout=0.3)
+        dbc.create_db(self.db_file, id=('logs',))
+        self.handler.flush(timeout=2)
+        self.assertEqual(self.stored(), ['record {}'.format(i) for i in range(5)])
+        self.assertEqual(self.handler.dropped, 0)
+        self.assertIn('could not write 5 log records', self.stderr_text())
+
+    def test_overflow_is_dropped_and_reported(self):
+        self.add_handler(max_buffer=3)
+        for i in range(5):
+            self.log.info('record {}'.format(i))  # 2 dropped when queued
+        self.handler.flush(timeout=0.3)
+        self.assertEqual(self.handler.dropped, 2)
+        dbc.create_db(self.db_file, id=('logs',))
+        self.handler.flush(timeout=2)
+        self.assertEqual(self.stored(), ['record 0', 'record 1', 'record 2', '2 log records dropped, buffer full'])
+
+    def test_failures_are_not_logged_through_the_handler(self):
+        self.add_handler()
+        dbc_log = logging.getLogger('__main__.dbc')
+        dbc_log.addHandler(self.handler)
+        try:
+            self.log.info('record')
+            time.sleep(0.5)  # a few failed writes
+            dbc.create_db(self.db_file, id=('logs',))
+            self.handler.flush(timeout=2)
+        finally:
+            dbc_log.removeHandler(self.handler)
+        self.assertEqual(self.stored(), ['record'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of trippy.TriosDecoder, the incremental parser of the TriOS serial stream.
+
+Project: Hypermaq
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+
+def make_stream(rnd, n_spectra):
+    """SAM data frames with information frames in between, with many escaped bytes."""
+    stream = b''
+    for i in range(n_spectra):
+        if i % 2 == 0:
+            stream += trippy.trios_make_info(0x8166, firmware=(2, 1))
+        spectrum = [rnd.choice((0x1140, 0x2313, 0x4023, 0x1111, rnd.randint(0, 65535))) for __ in range(256)]
+        stream += trippy.trios_make_spectrum(spectrum, timeflag=(i % 256, 0))
+    return stream
+
+
+def feed(decoder, stream, sizes):
+    """Feeds stream in parts of the given sizes (repeated), returns the packets of all feed() calls."""
+    packets, i, n = [], 0, 0
+    while i < len(stream):
+        packets += decoder.feed(stream[i:i + sizes[n % len(sizes)]])
+        i += sizes[n % len(sizes)]
+        n += 1
+    return packets
+
+
+class trios_decoder_test(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = make_stream(random.Random(1), 6)
+        self.expected = trippy.trios_parse(self.stream)  # whole buffer at once
+        self.assertEqual(len(self.expected), 6 * 8 + 3)
+
+    def test_byte_by_byte(self):
+        decoder = trippy.TriosDecoder()
+        self.assertEqual(feed(decoder, self.stream, [1]), self.expected)
+        self.assertEqual(decoder.packets, self.expected)
+
+    def test_random_parts(self):
+        rnd = random.Random(2)
+        for __ in range(50):
+            sizes = [rnd.randint(1, 100) for __ in range(20)]
+            self.assertEqual(feed(trippy.TriosDecoder(), self.stream, sizes), self.expected, sizes)
+
+    def test_escape_split_over_reads(self):
+        i = self.stream.index(b'@', 10) + 1  # read ends right after an @
+        decoder = trippy.TriosDecoder()
+        packets = decoder.feed(self.stream[:i]) + decoder.feed(self.stream[i:])
+        self.assertEqual(packets, self.expected)
+
+    def test_packet_completed_by_its_last_byte(self):
+        packet = trippy.trios_make_packet(bytes(bytearray(range(64))), framebyte=7)
+        decoder = trippy.TriosDecoder()
+        self.assertEqual(decoder.feed(packet[:-1]), [])
+        self.assertEqual(decoder.feed(packet[-1:]), trippy.trios_parse(packet))
+
+    def test_garbage_before_a_packet_is_skipped(self):
+        decoder = trippy.TriosDecoder()
+        self.assertEqual(decoder.feed(b'\x00\x01xx' + self.stream), self.expected)
+
+    def test_packet_size(self):
+        decoder = trippy.TriosDecoder(packet_size=64)
+        self.assertEqual(feed(decoder, self.stream, [37]), [p for p in self.expected if p['n_databytes'] == 64])
+
+    def test_reset(self):
+        decoder = trippy.TriosDecoder()
+        decoder.feed(self.stream[:100] + b'@')
+        decoder.reset()
+        self.assertEqual(decoder.packets, [])
+        self.assertEqual(decoder.feed(self.stream), self.expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
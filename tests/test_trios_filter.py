@@ -0,0 +1,109 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of trippy.trios_filter and trios_filter_chunk against the original loop/replace implementation.
+
+Project: Hypermaq
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+ALPHABET = bytearray(b'@@@@fgedx#') + bytearray([0x11, 0x13, 0x23, 0x40, 0, 255])  # rich in escapes and partial escapes
+
+
+def reference_filter(sbuff):
+    """trios_filter as it was before the single pass filter: the loop on Python 3, the replace calls on Python 2."""
+    if sys.version_info[0] == 2:
+        filtered = sbuff.replace(b'@f', bytearray.fromhex('11'))
+        filtered = filtered.replace(b'@g', bytearray.fromhex('13'))
+        filtered = filtered.replace(b'@e', bytearray.fromhex('23'))
+        filtered = filtered.replace(b'@d', bytearray.fromhex('40'))
+        return bytes(filtered)
+
+    i = 0
+    filtered = []
+    while i < len(sbuff):
+        b = int(sbuff[i])
+        if (sbuff[i:i+2] == b'@f'):
+            b = int.from_bytes(bytes.fromhex('11'), sys.byteorder)
+            i += 1
+
+        if (sbuff[i:i+2] == b'@g'):
+            b = int.from_bytes(bytes.fromhex('13'), sys.byteorder)
+            i += 1
+
+        if (sbuff[i:i+2] == b'@e'):
+            b = int.from_bytes(bytes.fromhex('23'), sys.byteorder)
+            i += 1
+
+        if (sbuff[i:i+2] == b'@d'):
+            b = int.from_bytes(bytes.fromhex('40'), sys.byteorder)
+            i += 1
+
+        filtered.append(b)
+        i += 1
+    return bytes(filtered)
+
+
+def random_buffer(rnd, n):
+    return bytes(bytearray(rnd.choice(ALPHABET) for __ in range(n)))
+
+
+def random_parts(rnd, sbuff, max_size=8):
+    parts, i = [], 0
+    while i < len(sbuff):
+        n = rnd.randint(1, max_size)
+        parts.append(sbuff[i:i+n])
+        i += n
+    return parts
+
+
+def filter_parts(parts):
+    out, carry = [], b''
+    for part in parts:
+        filtered, carry = trippy.trios_filter_chunk(part, carry)
+        out.append(filtered)
+    return b''.join(out) + carry  # a trailing @ at the end of the stream is kept as is
+
+
+class trios_filter_test(unittest.TestCase):
+
+    def test_escapes(self):
+        self.assertEqual(trippy.trios_filter(b'#@f@g@e@dx'), b'#\x11\x13\x23\x40x')
+
+    def test_random_buffers_match_the_reference(self):
+        rnd = random.Random(1)
+        for __ in range(5000):
+            sbuff = random_buffer(rnd, rnd.randint(0, 64))
+            expected = reference_filter(sbuff)
+            self.assertEqual(trippy.trios_filter(sbuff), expected, sbuff)
+            self.assertEqual(trippy.trios_filter(bytearray(sbuff)), expected, sbuff)
+
+
+class trios_filter_chunk_test(unittest.TestCase):
+
+    def test_escape_split_over_parts(self):
+        self.assertEqual(trippy.trios_filter_chunk(b'ab@'), (b'ab', b'@'))
+        self.assertEqual(trippy.trios_filter_chunk(b'fx', b'@'), (b'\x11x', b''))
+        self.assertEqual(filter_parts([b'@', b'@', b'd', b'@']), b'@\x40@')
+
+    def test_random_parts_match_the_reference(self):
+        rnd = random.Random(2)
+        for __ in range(5000):
+            sbuff = random_buffer(rnd, rnd.randint(0, 64))
+            self.assertEqual(filter_parts(random_parts(rnd, sbuff)), reference_filter(sbuff), sbuff)
+
+    def test_sam_stream_in_serial_reads(self):
+        rnd = random.Random(3)
+        stream = b''.join(trippy.trios_make_spectrum([rnd.randint(0, 65535) for __ in range(256)]) for __ in range(10))
+        self.assertEqual(filter_parts(random_parts(rnd, stream, max_size=64)), reference_filter(stream))
+
+
+if __name__ == '__main__':
+    unittest.main()
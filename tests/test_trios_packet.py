@@ -0,0 +1,113 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of the TriosPacket records of trippy.trios_parse_packet: same fields and values as the dicts they replace.
+
+Project: Hypermaq
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import random
+import struct
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+
+def reference_parse_packet(p):
+    """trios_parse_packet as it was before TriosPacket, returning a dict (verbosity and require_checkbyte left out)."""
+    data = bytearray(p)
+    if data[0] != ord(b'#') or data[-1] != 1:
+        return ()
+    packet = {'checkbyte': data[-1], 'hash': data[0], 'identity1': data[1], 'identity2': data[2], 'module_id': data[3],
+              'framebyte': data[4], 'timeflag1': data[5], 'timeflag2': data[6], 'reserved1': data[5], 'reserved2': data[6]}
+    len_data = 2**((packet['identity1'] & 224) >> 5)
+    packet['n_databytes'] = 2*len_data
+    packet['databytes'] = p[7:7+packet['n_databytes']]
+    packet['data'] = struct.unpack('<'+'H'*len_data, packet['databytes'])
+    packet['frame_type'] = 'data'
+    if packet['framebyte'] == 255:
+        packet['frame_type'] = 'information'
+        packet['serial_lo'] = data[7]
+        packet['serial_hi'] = data[8]
+        packet['firmware_lo'] = data[9]
+        packet['firmware_hi'] = data[10]
+        packet['reserved3'] = data[11]
+        packet['query_data'] = list(data[12:-1])
+        packet['serial_uint16'] = struct.unpack('<H', bytes(data[7:9]))[0]
+        packet['serial'] = hex(packet['serial_uint16'])[2:]
+
+        packet['module_type'] = 'Unknown'
+        snhi = sum([2**i for i in range(11, 16)])
+        to_uint = lambda modules: [sum([iv*2**(15-i) for i, iv in enumerate(module)]) for module in modules]
+        if packet['serial_uint16'] & snhi in to_uint(trippy.sam_modules):
+            packet['module_type'] = 'SAM'
+        elif packet['serial_uint16'] & snhi in to_uint(trippy.com_modules):
+            packet['module_type'] = 'COM'
+            if packet['serial_uint16'] & snhi in to_uint(trippy.ips_modules):
+                packet['module_type'] = 'IPS'
+            if packet['serial_uint16'] & snhi in to_uint(trippy.samip_modules):
+                packet['module_type'] = 'SAMIP'
+        elif packet['serial_uint16'] & snhi in to_uint(trippy.flu_modules):
+            packet['module_type'] = 'FLU'
+    elif packet['framebyte'] == 254:
+        packet['frame_type'] = 'error'
+    return packet
+
+
+class trios_packet_test(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(1)
+        self.data = [trippy.trios_filter(trippy.trios_make_packet(bytes(bytearray(rnd.randint(0, 255) for __ in range(64))), framebyte=f,
+                                                                  timeflag=(rnd.randint(0, 255), rnd.randint(0, 255))))
+                     for f in list(range(8)) + [254]]
+        self.info = [trippy.trios_filter(trippy.trios_make_info((top << 11) + rnd.randint(0, 2047), firmware=(1, 2), query_data=(3, 4, 5)))
+                     for top in range(32)]
+
+    def test_same_as_the_dicts(self):
+        for p in self.data + self.info:
+            old, new = reference_parse_packet(p), trippy.trios_parse_packet(p)
+            self.assertEqual(new.to_dict(), old)
+            self.assertEqual(new, old)
+            self.assertEqual(dict(new.items()), old)
+            self.assertEqual(sorted(new.keys()), sorted(old.keys()))
+            self.assertEqual(len(new), len(old))
+            for key in old:
+                self.assertIn(key, new)
+                self.assertEqual(new[key], old[key], key)
+
+    def test_data_values(self):
+        p = trippy.trios_parse_packet(trippy.trios_filter(trippy.trios_make_packet(struct.pack('<32H', *range(1000, 1032)), framebyte=3)))
+        self.assertEqual(p['data'], tuple(range(1000, 1032)))
+        self.assertEqual(p.data, p['data'])
+        self.assertEqual(p['framebyte'], 3)
+
+    def test_reserved_aliases(self):
+        p = trippy.trios_parse_packet(self.data[0])
+        self.assertEqual(p['reserved1'], p['timeflag1'])
+        self.assertEqual(p['reserved2'], p['timeflag2'])
+        self.assertEqual(p.get('reserved1'), p.timeflag1)
+        self.assertIn('reserved2', p)
+
+    def test_information_fields_only_in_information_frames(self):
+        p = trippy.trios_parse_packet(self.data[0])
+        self.assertNotIn('serial', p)
+        self.assertIsNone(p.get('serial'))
+        self.assertEqual(p.get('module_type', 'none'), 'none')
+        with self.assertRaises(KeyError):
+            p['serial']
+        info = trippy.trios_parse_packet(trippy.trios_filter(trippy.trios_make_info(0x8166)))
+        self.assertEqual((info['serial'], info['module_type'], info['frame_type']), ('8166', 'SAM', 'information'))
+
+    def test_checkbyte(self):
+        p = bytearray(self.data[0])
+        p[-1] = 0
+        self.assertEqual(trippy.trios_parse_packet(bytes(p)), ())
+        self.assertEqual(trippy.trios_parse_packet(bytes(p), require_checkbyte=False)['checkbyte'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
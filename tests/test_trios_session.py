@@ -0,0 +1,55 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of the trippy auto integration (TriosSession.auto_integration), against the SAM emulator.
+
+Project: Hypermaq
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import trippy  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'auto_integration needs numpy')
+class auto_integration_test(unittest.TestCase):
+
+    def setUp(self):
+        self.emulator = trippy.TriosEmulator(signal=3000., delay=0, baudrate=115200)  # int_time 4 is the longest without saturation
+        self.emulator.start()
+        self.session = trippy.TriosSession(self.emulator.port, baudrate=115200, max_time=5)
+
+    def tearDown(self):
+        self.session.close()
+        self.emulator.stop()
+
+    def test_known_int_time_takes_one_acquisition(self):
+        self.session.int_history['sky'] = self.emulator.auto_int_time()
+        ret = self.session.measure(int_time=-1, int_key='sky')
+        self.assertEqual(ret[1][0][0], '')
+        self.assertEqual(self.session.int_times, [self.emulator.auto_int_time()])
+        self.assertEqual(self.session.acquisitions, [1])  # the peak predicts saturation for the next int_time
+
+    def test_search_without_history(self):
+        ret = self.session.measure(int_time=-1, repeat=2, int_key='sky')
+        self.assertEqual([r[0] for r in ret[1]], ['', ''])
+        self.assertEqual(self.session.int_times, [self.emulator.auto_int_time()] * 2)
+        self.assertEqual(self.session.acquisitions[1], 1)  # the second repetition starts from the first
+
+    def test_called_outside_measure(self):
+        self.session.identify()
+        int_it = self.session.auto_integration(int_key='sky')[3]
+        self.assertEqual(int_it, self.emulator.auto_int_time())
+        self.assertGreater(self.session.acquisitions[-1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Tests of the RAMSES spectra made from the SAM data frames (trippy.concat_spectrum).
+
+Project: Hypermaq
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # append: the repo's queue.py would shadow the standard library queue module
+import dbc  # noqa: E402
+import trippy  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'concat_spectrum needs numpy')
+class header_int_time_test(unittest.TestCase):
+
+    def spectrum(self, int_time_code, **kwargs):
+        values = [int_time_code] + [1000 + i for i in range(255)]
+        return trippy.concat_spectrum(trippy.trios_parse(trippy.trios_make_spectrum(values)), **kwargs)
+
+    def test_auto_integration_takes_the_header(self):
+        spectrum = self.spectrum(7, int_time=0)
+        self.assertEqual(spectrum.int_time, 7)
+        self.assertEqual(trippy.trios_int_time_ms(spectrum.int_time), 256)
+
+    def test_fixed_integration_is_kept(self):
+        self.assertEqual(self.spectrum(7, int_time=5).int_time, 5)
+
+    def test_invalid_header_is_unknown(self):
+        self.assertIsNone(self.spectrum(0, int_time=0).int_time)
+        self.assertIsNone(self.spectrum(13, int_time=0).int_time)
+
+    def test_missing_first_frame_is_unknown(self):
+        frames = trippy.trios_parse(trippy.trios_make_spectrum([7] * 256))[1:]  # framebyte 7 lost
+        self.assertIsNone(trippy.concat_spectrum(frames, int_time=0).int_time)
+
+    def test_station_auto_integration(self):
+        """trios_single with the trios auto integration (int_time 0), as the station measures, gets the integration time."""
+        with trippy.TriosEmulator(signal=4000., delay=0) as emulator:
+            ret = trippy.trios_single(emulator.port, int_time=0, repeat=2, baudrate=emulator.baudrate, max_time=5)
+        self.assertFalse(ret[0], ret[1])
+        for error, __, __, data in ret[1]:
+            self.assertEqual(error, '')
+            self.assertEqual(data.int_time, emulator.auto_int_time())
+            self.assertEqual(trippy.trios_int_time_ms(data.int_time), 2. ** (1 + emulator.auto_int_time()))
+
+
+@unittest.skipIf(numpy is None, 'concat_spectrum needs numpy')
+class concat_spectrum_test(unittest.TestCase):
+    """concat_spectrum gives the values of concat_data, for complete spectra and the frame losses of the serial line."""
+
+    def setUp(self):
+        rnd = random.Random(1)
+        self.cases = []
+        for __ in range(50):
+            frames = trippy.trios_parse(trippy.trios_make_spectrum([rnd.randint(0, 65535) for __ in range(256)]))
+            info = trippy.trios_parse(trippy.trios_make_info(0x8166))
+            self.cases += [frames,
+                           info + frames + info,  # SAMIP: frames of other modules in between
+                           frames[:3] + frames[4:] + frames[3:4],  # a frame out of order
+                           frames[:5] + frames[6:] + info,  # a frame lost
+                           frames[:7],  # fewer than 8 packets
+                           []]
+
+    def test_same_values_as_concat_data(self):
+        for packets in self.cases:
+            expected = trippy.concat_data(packets)
+            spectrum = trippy.concat_spectrum(packets)
+            self.assertEqual(list(spectrum), expected)
+            self.assertEqual(spectrum.tolist(), expected)
+            self.assertEqual(len(spectrum), 256)
+            self.assertEqual(spectrum[10:20].tolist(), expected[10:20])
+            self.assertEqual(spectrum[255], expected[255])
+            self.assertEqual(spectrum.n_zero(), expected.count(0))
+            self.assertEqual(spectrum.tobytes(), dbc.pack_spectrum(expected))
+
+    def test_same_rows_stored(self):
+        directory = tempfile.mkdtemp()
+        try:
+            for mode in dbc.spectrum_storage_modes:
+                db_file = os.path.join(directory, '{}.db'.format(mode))
+                dbc.create_db(db_file, id=('measurements',), spectrum_storage=mode)
+                db = dbc.connection(db_file)
+                db.add_meas_many([{'valid': 'y', 'data': trippy.concat_data(p)} for p in self.cases])
+                db.add_meas_many([{'valid': 'y', 'data': trippy.concat_spectrum(p)} for p in self.cases])
+                rows = db.execute('select {} from measurements order by id'.format(', '.join('val_{:03d}'.format(i) for i in range(1, 257)))).fetchall()
+                db.close()
+                self.assertEqual(rows[:len(self.cases)], rows[len(self.cases):])
+                self.assertEqual(rows[:len(self.cases)], [tuple(trippy.concat_data(p)) for p in self.cases])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+from .serial_read import serial_read, serial_waiting
 from .serial_command import serial_command
 from .serial_command_and_parse import serial_command_and_parse
+from .trios_session import TriosSession
 from .trios_single import trios_single
+from .trios_multi import trios_multi, trios_command_and_parse_multi
 
 from .trios_filter import *
 from .trios_parse import *
@@ -8,3 +11,9 @@ from .trios_parse_buffer import *
 from .trios_parse_packet import *
 
 from .concat_data import *
+from .trios_spectrum import TriosSpectrum, concat_spectrum, trios_header_int_time
+from .trios_decoder import TriosDecoder
+from .trios_encode import *
+from .trios_emulator import TriosEmulator
+from .trios_capture import TriosRecorder, trios_capture_records, trios_replay
+from .trios_calibration import calibration_directory, TriosCalibration, trios_calibration, trios_calibrate, trios_calibrate_spectra, trios_read_dat, trios_int_time_ms
@@ -0,0 +1,33 @@
+## serial_read
+## reads all bytes waiting on an open serial connection in bulk, instead of one read(1) call per byte
+## with timeout > 0 and nothing waiting, blocks until the port is readable (select on the file descriptor) or the timeout passes
+## returns a bytearray, or appends to the given buffer
+
+def serial_waiting(ser):
+    ## pyserial 3 has the in_waiting property, older versions only inWaiting()
+    try:
+        return(ser.in_waiting)
+    except AttributeError:
+        return(ser.inWaiting())
+
+def serial_read(ser, timeout=0, buff=None):
+    import select, time
+
+    if buff is None: buff = bytearray()
+
+    n = serial_waiting(ser)
+    if (n == 0) & (timeout > 0):
+        try:
+            fd = ser.fileno()
+        except Exception:
+            fd = None  # no file descriptor (eg a socket:// or loop:// url), wait the timeout instead
+        if fd is None:
+            time.sleep(timeout)
+        else:
+            select.select([fd], [], [], timeout)
+        n = serial_waiting(ser)
+
+    while n > 0:
+        buff += ser.read(n)
+        n = serial_waiting(ser)
+    return(buff)
@@ -0,0 +1,123 @@
+## trios_calibration
+## radiometric calibration of RAMSES spectra, with the TriOS calibration files of each sensor
+##   Cal_<dev>.dat: calibration factor per pixel (second column of [DATA])
+##   Back_<dev>.dat: background B0 and B1 per pixel (second and third column of [DATA])
+## dev is the sensor identity as stored in rep_serial, eg SAM_8166
+## the tables are loaded once into numpy arrays and cached, a changed file (mtime) is loaded again
+##
+## calibration as in the TriOS RAMSES documentation, for counts n and integration time t (ms), t0 = 8192 ms:
+##   M = n / 65535, normalised counts
+##   C = M - (B0 + B1 * t/t0), background corrected
+##   D = C - mean(C over the dark pixels 237-254, 1 based), dark offset corrected
+##   calibrated = D * t0/t / Cal
+## all spectra of a sensor are done in one vectorised pass over an (n spectra, 256 pixels) array
+
+calibration_directory = '/home/hypermaq/data/calibration'
+calibration_t0 = 8192.  # ms
+calibration_dark_pixels = (236, 254)  # 0 based slice of the dark pixels 237-254
+_calibration_cache = {}  # (directory, dev): TriosCalibration
+
+def trios_read_dat(filename):
+    ## reads a TriOS .dat file, returns the [Attributes] as a dict and the [DATA] rows as a numpy array
+    import numpy as np
+    attributes, rows, section = {}, [], None
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('[END]'): section = None
+            elif line.startswith('['): section = line.strip('[]')
+            elif (section == 'Attributes') & ('=' in line):
+                key, value = line.split('=', 1)
+                attributes[key.strip()] = value.strip()
+            elif (section == 'DATA') & (len(line) > 0):
+                rows.append([float(v.replace('+NAN', 'nan').replace('-NAN', 'nan')) for v in line.split()])
+    if len(rows) == 0: raise Exception('No [DATA] in {}'.format(filename))
+    return(attributes, np.array(rows))
+
+class TriosCalibration(object):
+    ## calibration tables of one sensor
+
+    def __init__(self, dev, directory=calibration_directory):
+        import os
+        import numpy as np
+        self.dev = dev
+        self.files = [os.path.join(directory, '{}_{}.dat'.format(kind, dev)) for kind in ('Cal', 'Back')]
+        self.mtimes = [os.path.getmtime(f) for f in self.files]
+
+        attributes, cal = trios_read_dat(self.files[0])
+        back = trios_read_dat(self.files[1])[1]
+        if (len(cal) < 256) | (len(back) < 256): raise Exception('Calibration of {} has less than 256 pixels'.format(dev))
+        self.attributes = attributes
+        self.cal = cal[:256, 1]
+        self.b0 = back[:256, 1]
+        self.b1 = back[:256, 2]
+
+        ## wavelength polynomial of the pixel number (1 based) from the attributes, if present
+        try:
+            c = [float(attributes['c{}s'.format(i)]) for i in range(4)]
+            pixel = np.arange(1, 257, dtype=float)
+            self.wavelength = c[0] + c[1]*pixel + c[2]*pixel**2 + c[3]*pixel**3
+        except (KeyError, ValueError):
+            self.wavelength = None
+
+    def changed(self):
+        import os
+        try:
+            return([os.path.getmtime(f) for f in self.files] != self.mtimes)
+        except OSError:
+            return(True)
+
+    def apply(self, counts, int_time):
+        ## counts: (n, 256) or (256,) array, int_time: integration time in ms, one value or one per spectrum
+        ## returns the calibrated spectra as float64, pixels with a missing calibration factor are nan
+        import numpy as np
+        counts = np.asarray(counts, dtype=float)
+        single = counts.ndim == 1
+        counts = np.atleast_2d(counts)
+        t = np.asarray(int_time, dtype=float).reshape(-1, 1) * np.ones((counts.shape[0], 1))
+        m = counts / 65535.
+        c = m - (self.b0 + self.b1 * (t / calibration_t0))
+        d = c - np.nanmean(c[:, calibration_dark_pixels[0]:calibration_dark_pixels[1]], axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = d * (calibration_t0 / t) / self.cal
+        return(out[0] if single else out)
+
+def trios_calibration(dev, directory=calibration_directory):
+    ## cached calibration of sensor dev, loaded again when a file changed
+    key = (directory, dev)
+    cal = _calibration_cache.get(key)
+    if (cal is None) or cal.changed():
+        cal = TriosCalibration(dev, directory=directory)
+        _calibration_cache[key] = cal
+    return(cal)
+
+def trios_int_time_ms(int_time):
+    ## integration time in ms from the int_time code (1-12) of the measurement command or SAM header, None if unknown
+    if (int_time is None) or (int_time < 1): return(None)
+    return(2.**(1+int_time))
+
+def trios_calibrate(devs, counts, int_times, directory=calibration_directory):
+    ## calibrates a batch of spectra of one or more sensors, eg a measurements export
+    ## devs: sensor identity per spectrum, counts: (n, 256) array, int_times: ms per spectrum
+    ## returns an (n, 256) array, spectra of sensors without calibration files (or int_time) are nan
+    import numpy as np
+    counts = np.asarray(counts, dtype=float)
+    int_times = np.asarray([np.nan if t is None else t for t in int_times], dtype=float)
+    devs = np.asarray(devs)
+    out = np.full(counts.shape, np.nan)
+    for dev in np.unique(devs):
+        rows = np.nonzero(devs == dev)[0]
+        try:
+            cal = trios_calibration(str(dev), directory=directory)
+        except (IOError, OSError):
+            continue  # no calibration for this sensor
+        out[rows] = cal.apply(counts[rows], int_times[rows])
+    return(out)
+
+def trios_calibrate_spectra(spectra, directory=calibration_directory, int_time=None):
+    ## calibrates TriosSpectrum objects (eg the data of the repetitions of a scan) with their dev and int_time
+    ## int_time (ms) overrides the int_time of the spectra, needed for spectra without int_time code (None)
+    import numpy as np
+    if len(spectra) == 0: return(np.zeros((0, 256)))
+    int_times = [int_time if int_time is not None else trios_int_time_ms(s.int_time) for s in spectra]
+    return(trios_calibrate([s.dev for s in spectra], np.vstack([s.values for s in spectra]), int_times, directory=directory))
@@ -0,0 +1,137 @@
+## trios_capture
+## records the raw serial traffic of trippy acquisitions and replays it through the parser
+## to reproduce field parsing problems offline and to benchmark parser changes on station traffic
+##
+## file format (little endian), optionally gzip compressed (detected when reading):
+##   each time a recorder opens the file: magic b'TRIOSCAP' and a version byte
+##   then records: time (double, unix time), kind (byte), port id (byte), length (uint16), length bytes of payload
+##   kind 0: bytes received, 1: bytes sent, 2: port name of the port id (ids are numbered per recorder)
+## files are appended, a gzip file then has several members, which gzip reads as one stream
+
+import struct
+
+capture_magic = b'TRIOSCAP'
+capture_version = 1
+capture_record = struct.Struct('<dBBH')
+capture_kinds = {0: 'rx', 1: 'tx', 2: 'port'}
+
+class TriosRecorder(object):
+    ## opt-in recorder, wrap() an open serial port to record everything that is read from and written to it
+
+    def __init__(self, filename, compress=None):
+        ## compress: gzip the file, by default if the filename ends with .gz
+        import threading
+        if compress is None: compress = filename.endswith('.gz')
+        if compress:
+            import gzip
+            self.f = gzip.open(filename, 'ab')
+        else:
+            self.f = open(filename, 'ab')
+        self.f.write(capture_magic + bytes(bytearray([capture_version])))
+        self.ports = {}
+        self.lock = threading.Lock()  # several ports (threads) can share a recorder
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            if self.f is not None: self.f.close()
+            self.f = None
+
+    def port_id(self, port):
+        if port not in self.ports:
+            self.ports[port] = len(self.ports)
+            self.record(port, str(port).encode('utf-8'), kind=2)
+        return(self.ports[port])
+
+    def record(self, port, data, kind=0, t=None):
+        import time
+        if len(data) == 0: return
+        port_id = self.port_id(port) if kind != 2 else self.ports[port]
+        if t is None: t = time.time()
+        data = bytes(data)
+        with self.lock:
+            if self.f is None: return
+            for i in range(0, len(data), 65535):  # length is an uint16
+                chunk = data[i:i+65535]
+                self.f.write(capture_record.pack(t, kind, port_id, len(chunk)) + chunk)
+
+    def flush(self):
+        with self.lock:
+            if self.f is not None: self.f.flush()
+
+    def wrap(self, ser):
+        return(RecordingSerial(ser, self))
+
+class RecordingSerial(object):
+    ## serial port that records its traffic, everything else is passed to the wrapped port
+
+    def __init__(self, ser, recorder):
+        self._ser = ser
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return(getattr(self._ser, name))
+
+    def read(self, size=1):
+        data = self._ser.read(size)
+        self._recorder.record(self._ser.port, data, kind=0)
+        return(data)
+
+    def write(self, data):
+        self._recorder.record(self._ser.port, data, kind=1)
+        return(self._ser.write(data))
+
+def trios_capture_records(filename):
+    ## yields (time, kind, port, payload) for all records in a capture file, kind is 'rx' or 'tx'
+    f = open(filename, 'rb')
+    if f.read(2) == b'\x1f\x8b':  # gzip
+        import gzip
+        f.close()
+        f = gzip.open(filename, 'rb')
+    else:
+        f.seek(0)
+
+    ports = {}
+    try:
+        while True:
+            head = f.read(capture_record.size)
+            while head[:len(capture_magic)] == capture_magic:  # a recorder opened the file (again), port ids restart
+                head = head[len(capture_magic)+1:] + f.read(len(capture_magic)+1)
+                ports = {}
+            if len(head) == 0: break
+            if len(head) < capture_record.size: raise Exception('Truncated capture record in {}'.format(filename))
+            t, kind, port_id, length = capture_record.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length: raise Exception('Truncated capture record in {}'.format(filename))
+            if kind == 2:
+                ports[port_id] = payload.decode('utf-8')
+            else:
+                yield(t, capture_kinds[kind], ports.get(port_id, port_id), payload)
+    finally:
+        f.close()
+
+def trios_replay(filename, realtime=False, speed=1., require_checkbyte=True, packet_size=None, callback=None):
+    ## feeds the received bytes of a capture file through a TriosDecoder per port
+    ## realtime: wait between the records as in the capture (divided by speed), otherwise at full speed
+    ## callback(time, port, packets) is called with the packets decoded from each record
+    ## returns a dict with the decoded packets per port
+    import time
+    from trippy import TriosDecoder
+
+    decoders = {}
+    start, t0 = time.time(), None
+    for t, kind, port, payload in trios_capture_records(filename):
+        if kind != 'rx': continue
+        if realtime:
+            if t0 is None: t0 = t
+            wait = (t - t0) / speed - (time.time() - start)
+            if wait > 0: time.sleep(wait)
+        if port not in decoders: decoders[port] = TriosDecoder(require_checkbyte=require_checkbyte, packet_size=packet_size)
+        packets = decoders[port].feed(payload)
+        if (callback is not None) & (len(packets) > 0): callback(t, port, packets)
+    return(dict([(port, d.packets) for port, d in decoders.items()]))
@@ -0,0 +1,49 @@
+## TriosDecoder
+## incremental parser for the TriOS serial stream
+## unlike trios_parse, each received byte is filtered and parsed only once:
+## feed() takes the newly read bytes, returns the packets completed by them and keeps only the unconsumed tail
+## an @ at the end of a read is kept until the next read, since it can be the start of an escaped character
+
+class TriosDecoder(object):
+
+    def __init__(self, require_checkbyte=True, packet_size=None):
+        ## packet_size: only keep packets with this many databytes (8 for id packet and 64 for data packet)
+        self.require_checkbyte = require_checkbyte
+        self.packet_size = packet_size
+        self.reset()
+
+    def reset(self):
+        self.packets = []  # all packets decoded since the last reset
+        self._tail = bytearray()  # filtered bytes that don't form a complete packet yet
+        self._escape = b''  # trailing @ of the previous read
+
+    def feed(self, data):
+        from trippy import trios_filter_chunk, trios_parse_packet
+
+        filtered, self._escape = trios_filter_chunk(data, self._escape)
+        self._tail += filtered
+
+        new_packets = []
+        while True:
+            ## trim everything before the starting hash of the next packet
+            start = self._tail.find(b'#')
+            if start < 0:
+                del self._tail[:]
+                break
+            del self._tail[:start]
+
+            ## number of UINT16 values is given by bits 7,6,5 of identity1 (see trios_parse_buffer)
+            if len(self._tail) < 2: break
+            packet_length = 8 + 2*2**((self._tail[1] & 224)>>5)
+            if len(self._tail) < packet_length: break
+
+            p = bytes(self._tail[:packet_length])
+            del self._tail[:packet_length]
+            pret = trios_parse_packet(p, require_checkbyte=self.require_checkbyte)
+            if len(pret) > 0:  # if something goes wrong in trios_parse_packet, it returns empty
+                if self.packet_size is not None:
+                    if pret['n_databytes'] != self.packet_size: continue  # SAMIP sometimes sends 9 instead of 8, throw away
+                new_packets.append(pret)
+
+        self.packets += new_packets
+        return(new_packets)
@@ -0,0 +1,144 @@
+## TriosEmulator
+## plays a SAM (or SAMIP) module on a pseudo terminal, to run trios_single, TriosSession or the measurement cycle without a sensor
+## answers the B0 serial number query with an information frame and the A8 measurement command with 8 data frames
+## after the integration time, paced at the baudrate, with # framing and @ escapes as the real instrument
+## the integration time is set with the 78 05 command (0 = auto: the longest time without saturation)
+## counts are dark + signal * 2**int_time, clipped at 65535 (saturation), the first value is the header with the int_time code
+## optional faults: dropped and corrupted frames, and for a SAMIP the interleaved frames of the IP module
+##
+## usage:
+##   with TriosEmulator(signal=40.) as emulator:
+##       trios_single(emulator.port)
+
+import threading
+
+class TriosEmulator(threading.Thread):
+
+    def __init__(self, serial_number=None, samip=False, signal=40., dark=1500, baudrate=9600, 
+                 delay=0.01, drop_rate=0., corrupt_rate=0., seed=None):
+        ## serial_number: 16 bit serial, default 0x8166 (SAM_8166) or 0x5050 (SAMIP_5050)
+        ## signal: counts per 2**int_time, a number or a list of 256 values
+        ## delay: processing time after the integration, before the first frame is sent
+        ## drop_rate, corrupt_rate: probability that a frame is not sent, or sent with a wrong byte and checkbyte
+        import os, pty, random, tty
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.samip = samip
+        self.serial_number = serial_number if serial_number is not None else (0x5050 if samip else 0x8166)
+        self.signal = signal
+        self.dark = dark
+        self.baudrate = baudrate
+        self.delay = delay
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.random = random.Random(seed)
+        self.int_time = 0
+        self.commands = 0  # number of commands received
+        self.measurements = 0  # number of spectra sent
+        self.last_byte = 0  # time the last byte of the last reply was written
+        self.running = True
+
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def __enter__(self):
+        self.start()
+        return(self)
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stop(self):
+        import os
+        self.running = False
+        if self.is_alive(): self.join()
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def spectrum(self, int_time):
+        ## counts for integration time int_time (1-12), as a list of 256 ints, the first one is the int_time header
+        signal = self.signal if isinstance(self.signal, (list, tuple)) else [self.signal]*256
+        return([int_time] + [min(65535, int(self.dark + s * 2**int_time)) for s in signal[1:]])
+
+    def auto_int_time(self):
+        for int_time in range(12, 0, -1):
+            if max(self.spectrum(int_time)) < 65535: return(int_time)
+        return(1)
+
+    def frames(self, packets):
+        ## applies the faults and interleaves the SAMIP frames
+        from trippy import trios_make_packet, trios_make_info
+        out = []
+        for p in packets:
+            if self.samip and (self.random.random() < 0.5):  # IP module data frame
+                out.append(trios_make_packet(bytes(bytearray(self.random.randint(0, 255) for __ in range(16))), module_id=0x00))
+            if self.random.random() < self.drop_rate: continue
+            if self.random.random() < self.corrupt_rate:
+                p = self.corrupt(p)
+            out.append(p)
+        if self.samip:  # the IP module reports itself
+            out.append(trios_make_info(0x5050, module_id=0x00))
+        return(out)
+
+    def corrupt(self, p):
+        ## changes one data byte and the checkbyte, without touching the # and @ framing
+        p = bytearray(p)
+        framing = bytearray(b'#@fged')
+        candidates = [i for i in range(7, len(p)-1) if (p[i] not in framing) and (p[i-1] != 0x40) and ((p[i] ^ 1) not in framing)]
+        if len(candidates) > 0:
+            i = self.random.choice(candidates)
+            p[i] ^= 1
+        p[-1] = 0
+        return(bytes(p))
+
+    def send(self, data):
+        import os, time
+        chunk = 16
+        for i in range(0, len(data), chunk):
+            if i + chunk >= len(data): self.last_byte = time.time()
+            os.write(self.master, data[i:i+chunk])
+            time.sleep(len(data[i:i+chunk]) * 10. / self.baudrate)  # 10 bits per byte
+
+    def handle(self, cmd):
+        ## cmd is one 8 byte command: 23 ips 00 address command p1 p2 01
+        import time
+        from trippy import trios_make_spectrum, trios_make_info
+        self.commands += 1
+        address, command, p1, p2 = cmd[3], cmd[4], cmd[5], cmd[6]
+        if (address == 0x30) & (command == 0x78) & (p1 == 0x05):
+            self.int_time = p2
+        elif (address == 0x80) & (command == 0xb0):
+            self.send(b''.join(self.frames([trios_make_info(self.serial_number, firmware=(2, 1))])))
+        elif (address == 0x80) & (command == 0xa8):
+            int_time = self.int_time if self.int_time > 0 else self.auto_int_time()
+            time.sleep(2**(1+int_time) / 1000. + self.delay)
+            data = trios_make_spectrum(self.spectrum(int_time))
+            packets = [data[i:j] for i, j in zip(self.frame_starts(data), self.frame_starts(data)[1:] + [len(data)])]
+            self.send(b''.join(self.frames(packets)))
+            self.measurements += 1
+
+    def frame_starts(self, data):
+        ## start of each packet in an escaped stream (# is always escaped inside a packet)
+        return([i for i in range(len(data)) if data[i:i+1] == b'#'])
+
+    def run(self):
+        import os, select
+        buff = bytearray()
+        while self.running:
+            if not select.select([self.master], [], [], 0.05)[0]: continue
+            try:
+                buff += os.read(self.master, 1024)
+            except OSError:
+                break
+            while True:
+                start = buff.find(b'#')
+                if (start < 0) | (len(buff) - max(start, 0) < 8):
+                    if start < 0: del buff[:]
+                    break
+                cmd = buff[start:start+8]
+                del buff[:start+8]
+                self.handle(cmd)
@@ -0,0 +1,42 @@
+## trios_encode
+## builds packets the way the TriOS instruments send them, to test and benchmark the parsers without a sensor
+## inverse of trios_filter/trios_parse_packet: first byte is the hash, then the (escaped) header, data and checkbyte
+## frame layout: # identity1 identity2 module_id framebyte timeflag1 timeflag2 [databytes] checkbyte
+
+def trios_escape(sbuff):
+    ## replaces the control characters that trios_filter restores
+    ## 11 -> @f, 13 -> @g, 23 -> @e, 40 -> @d
+    escapes = {0x11: b'@f', 0x13: b'@g', 0x23: b'@e', 0x40: b'@d'}
+    out = bytearray()
+    for b in bytearray(sbuff):
+        if b in escapes: out += escapes[b]
+        else: out.append(b)
+    return(bytes(out))
+
+def trios_make_packet(databytes, framebyte=0, module_id=0x80, identity2=0, timeflag=(0, 0), checkbyte=1):
+    ## databytes should be 2, 4, ..., 256 bytes (1 to 128 UINT16 values)
+    ## the number of values is encoded in bits 7,6,5 of identity1 as a power of two
+    import math
+    n_values = len(databytes) // 2
+    identity1 = int(round(math.log(n_values, 2))) << 5
+    if 2*2**(identity1 >> 5) != len(databytes):
+        raise Exception('Invalid number of databytes: {}'.format(len(databytes)))
+    header = bytearray([identity1, identity2, module_id, framebyte, timeflag[0], timeflag[1]])
+    return(b'#' + trios_escape(bytes(header) + bytes(databytes) + bytes(bytearray([checkbyte]))))
+
+def trios_make_spectrum(spectrum, module_id=0x80, timeflag=(0, 0)):
+    ## builds the 8 data frames for a 256 value spectrum, in the order the SAM sends them
+    ## framebyte 7 holds values 1-32, framebyte 0 values 225-256 (see concat_data)
+    import struct
+    out = b''
+    for framebyte in range(7, -1, -1):
+        j = 7-framebyte
+        values = spectrum[j*32:(j+1)*32]
+        out += trios_make_packet(struct.pack('<32H', *values), framebyte=framebyte, module_id=module_id, timeflag=timeflag)
+    return(out)
+
+def trios_make_info(serial, firmware=(0, 0), module_id=0x80, query_data=(0, 0, 0)):
+    ## builds the information frame (framebyte 255) that is the reply to the B0 serial number query
+    ## serial is the 16 bit serial number, eg 0x8166 for SAM_8166 (bits 15-11 give the module type)
+    databytes = bytearray([serial & 255, serial >> 8, firmware[0], firmware[1], 0] + list(query_data))
+    return(trios_make_packet(bytes(databytes), framebyte=255, module_id=module_id))
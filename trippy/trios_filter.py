@@ -6,8 +6,15 @@
 ## @d -> 40
 ## does not work in the reverse way for sending commands to TriOS
 ## last modifications QV 2018-05-31 added test for Python 2 and changed bytes to bytesarray for Python 2
+## 2026-10-17 single pass regex substitution is now the default, loop=True is kept as the reference implementation
+##            added trios_filter_chunk for streams that are read in parts
 
-def trios_filter(sbuff, loop=True):
+import re
+
+trios_escapes = {b'@f': b'\x11', b'@g': b'\x13', b'@e': b'\x23', b'@d': b'\x40'}
+trios_escape_pattern = re.compile(b'@[fged]')
+
+def trios_filter(sbuff, loop=False):
     import sys
 
     if sys.version_info[0] == 2: loop=False
@@ -38,8 +45,15 @@ def trios_filter(sbuff, loop=True):
             i+=1
         return(bytes(filtered))
     else:
-        filtered=sbuff.replace(b'@f', bytearray.fromhex('11'))
-        filtered=filtered.replace(b'@g', bytearray.fromhex('13'))
-        filtered=filtered.replace(b'@e', bytearray.fromhex('23'))
-        filtered=filtered.replace(b'@d', bytearray.fromhex('40'))
+        ## one left to right pass, like the loop: an escape is never the second character of another escape
+        filtered = trios_escape_pattern.sub(lambda m: trios_escapes[m.group(0)], bytes(sbuff))
     return(filtered)
+
+## filter a part of a stream
+## a trailing @ can be the start of an escape that continues in the next part
+## returns the filtered part and the carry (empty or @) to prepend to the next part
+def trios_filter_chunk(sbuff, carry=b''):
+    sbuff = carry + bytes(sbuff)
+    if sbuff[-1:] == b'@':
+        return(trios_filter(sbuff[:-1]), b'@')
+    return(trios_filter(sbuff), b'')
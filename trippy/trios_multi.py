@@ -0,0 +1,112 @@
+## trios_multi
+## identifies the SAM modules on several serial ports and measures them at the same time
+## the commands are sent to all ports back to back (common trigger) and the replies are read with one select loop
+## returns [True, error_message] if a port or instrument can't be initialised, otherwise [False, data_list]
+## data_list has one element per repetition, with for each port (in the order given): [error_message, device, time, [data]]
+## time is the common trigger time, so the measurements of one repetition can be linked
+## data is a TriosSpectrum (uint16 array with device, time and integration time)
+## only the trios integration modes (int_time 0 = auto, >0 fixed) are supported, the trippy auto int (-1) is done per sensor with trios_single
+## ports can also be TriosSession objects, these are left open and their cached identity is used
+
+def trios_command_and_parse_multi(sers, cmd_hex, req_packets, max_time=20, packet_size=None,
+                                  sleep=0.25, verbosity=0, require_checkbyte=True):
+    ## sends cmd_hex (one command for all, or a list with a command per port) to all ports, 
+    ## then reads until each port has req_packets packets or max_time passes
+    ## returns the trigger time and a list with the packets of each port
+    import select, time
+    from trippy import TriosDecoder, serial_read
+
+    if not isinstance(cmd_hex, (list, tuple)): cmd_hex = [cmd_hex]*len(sers)
+    cmds = [bytearray.fromhex(c) for c in cmd_hex]
+    for ser in sers: ser.flushInput()
+    utime = time.time()
+    for ser, cmd in zip(sers, cmds):
+        if verbosity > 1: print('Sending {} to {}'.format(cmd, ser.port))
+        ser.write(cmd)
+
+    decoders = [TriosDecoder(require_checkbyte=require_checkbyte, packet_size=packet_size) for ser in sers]
+    try:
+        fds = [ser.fileno() for ser in sers]
+    except Exception:
+        fds = None  # no file descriptors, poll every sleep seconds
+    deadline = utime + max_time
+
+    while True:
+        waiting = [i for i, d in enumerate(decoders) if len(d.packets) < req_packets]
+        if (len(waiting) == 0) | (time.time() >= deadline): break
+
+        ## wait until one of the ports that still needs packets is readable
+        timeout = max(0, min(sleep, deadline - time.time()))
+        if fds is None:
+            time.sleep(timeout)
+        else:
+            select.select([fds[i] for i in waiting], [], [], timeout)
+
+        for i in waiting:
+            decoders[i].feed(serial_read(sers[i]))
+
+    for ser in sers: ser.flushInput()
+    if verbosity > 1: print('Received {} packets in {:.3f} s'.format([len(d.packets) for d in decoders], time.time()-utime))
+    return(utime, [d.packets[:req_packets] for d in decoders])
+
+def trios_multi(ports, baudrate=9600, parity='N', stopbits=1, bytesize=8, xonxoff=False, timeout=0.01,
+                int_time = 0, ips_channel=0, repeat = 1, verbosity=0, require_checkbyte=True, sleep = 0.1, max_time = 16, recorder = None):
+
+    import sys
+    from trippy import concat_spectrum, TriosSession
+
+    sessions, owned = [], []
+    try:
+        if int(int_time) not in range(0, 13):
+            raise Exception('Invalid int_time option given: {}'.format(int_time))
+        int_char = hex(int(int_time)).replace('x','')
+        repeat = max(1, int(repeat))
+
+        ## make connection to the serial ports
+        for port in ports:
+            if not isinstance(port, TriosSession):
+                port = TriosSession(port, baudrate=baudrate, parity=parity, stopbits=stopbits, bytesize=bytesize, xonxoff=xonxoff, 
+                                    timeout=timeout, ips_channel=ips_channel, verbosity=verbosity, 
+                                    require_checkbyte=require_checkbyte, sleep=sleep, max_time=max_time, recorder=recorder)
+                owned.append(port)
+            port.open()
+            sessions.append(port)
+        sers = [s.ser for s in sessions]
+
+        ## query the serial numbers of all sensors without a cached identity at once
+        unknown = [s for s in sessions if s.dev is None]
+        if len(unknown) > 0:
+            utime, port_packets = trios_command_and_parse_multi([s.ser for s in unknown], [s.identify_command() for s in unknown], 1, packet_size=8, 
+                                                                sleep=sleep, max_time=max_time, verbosity=verbosity, require_checkbyte=require_checkbyte)
+            for s, packets in zip(unknown, port_packets):
+                s.identifications += 1
+                try:
+                    s.set_identity(packets)
+                except Exception as e:
+                    raise Exception('Could not determine sensor id on {}: {}'.format(s.port, e))
+
+        data_list = []
+        cmd_hex = [s.measure_command(int_char) for s in sessions]
+        for rm in range(repeat):
+            if verbosity > 1: print('(sample {}) Using {} integration ({} ms)'.format(rm+1, int_char, 'auto' if int_time == 0 else 2**(1+int_time)))
+            utime, port_packets = trios_command_and_parse_multi(sers, cmd_hex, 8, packet_size=64, sleep=sleep, max_time=max_time,
+                                                                verbosity=verbosity, require_checkbyte=require_checkbyte)
+            rep = []
+            for s, packets in zip(sessions, port_packets):
+                data = concat_spectrum(packets, dev=s.dev, utime=utime, int_time=int_time)
+                n_zero = data.n_zero()
+                if n_zero == len(data): rep.append(['Not enough packets received', s.dev, utime, data])
+                elif n_zero > 0: rep.append(['Incomplete data frames', s.dev, utime, data])
+                else: rep.append(['', s.dev, utime, data])
+                if n_zero > 0: s.invalidate()  # query the sensor again in the next call
+            data_list.append(rep)
+    except:
+        e = sys.exc_info()
+        error_msg = e[1].__str__()
+        if verbosity > 0: print(error_msg)
+        for s in sessions: s.invalidate()
+        return([True, error_msg])
+    finally:
+        for s in owned: s.close()
+
+    return([False, data_list])
@@ -6,118 +6,138 @@
 ##                    QV 2018-05-31: added IPS and SAMIP to COM module identification (not a 100% sure)
 ##                                   added Python 2 compatibility
 ##                    QV 2018-06-07: added require_checkbyte keyword
+##                    2026-10-17: returns a TriosPacket (__slots__ record with a dict-compatible view) instead of a dict,
+##                                data is unpacked when first used, module types are looked up in a table made at import
+
+import struct
+
+## module type from the top 5 bits of the serial number (bits 15-11)
+## 0 1 0 0 1 is probably IPS
+## 0 1 0 1 0 is probably SAMIP
+flu_modules = [(0,0,0,1,0)]
+sam_modules = [(1,0,0,0,0), (1,0,0,0,1),(1,0,0,1,0), (1,0,0,1,1)]
+com_modules = [(0,1,0,0,0), (0,1,0,0,1),(0,1,0,1,0), (0,1,0,1,1)]
+ips_modules = [(0,1,0,0,1)]
+samip_modules = [(0,1,0,1,0)]
+
+def _module_types():
+    ## list of the module type for each value of serial_uint16 >> 11
+    types = ['Unknown']*32
+    for modules, module_type in [(flu_modules, 'FLU'), (sam_modules, 'SAM'), (com_modules, 'COM'), 
+                                 (ips_modules, 'IPS'), (samip_modules, 'SAMIP')]:
+        for module in modules: types[sum([iv*2**(4-i) for i,iv in enumerate(module)])] = module_type
+    return(types)
+
+module_types = _module_types()
+
+class TriosPacket(object):
+    ## parsed TriOS packet, the fields can be read as attributes or as dict items (packet['framebyte'])
+    ## fields of information frames are only present in information frames, as in the dict this replaces
+    __slots__ = ('checkbyte', 'hash', 'identity1', 'identity2', 'module_id', 'framebyte', 'timeflag1', 'timeflag2',
+                 'n_databytes', 'databytes', 'frame_type', '_data', 
+                 'serial_lo', 'serial_hi', 'firmware_lo', 'firmware_hi', 'reserved3', 'query_data', 
+                 'serial_uint16', 'serial', 'module_type')
+    aliases = {'reserved1': 'timeflag1', 'reserved2': 'timeflag2'}
+    fields = ('checkbyte', 'hash', 'identity1', 'identity2', 'module_id', 'framebyte', 'timeflag1', 'timeflag2',
+              'reserved1', 'reserved2', 'n_databytes', 'databytes', 'data', 'frame_type',
+              'serial_lo', 'serial_hi', 'firmware_lo', 'firmware_hi', 'reserved3', 'query_data', 
+              'serial_uint16', 'serial', 'module_type')
+
+    @property
+    def data(self):
+        ## 16 bit UINT values, unpacked on first use
+        try:
+            return(self._data)
+        except AttributeError:
+            self._data = struct.unpack('<{}H'.format(len(self.databytes)//2), self.databytes)
+            return(self._data)
+
+    def __getitem__(self, key):
+        try:
+            return(getattr(self, self.aliases.get(key, key)))
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return(hasattr(self, self.aliases.get(key, key)))
+
+    def get(self, key, default=None):
+        return(getattr(self, self.aliases.get(key, key), default))
+
+    def keys(self):
+        return([k for k in self.fields if k in self])
+
+    def items(self):
+        return([(k, self[k]) for k in self.keys()])
+
+    def __iter__(self):
+        return(iter(self.keys()))
+
+    def __len__(self):
+        return(len(self.keys()))
+
+    def __eq__(self, other):
+        if not hasattr(other, 'items'): return(False)
+        return(dict(self.items()) == dict(other.items()))
+
+    def __ne__(self, other):
+        return(not self.__eq__(other))
+
+    def __repr__(self):
+        return('TriosPacket({})'.format(dict(self.items())))
+
+    def to_dict(self):
+        return(dict(self.items()))
 
 def trios_parse_packet(p, verbosity=0, require_checkbyte=True):
-    import struct, sys
-
-    ## make empty return packet
-    packet = {}
-    
     ## convert bytes to integers
-    if sys.version_info[0] == 2:
-        data = [ord(i) for i in p]
-    else:
-        data = [i for i in p]
+    data = bytearray(p)
 
     ## check if starting hash is present
-    #if data[0] != int.from_bytes(b'#', sys.byteorder):
-    if data[0] != ord(b'#'):
+    if data[0] != 35:  # ord(b'#')
         if verbosity > 0: print('Starting hash is not present.')
         return()
 
     ## check the checkbyte
-    packet['checkbyte'] = data[-1]
-    if packet['checkbyte'] != 1:
-        if verbosity > 0: print('Checkbyte is not 1: {}'.format(packet['checkbyte']))
+    if data[-1] != 1:
+        if verbosity > 0: print('Checkbyte is not 1: {}'.format(data[-1]))
         if require_checkbyte: return()
 
     ## get header bytes
-    packet['hash'] = data[0]
-    packet['identity1'] = data[1]
-    packet['identity2'] = data[2]
-    packet['module_id'] = data[3]
-    packet['framebyte'] = data[4]
-    packet['timeflag1'] = data[5]
-    packet['timeflag2'] = data[6]
-    packet['reserved1'] = data[5]
-    packet['reserved2'] = data[6]
+    packet = TriosPacket()
+    packet.checkbyte = data[-1]
+    packet.hash = data[0]
+    packet.identity1 = data[1]
+    packet.identity2 = data[2]
+    packet.module_id = data[3]
+    packet.framebyte = data[4]
+    packet.timeflag1 = data[5]
+    packet.timeflag2 = data[6]
             
     ## data frame
-    ## number of 16 bit UINT values
-    len_data = 2**((packet['identity1'] & 224)>>5)
-    ## number of databytes
-    packet['n_databytes'] = 2*len_data
-    
-    ## get data bytes
-    packet['databytes'] = p[7:7+packet['n_databytes']]
-
-    ## reformat to 16 bit UINT data
-    packet['data']=struct.unpack('<'+'H'*len_data, packet['databytes'])
-
-    packet['frame_type'] = 'data'
-
-    ## to do!
-    if packet['framebyte'] == 255:
-        packet['frame_type'] = 'information'
-        packet['serial_lo'] = data[7]
-        packet['serial_hi'] = data[8]
-        packet['firmware_lo'] = data[9]
-        packet['firmware_hi'] = data[10]
-        packet['reserved3'] = data[11]
-        packet['query_data'] = data[12:-1]
+    ## number of databytes, 2 * the number of 16 bit UINT values
+    packet.n_databytes = 2*2**((packet.identity1 & 224)>>5)
+    packet.databytes = p[7:7+packet.n_databytes]
+    packet.frame_type = 'data'
+
+    if packet.framebyte == 255:
+        packet.frame_type = 'information'
+        packet.serial_lo = data[7]
+        packet.serial_hi = data[8]
+        packet.firmware_lo = data[9]
+        packet.firmware_hi = data[10]
+        packet.reserved3 = data[11]
+        packet.query_data = list(data[12:-1])
 
         ## unpack the serial number
-        if sys.version_info[0] == 2:
-            packet['serial_uint16'] = struct.unpack('<'+'H', p[7:9])[0]
-            packet['serial'] = hex(packet['serial_uint16'])[2:]
-        else:
-            packet['serial_uint16'] = struct.unpack('<'+'H', bytes((packet['serial_lo'],packet['serial_hi'])))[0]
-            packet['serial'] = hex(packet['serial_uint16'])[2:]
-        
-        #tmp = (packet['serial_uint16'] - (packet['serial_uint16'] & sum([2**i for i in range(11,16)])) )
-        #print(format(tmp, '16b').replace(' ','0'))
-        #hex(tmp)
-        
-        packet['module_type'] = 'Unknown'  # placeholder
-        snhi = sum([2**i for i in range(11,16)]) ## these are module type identifiers
-        # serial number hi index
-
-        flu_modules = [(0,0,0,1,0)]
-        flu_modules_uint = [sum([iv*2**(15-i) for i,iv in enumerate(module)]) for module in flu_modules]
-
-        sam_modules = [(1,0,0,0,0), (1,0,0,0,1),(1,0,0,1,0), (1,0,0,1,1)]
-        sam_modules_uint = [sum([iv*2**(15-i) for i,iv in enumerate(module)]) for module in sam_modules]
-
-        ## 0 1 0 0 1 is probably IPS
-        ## 0 1 0 1 0 is probably SAMIP
-        com_modules = [(0,1,0,0,0), (0,1,0,0,1),(0,1,0,1,0), (0,1,0,1,1)]
-        com_modules_uint = [sum([iv*2**(15-i) for i,iv in enumerate(module)]) for module in com_modules]
-
-        ips_modules = [(0,1,0,0,1)]
-        ips_modules_uint = [sum([iv*2**(15-i) for i,iv in enumerate(module)]) for module in ips_modules]
-        
-        samip_modules = [(0,1,0,1,0)]
-        samip_modules_uint = [sum([iv*2**(15-i) for i,iv in enumerate(module)]) for module in samip_modules]
-
-        if packet['serial_uint16'] & snhi in sam_modules_uint:
-            packet['module_type'] = 'SAM'
-            #print(packet['serial_uint16'] - (packet['serial_uint16'] & snhi))
-            #print(hex(packet['serial_uint16'] - (packet['serial_uint16'] & snhi)))
-        elif packet['serial_uint16'] & snhi in com_modules_uint:
-            packet['module_type'] = 'COM'
-            if packet['serial_uint16'] & snhi in ips_modules_uint:
-                packet['module_type'] = 'IPS'
-            if packet['serial_uint16'] & snhi in samip_modules_uint:
-                packet['module_type'] = 'SAMIP'
-        elif packet['serial_uint16'] & snhi in flu_modules_uint:
-            packet['module_type'] = 'FLU'
-
-        else:
-            if verbosity > 0: print('Unknown module connected: {}'.format(packet['serial']))
-    elif packet['framebyte'] == 254:
-        packet['frame_type'] = 'error'
-       
-
-    if verbosity > 0: print('{} frame'.format(packet['frame_type']))
+        packet.serial_uint16 = packet.serial_lo + 256*packet.serial_hi
+        packet.serial = hex(packet.serial_uint16)[2:]
+        packet.module_type = module_types[packet.serial_uint16 >> 11]
+        if packet.module_type == 'Unknown':
+            if verbosity > 0: print('Unknown module connected: {}'.format(packet.serial))
+    elif packet.framebyte == 254:
+        packet.frame_type = 'error'
+
+    if verbosity > 0: print('{} frame'.format(packet.frame_type))
 
     return(packet)
@@ -0,0 +1,210 @@
+## TriosSession
+## keeps the serial connection to one SAM module open over several measurements
+## the module type and serial number (dev) are queried once and cached, and only queried again after an error
+## measure() returns the same [error, data_list] as trios_single, which is now a session that is closed after one call
+## the data of each repetition is a TriosSpectrum (uint16 array with device, time and integration time)
+## the trippy auto integration (int_time -1) searches the longest integration time without saturated pixels:
+## it starts from the integration time found last time for the same int_key (eg the scan geometry), predicts the next step
+## from the peak counts (counts scale with 2**int_it), and bisects between the known limits when a prediction saturates
+## when the peak predicts that the next integration time saturates, the search stops without measuring it
+
+saturation_counts = 65535
+
+class TriosSession(object):
+
+    def __init__(self, port, baudrate=9600, parity='N', stopbits=1, bytesize=8, xonxoff=False, timeout=0.01,
+                 ips_channel=0, verbosity=0, require_checkbyte=True, sleep=0.1, max_time=16, recorder=None):
+        ## recorder: optional TriosRecorder, to capture the raw serial traffic
+        if int(ips_channel) not in range(0,5):
+            raise Exception('Invalid ips_channel option given: {}'.format(ips_channel))
+        self.port = port
+        self.serial_options = {'baudrate': baudrate, 'parity': parity, 'stopbits': stopbits, 'bytesize': bytesize,
+                               'xonxoff': xonxoff, 'timeout': timeout}
+        self.ips_char = hex(int(ips_channel*2)).replace('x','')  # Output ID for IPS box, 0 if straight connection to sensor
+        self.verbosity = verbosity
+        self.require_checkbyte = require_checkbyte
+        self.sleep = sleep
+        self.max_time = max_time
+        self.recorder = recorder
+        self.ser = None
+        self.dev = None  # cached module type and serial, eg SAM_8166
+        self.identifications = 0  # number of serial number queries sent, to follow the reuse of the connection
+        self.int_history = dict()  # int_key: integration time found by the last auto integration
+        self.acquisitions = []  # number of acquisitions per repetition of the last measure() call
+        self.int_times = []  # integration time per repetition of the last measure() call
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        import serial
+        if (self.ser is not None) and self.ser.isOpen(): return
+        try: 
+            self.ser = serial.Serial(port=self.port, **self.serial_options)
+        except:
+            self.ser = None
+            raise Exception('Could not connect to port {}'.format(self.port))
+        if self.recorder is not None: self.ser = self.recorder.wrap(self.ser)
+
+    def close(self):
+        if self.ser is not None: self.ser.close()
+        self.ser = None
+
+    def invalidate(self):
+        ## forget the device identity, the next measurement queries it again
+        self.dev = None
+
+    def identify_command(self):
+        return('23 {} 00 80 B0 00 00 01'.format(self.ips_char))  # command to query serial number, i2c address 80
+
+    def set_identity(self, packets):
+        if len(packets) > 0:
+            self.dev = '{}_{}'.format(packets[0]['module_type'], packets[0]['serial'])
+            if self.verbosity > 1: print('Found {} on {}'.format(self.dev, self.port))
+        else:
+            raise Exception('No identifier packet received')
+        return(self.dev)
+
+    def identify(self, force=False):
+        ## returns the cached device identity, queries the sensor if there is none (or force)
+        from trippy import serial_command_and_parse
+        self.open()
+        if (self.dev is None) or force:
+            self.identifications += 1
+            try:
+                packets = serial_command_and_parse(self.ser, self.identify_command(), 1, packet_size=8,
+                                                   sleep=self.sleep, max_time=self.max_time, require_checkbyte=self.require_checkbyte)
+                self.set_identity(packets)
+            except Exception as e:
+                self.dev = None
+                raise Exception('Could not connect to sensor: Could not determine sensor id: {}'.format(e))
+        return(self.dev)
+
+    def measure_command(self, int_char):
+        return(" ".join(["23 {} 00 30 78 05 {} 01".format(self.ips_char, int_char),
+                         "23 {} 00 80 A8 00 81 01".format(self.ips_char)]))  # set integration time and measure
+
+    def read_spectrum(self, int_char):
+        ## sends the measurement command, returns measurement time, packets and buffer
+        import time
+        from trippy import serial_command_and_parse
+        utime = time.time()
+        packets, out = serial_command_and_parse(self.ser, self.measure_command(int_char), 8, packet_size=64,
+                                                sleep=self.sleep, max_time=self.max_time, require_checkbyte=self.require_checkbyte, 
+                                                return_buffer=True, verbosity=self.verbosity)
+        return(utime, packets, out)
+
+    def auto_integration(self, int_max=12, int_key=None):
+        ## returns measurement time, packets, buffer and integration time of the longest integration time without saturation
+        ## raises an exception if the shortest integration time saturates
+        import math
+        import numpy as np
+        from trippy import concat_spectrum
+        verbosity = self.verbosity
+        int_max = max(1, int_max)
+
+        lo, hi = 0, int_max+1  # longest known integration time without saturation, shortest known with saturation
+        best, peak, missed = None, None, False
+        if len(self.acquisitions) == 0: self.acquisitions.append(0)  # called directly instead of from measure()
+        int_it = min(max(1, self.int_history.get(int_key, 1)), int_max)
+        while True:
+            int_char = hex(int(int_it)).replace('x','')
+            if verbosity > 1: print('Using {} integration ({} ms)'.format(int_char, 2**(1+int_it)))
+            utime, packets, out = self.read_spectrum(int_char)
+            self.acquisitions[-1] += 1
+            if len(packets) < 8: return(utime, packets, out, int_it)  # incomplete, reported when the data are concatenated
+
+            ## check for saturation
+            data = concat_spectrum(packets).values
+            n_sat = int(np.count_nonzero(data >= saturation_counts))
+            if n_sat > 0:
+                if verbosity > 2: print('Reached saturation for int_time {}'.format(int_it))
+                if verbosity > 3: print('Reached saturation for {} pixels'.format(n_sat))
+                if peak is not None: missed = True  # the prediction was too long
+                hi = int_it
+            else:
+                lo, best, peak = int_it, (utime, packets, out, int_it), int(data.max())
+
+            if lo == int_max:
+                if verbosity > 2: print('Reached max int_time {}'.format(int_max))
+                break
+            if hi == lo + 1: break
+
+            ## next integration time: predicted from the peak, or halfway between the limits
+            if (peak is not None) & (not missed):
+                step = int(math.floor(math.log(float(saturation_counts-1)/max(1, peak), 2)))
+                if step <= 0:
+                    if verbosity > 2: print('Peak {} predicts saturation for int_time {}'.format(peak, lo+1))
+                    break
+                int_it = lo + step
+            else:
+                int_it = (lo + hi) // 2
+            int_it = min(max(int_it, lo+1), hi-1)
+
+        if best is None:
+            raise Exception('Saturated at the shortest integration time')
+        self.int_history[int_key] = best[3]
+        return(best)
+
+    def measure(self, int_time=0, int_max=12, repeat=1, return_buffer=False, int_key=None):
+        ## int_time 0 is trios auto integration, >0 fixed, -1 the trippy auto integration up to int_max
+        ## int_key identifies the conditions (eg the scan geometry) for which the auto integration time is remembered
+        import sys
+        from trippy import concat_spectrum
+        verbosity = self.verbosity
+
+        try:
+            if int(int_time) not in range(-1, 13):
+                raise Exception('Invalid int_time option given: {}'.format(int_time))
+            int_char = hex(int(int_time)).replace('x','')
+            int_max = abs(int_max)
+            repeat = max(1, int(repeat))
+
+            self.open()
+            dev = self.identify()
+        except:
+            e = sys.exc_info()
+            error_msg = e[1].__str__()
+            if verbosity > 0: print(error_msg)
+            self.close()
+            return([True, error_msg])
+
+        data_list = []
+        self.acquisitions, self.int_times = [], []
+        for rm in range(repeat):
+            utime, data = None, [0]*256
+            self.acquisitions.append(0)
+            self.int_times.append(int_time)
+            try:
+                dev = self.identify()  # cached, unless the previous repetition failed
+                try:
+                    if int_time >= 0:  # trios modus (0 is auto, >0 is fixed)
+                        if verbosity > 1: print('(sample {}) Using {} integration ({} ms)'.format(rm+1, int_char, 'auto' if int_time == 0 else 2**(1+int_time)))
+                        utime, packets, out = self.read_spectrum(int_char)
+                        self.acquisitions[-1] += 1
+                    else:  # trippy integration time system
+                        if verbosity > 1: print('(sample {}) Searching integration time'.format(rm+1))
+                        utime, packets, out, self.int_times[-1] = self.auto_integration(int_max=int_max, int_key=int_key)
+                        if verbosity > 1: print('(sample {}) Using {} integration after {} acquisitions'.format(rm+1, self.int_times[-1], self.acquisitions[-1]))
+                except:
+                    e = sys.exc_info()
+                    raise Exception('Could not complete measurement cycle: {}'.format(e[1].__str__()))
+
+                ## concat data from packets
+                data = concat_spectrum(packets, dev=dev, utime=utime, int_time=self.int_times[-1])
+                n_zero = data.n_zero()
+                if n_zero == len(data): raise Exception('Not enough packets received')
+                if n_zero > 0: raise Exception('Incomplete data frames')
+                if return_buffer:
+                    data_list.append(['', dev, utime, data, out, packets])
+                else:
+                    data_list.append(['', dev, utime, data])
+            except:
+                e = sys.exc_info()
+                data_list.append([e[1].__str__(), dev, utime, data])
+                self.invalidate()  # query the sensor again before the next measurement
+
+        return([False, data_list])
@@ -0,0 +1,67 @@
+## trios_spectrum
+## compact spectrum of one SAM measurement: a small header (device, time, integration time) and the 256 values
+## as an uint16 numpy array, made with frombuffer from the databytes of the 8 data frames (no Python int per pixel)
+## behaves as the list of concat_data (len, indexing, slicing, iteration), and tobytes/tolist give the values
+## for storage, so the db layer does not need numpy
+## the first value (first data frame, framebyte 7) is the SAM header with the int_time code (1-12) of the measurement,
+## with the trios auto integration (int_time 0) concat_spectrum takes the int_time from it
+
+class TriosSpectrum(object):
+    __slots__ = ('dev', 'utime', 'int_time', 'values')
+
+    def __init__(self, values, dev=None, utime=None, int_time=None):
+        self.values = values
+        self.dev = dev
+        self.utime = utime
+        self.int_time = int_time
+
+    def __len__(self):
+        return(len(self.values))
+
+    def __getitem__(self, i):
+        return(self.values[i])
+
+    def __iter__(self):
+        return(iter(self.values))
+
+    def __array__(self, dtype=None, copy=None):
+        return(self.values if dtype is None else self.values.astype(dtype))
+
+    def __repr__(self):
+        return('TriosSpectrum(dev={}, utime={}, int_time={}, values={})'.format(self.dev, self.utime, self.int_time, self.values))
+
+    def tobytes(self):
+        ## little endian uint16, as stored in the measurements blob
+        if self.values.dtype.str == '<u2': return(self.values.tobytes())
+        return(self.values.astype('<u2').tobytes())
+
+    def tolist(self):
+        return(self.values.tolist())
+
+    def n_zero(self):
+        ## number of pixels without data (missing frames)
+        import numpy as np
+        return(int(np.count_nonzero(self.values == 0)))
+
+empty_frame = bytes(bytearray(64))
+
+def trios_header_int_time(values):
+    ## int_time code (1-12) in the header of a SAM spectrum, None if it holds no valid code (eg the first frame is missing)
+    code = int(values[0])
+    return(code if 1 <= code <= 12 else None)
+
+def concat_spectrum(packets, dev=None, utime=None, int_time=None):
+    ## same frame selection as concat_data: framebyte 7 down to 0 in order, missing frames are left zero
+    ## int_time 0 (trios auto integration) is replaced by the int_time the SAM reports in the header
+    import numpy as np
+    frames = [empty_frame]*8
+    if len(packets) >= 8:
+        cur_frame = 7 ## first frame we need
+        for p in packets:
+            if cur_frame < 0: break ## stop when we have all 8 frames
+            if p['framebyte'] != cur_frame: continue ## continue if the packet frame is not the one we currently need
+            if len(p['databytes']) == 64: frames[7-cur_frame] = p['databytes']
+            cur_frame-=1
+    values = np.frombuffer(b''.join(frames), dtype='<u2')
+    if int_time == 0: int_time = trios_header_int_time(values)
+    return(TriosSpectrum(values, dev=dev, utime=utime, int_time=int_time))
@@ -0,0 +1,100 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Wakes up the worker when a task is added to the queue.
+
+Project: Hypermaq
+Dieter Vansteenwegen, VLIZ Belgium
+Copyright?
+
+The worker binds a unix datagram socket and blocks on it (with a long fallback timeout) instead of polling the queue.
+Whoever adds a task (connection.add_to_queue, thus also queue.py) sends a datagram to that socket.
+If the worker isn't listening, notifying does nothing: the task will be picked up when the worker starts.
+"""
+import os
+import socket
+import select
+import logging
+
+"""Define constants."""
+socket_location = "/home/hypermaq/data/worker_wakeup.sock"
+log = logging.getLogger("__main__.{}".format(__name__))
+
+
+"""Functions."""
+
+def notify_worker(location = socket_location):
+    """Sends a wakeup datagram to the worker. Never blocks, never raises.
+
+    Returns True if the datagram was sent, False if nobody is listening (or its buffer is full, it's awake anyway).
+    """
+    s = None
+    try:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        s.setblocking(False)
+        s.sendto(b"1", location)
+        return True
+    except socket.error:
+        return False
+    finally:
+        if s is not None:
+            s.close()
+
+
+class wakeup_listener(object):
+    """Unix datagram socket the worker waits on."""
+
+    def __init__(self, location = socket_location):
+        """Binds the socket, removing a leftover socket file of a previous worker.
+        
+        If binding fails, listening is False and wait() just sleeps.
+        """
+        self.location = location
+        self.listening = False
+        self.__s = None
+        try:
+            if os.path.exists(location):
+                os.remove(location)
+            self.__s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.__s.bind(location)
+            self.__s.setblocking(False)
+            os.chmod(location, 0o666)  # worker runs as root, queue.py from cron as hypermaq
+            self.listening = True
+        except Exception as e:
+            log.warning("Could not set up wakeup socket {}: {}".format(location, e))
+            self.close()
+
+    def wait(self, timeout):
+        """Blocks until a wakeup is received or [timeout] seconds have passed.
+
+        All pending wakeups are consumed, since the worker handles all queued tasks at once.
+        Returns True if woken up, False if timed out.
+        """
+        if not self.listening:
+            select.select([], [], [], timeout)  # sleep
+            return False
+
+        read, __, __ = select.select([self.__s], [], [], timeout)
+        if len(read) == 0:
+            return False
+        try:
+            while True:
+                self.__s.recv(16)
+        except socket.error:  # no more datagrams waiting
+            pass
+        return True
+
+    def close(self):
+        if self.__s is not None:
+            self.__s.close()
+            self.__s = None
+        if self.listening:
+            self.listening = False
+            try:
+                os.remove(self.location)
+            except OSError:
+                pass
+
+
+"""Main loop"""
+if __name__ == "__main__":
+    print("This module does nothing on its own, exiting now...")
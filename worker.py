@@ -15,11 +15,14 @@ import sys  # provides access to arguments
 import logging
 from dbc import connection
 from time import sleep
+from wakeup import wakeup_listener  # to wait for new tasks
 import gpio05
 from subprocess import call  # temp solution to blink led
 
 
 """Define constants."""
+IDLE_TIMEOUT = 60  # seconds to wait for a wakeup before checking the queue anyway
+IDLE_POLL = 9  # seconds between queue checks if the wakeup socket isn't available
 
 """Define variables."""
 
@@ -67,7 +70,7 @@ def setup_logging(db):
         h2.setFormatter(logging.Formatter(fmt, datefmt))
         log.addHandler(h2)
 
-    h3 = db_Handler(db)
+    h3 = async_db_Handler()  # writes to the db from a background thread, in batches
     h3.setLevel(logging.DEBUG)
     log.addHandler(h3)
 
@@ -90,6 +93,14 @@ def init():
         if db.get_setting("manual")[1] == 1: exit()
         else: log.info("worker started by cron.")
         # If not started by cron, log the start and continue.
+    db.create_indexes()  # dbs created before the queue index existed
+    db.upgrade_measurements()  # dbs created before the newer measurement columns (rep_int_time) existed
+    added = db.add_default_settings()[1]  # dbs created before the newer settings (head_calibration, ...) existed
+    if added:
+        log.info('added default settings: {}'.format(', '.join(added)))
+    released = db.release_claimed_tasks()[1]  # tasks left in progress by a previous worker that didn't finish them
+    if released:
+        log.warning('{} task(s) still marked as in progress, released them'.format(released))
     log.info('******************')
     log.info('worker initialized')
     return log
@@ -99,22 +110,27 @@ if __name__ == "__main__":
     If so, check the "manual" setting. If set (1), we want to use the worker manually, so cron shouldn't start it in the background.
     If not, set up gpio pins
     """
-    with connection() as db:
+    with connection(profile = 'station') as db:
     
         log = init()
+        wakeup = wakeup_listener()
+        if not wakeup.listening:
+            log.warning('No wakeup socket, polling the queue every {} seconds'.format(IDLE_POLL))
 
         while __name__ == "__main__":
-            """This is the main loop, which first checks how many tasks are queued.
-            If none are, sleep for ten seconds and start loop again.
-            If there are, first handle these tasks.
+            """This is the main loop, which claims the next queued task.
+            If there is none, wait until a task is added (or IDLE_TIMEOUT has passed) and start loop again.
+            If there is, handle it and claim the next one.
             """
             try:
-                while db.get_number_of_tasks()[1] > 0:
-                    task = db.get_next_task()[1]  # returns a tuple (id, priority, action, options, fails), or none
+                while True:
+                    task = db.claim_next_task()[1]  # marks the task as in progress, returns a tuple (id, priority, action, options, fails), or none
+                    if not type(task) == tuple:
+                        break
                     ready = db.get_setting('system_set_up')[1]
                     success = False
 
-                    if type(task) == tuple:  # a task was returned
+                    with db.claimed_task(task):  # if handling the task raises, it is released with one more fail
                         log.debug("executing task {0[0]} (priority/fails: {0[1]}/{0[4]}): {0[2]}.".format(task))
                         # Check what kind of task was in the queue and execute accordingly
                         
@@ -174,6 +190,17 @@ if __name__ == "__main__":
                             else:  # couldn't set system time, either from GNSS or NTP
                                 db.set_setting('system_set_up', 0)
 
+                        elif task[2] == 'archive_tasks':
+                            """move finished tasks older than x days (option field, default 7) from the queue to the queue_archive table"""
+                            try:
+                                keep_days = int(task[3]) if task[3] else 7
+                                result = db.archive_tasks(keep_days = keep_days)
+                                if result[0]:
+                                    success = True
+                                    log.info("Task {} (archive_tasks) archived {} finished tasks.".format(task[0], result[1]))
+                            except ValueError:
+                                log.warning("invalid number of days for task {} 'archive_tasks': {}".format(task[0], task[3]))
+
                         elif task[2] == 'backup_ftp':
                             """export new data to new (temporary) sqlite database and upload it to ftp
                             - check last succesfully uploaded measurement and log id
@@ -236,7 +263,7 @@ if __name__ == "__main__":
 
                 blink_led()
 
-                sleep(9)
+                wakeup.wait(IDLE_TIMEOUT if wakeup.listening else IDLE_POLL)
 
             except Exception as e:
                 print('Exception: error while running through worker.py: {}'.format(e))
@@ -250,4 +277,5 @@ if __name__ == "__main__":
                 log.info('Shutting down worker script after manual CTRL+C')
                 logging.shutdown()
                 db.commit()
+                wakeup.close()
                 exit()
\ No newline at end of file
@@ -4,7 +4,7 @@
 from .system_setup import *
 from .measurements import *
 from .check import check_reply
-from .log_handlers import buffered_SMTP_Handler, db_Handler
+from .log_handlers import buffered_SMTP_Handler, db_Handler, async_db_Handler
 from .backup_ftp import backup_ftp
 from .ftp_lib import FTP_class
 from .adc import batt_voltage
\ No newline at end of file
@@ -0,0 +1,91 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Runs the calls to one device (eg the pan/tilt head) on a dedicated thread.
+
+Project: Hypermaq
+
+The device stays single owner: as long as all calls go through the worker, only the worker thread talks to it.
+submit() returns immediately with a device_request, so the caller can do other work (store data, prepare the
+next scan) while the device is busy, and collect the result later with device_request.result().
+Requests are executed one by one, in the order they were submitted.
+"""
+import collections
+import threading
+
+
+"""Functions."""
+class device_request(object):
+    """Result of a call submitted to a device_worker."""
+
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.__done = threading.Event()
+        self.__result = None
+        self.__exception = None
+
+    def run(self):
+        """Executes the call (on the worker thread) and stores its result or exception."""
+        try:
+            self.__result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.__exception = e
+        self.__done.set()
+
+    def done(self):
+        """Returns True if the call has been executed."""
+        return self.__done.is_set()
+
+    def result(self, timeout = None):
+        """Waits (max [timeout] seconds, None is no limit) until the call has been executed and returns its result.
+        The exception of the call is raised again here, RuntimeError is raised on timeout.
+        """
+        if not self.__done.wait(timeout) and not self.__done.is_set():  # Event.wait returns None in python 2.6
+            raise RuntimeError('No result from {} within {} s'.format(getattr(self.function, '__name__', self.function), timeout))
+        if self.__exception is not None:
+            raise self.__exception
+        return self.__result
+
+
+class device_worker(object):
+    """Dedicated thread that executes the submitted calls one by one."""
+
+    def __init__(self, name = 'device_worker'):
+        self.__requests = collections.deque()
+        self.__condition = threading.Condition()
+        self.__stop = False
+        self.__thread = threading.Thread(target = self.__worker, name = name)
+        self.__thread.daemon = True  # don't keep the process alive if close() is not called
+        self.__thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """Queues function(*args, **kwargs) for the worker thread, returns a device_request."""
+        request = device_request(function, args, kwargs)
+        with self.__condition:
+            if self.__stop:
+                raise RuntimeError('device_worker is closed')
+            self.__requests.append(request)
+            self.__condition.notify()
+        return request
+
+    def call(self, function, *args, **kwargs):
+        """Executes function(*args, **kwargs) on the worker thread and returns its result (waits for the calls submitted before)."""
+        return self.submit(function, *args, **kwargs).result()
+
+    def close(self, timeout = None):
+        """Executes the calls that are still queued and stops the worker thread."""
+        with self.__condition:
+            self.__stop = True
+            self.__condition.notify()
+        self.__thread.join(timeout)
+
+    def __worker(self):
+        while True:
+            with self.__condition:
+                while not (self.__stop or len(self.__requests) > 0):
+                    self.__condition.wait()
+                if len(self.__requests) == 0:  # stop requested and nothing left to do
+                    return
+                request = self.__requests.popleft()
+            request.run()
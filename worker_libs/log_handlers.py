@@ -14,8 +14,15 @@ Handlers (buffered email/smtp and logging to db).
 import logging
 import logging.handlers
 import smtplib
+import sys
+import threading
+import collections
+from time import time
 
 MAX_MSG_TO_BUFFER = 50  # number of log messages to send in one email
+DB_LOG_BATCH_SIZE = 50  # async_db_Handler writes as soon as this many records are waiting
+DB_LOG_FLUSH_INTERVAL = 2  # seconds, async_db_Handler writes waiting records at least this often
+DB_LOG_MAX_BUFFER = 5000  # records waiting to be written, records are dropped (and counted) above this
 
 class buffered_SMTP_Handler(logging.handlers.BufferingHandler):
 
@@ -50,26 +57,136 @@ class buffered_SMTP_Handler(logging.handlers.BufferingHandler):
                 
             super(buffered_SMTP_Handler, self).flush()
 
+def db_log_row(record):
+    """Returns (level, source, logtext) for a log record, as stored in the logs table."""
+    db_level = record.levelname  # log level
+    db_source = '{}.{}({})'.format(record.module, record.funcName, record.lineno)  # combine module/function and line number
+    db_log = record.msg  # the log text
+    if record.exc_info:  # an exception was thrown, log additional data such as traceback
+        import traceback
+        tb = traceback.format_list(traceback.extract_tb(record.exc_info[2]))  # get the traceback as string
+        # process the string to make it shorter/neater
+        tb = tb[0][7:-1].replace('/home/hypermaq/scripts', '.')  # shorten pad + get rid of ' File' and newline at the end
+        tb = tb.replace('  ', ' ')  # remove double spaces
+        tb = tb.replace('\n  ', '\n')  # remove whitespace after newline
+        db_log = 'EXC {0} | {1[0]} | {1[1]} |{2}'.format(db_log, record.exc_info, tb)  # combine everything, start with EXC
+    return (db_level, db_source, db_log)
+
 class db_Handler(logging.Handler):
     def __init__(self, db):
         logging.Handler.__init__(self)
         self.db = db
 
     def emit(self, record):
-        db_level = record.levelname  # log level
-        db_source = '{}.{}({})'.format(record.module, record.funcName, record.lineno)  # combine module/function and line number
-        db_log = record.msg  # the log text
-        if record.exc_info:  # an exception was thrown, log additional data such as traceback
-            import traceback
-            tb = traceback.format_list(traceback.extract_tb(record.exc_info[2]))  # get the traceback as string
-            # process the string to make it shorter/neater
-            tb = tb[0][7:-1].replace('/home/hypermaq/scripts', '.')  # shorten pad + get rid of ' File' and newline at the end
-            tb = tb.replace('  ', ' ')  # remove double spaces
-            tb = tb.replace('\n  ', '\n')  # remove whitespace after newline
-            db_log = 'EXC {0} | {1[0]} | {1[1]} |{2}'.format(db_log, record.exc_info, tb)  # combine everything, start with EXC
-
+        db_level, db_source, db_log = db_log_row(record)
         self.db.add_log(db_log, db_source, db_level)
 
+class async_db_Handler(logging.Handler):
+    """Stores log records in the logs table from a background writer thread.
+
+    emit() only queues the record and returns. The writer thread has its own db connection and stores the
+    queued records in one transaction when DB_LOG_BATCH_SIZE records are waiting, every DB_LOG_FLUSH_INTERVAL seconds,
+    on flush() and on close().
+    If a write fails (eg db locked by a long transaction), the records are put back in front of the buffer and written
+    again DB_LOG_FLUSH_INTERVAL seconds later. Write failures are reported on stderr: logging them would bring them
+    back to this handler.
+    If more than DB_LOG_MAX_BUFFER records are waiting, new records are dropped and counted in dropped.
+    The number of dropped records is logged to the db as soon as writing works again.
+    """
+
+    def __init__(self, database = None, batch_size = DB_LOG_BATCH_SIZE, flush_interval = DB_LOG_FLUSH_INTERVAL, max_buffer = DB_LOG_MAX_BUFFER):
+        logging.Handler.__init__(self)
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.dropped = 0  # total number of dropped records
+        self.__reported_dropped = 0  # number of dropped records already logged to the db
+        self.__buffer = collections.deque()
+        self.__condition = threading.Condition()
+        self.__writing = False  # writer thread is storing a batch
+        self.__flush_requested = False
+        self.__stop = False
+        self.__thread = threading.Thread(target = self.__writer, name = 'async_db_Handler')
+        self.__thread.daemon = True  # don't keep the process alive, close() (called by logging.shutdown) flushes
+        self.__thread.start()
+
+    def emit(self, record):
+        try:
+            row = db_log_row(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self.__condition:
+            if len(self.__buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self.__buffer.append(row)
+            if len(self.__buffer) >= self.batch_size:
+                self.__condition.notify()
+
+    def flush(self, timeout = 10):
+        """Waits (max [timeout] seconds) until all queued records have been written."""
+        deadline = time() + timeout
+        with self.__condition:
+            self.__flush_requested = True
+            self.__condition.notify()
+            while (len(self.__buffer) > 0 or self.__writing) and self.__thread.is_alive() and time() < deadline:
+                self.__condition.wait(0.1)
+
+    def close(self):
+        """Writes the remaining records and stops the writer thread."""
+        with self.__condition:
+            self.__stop = True
+            self.__condition.notify()
+        self.__thread.join(10)
+        logging.Handler.close(self)
+
+    def __writer(self):
+        from dbc import connection, database_location  # own connection, sqlite connections can't be shared between threads
+        db = connection(self.database or database_location, profile = 'station')
+        failing = False  # the last write failed, wait flush_interval before trying again
+        while True:
+            with self.__condition:
+                deadline = time() + self.flush_interval
+                while not (self.__stop or (not failing and (self.__flush_requested or len(self.__buffer) >= self.batch_size))) and time() < deadline:
+                    self.__condition.wait(max(0, deadline - time()))
+                rows = list(self.__buffer)
+                self.__buffer.clear()
+                self.__flush_requested = False
+                stop = self.__stop
+                self.__writing = len(rows) > 0
+                records = len(rows)  # without the dropped records row
+                reported = self.dropped - self.__reported_dropped
+                if reported > 0:
+                    rows.append(('WARNING', 'log_handlers.async_db_Handler', 
+                                 '{} log records dropped, buffer full'.format(reported)))
+                    self.__reported_dropped = self.dropped
+
+            if len(rows) > 0:
+                ok, reply = db.add_logs(rows, log_errors = False)
+                if not ok:
+                    with self.__condition:
+                        kept = min(records, max(0, self.max_buffer - len(self.__buffer)))
+                        self.__buffer.extendleft(reversed(rows[:kept]))  # before the records queued meanwhile, to keep the order
+                        self.dropped += records - kept
+                        self.__reported_dropped -= reported  # report these again with the next write
+                    if not failing:
+                        sys.stderr.write('async_db_Handler: could not write {} log records, retrying: {}\n'.format(records, reply))
+                elif failing:
+                    sys.stderr.write('async_db_Handler: writing log records works again\n')
+                failing = not ok
+
+            with self.__condition:
+                self.__writing = False
+                self.__condition.notify_all()
+                unwritten = len(self.__buffer)
+            if stop:
+                if unwritten > 0:
+                    sys.stderr.write('async_db_Handler: {} log records not written at close\n'.format(unwritten))
+                db.close()
+                return
+
 if __name__ == "__main__":
 
     exit()
@@ -39,6 +39,23 @@ def check_in_keepout(target, zone_low, zone_high):
     return False
 
 
+def store_calibrated_spectra(db, meas_dicts, ids):
+    """Calibrates the valid spectra of meas_dicts, stored as measurements ids, into the calibrated_spectra table (see trippy.trios_calibrate_spectra).
+
+    Spectra without integration time (rep_int_time) are left out. Sensors without calibration files get nan spectra.
+    Calibration is an extra: problems are logged and the measurements are kept.
+    """
+    rows = [(i, m) for i, m in zip(ids, meas_dicts) if m.get("valid") == "y" and m.get("rep_int_time")]
+    if len(rows) == 0:
+        return
+    try:
+        calibrated = trippy.trios_calibrate_spectra([m["data"] for __, m in rows])
+    except Exception as e:
+        log.warning("Could not calibrate {} spectra: {}".format(len(rows), e))
+        return
+    db.add_calibrated_spectra([(i, m["rep_serial"], m["rep_int_time"], c) for (i, m), c in zip(rows, calibrated)])
+
+
 def measure(db = None, taskid = 0):
     """Makes a measurement (if necessary) and stores data in db.
 
@@ -89,6 +106,7 @@ def measure(db = None, taskid = 0):
     head_true_north_offset = int(db.get_setting("head_true_north_offset")[1])  # head heading when at 0
     radiance_angle_offset = float(db.get_setting("radiance_angle_offset")[1])  # radiance sensor angle to base of head
     irradiance_angle_offset = float(db.get_setting("irradiance_angle_offset")[1])  # irradiance sensor angle to base of head
+    trios_calibrate = db.get_optional_setting("trios_calibrate", 0)[1] == 1  # 1 to calibrate each scan right after measuring it (see store_calibrated_spectra)
 
     # try to get adc_channel and adc_factor from settings. They might not be in there, if so set to None
     try:
@@ -138,12 +156,19 @@ def measure(db = None, taskid = 0):
             db.add_meas(meas_setup)
             return False
     
-        reply = head.initialize()
+        head_calibration = db.get_optional_setting("head_calibration", "")  # resolution and limits from an earlier initialization, allows a warm start without axis resets
+        head_calibration = head_calibration[1] if head_calibration[0] else None
+        head_telemetry_ttl = db.get_optional_setting("head_telemetry_ttl", pt.telemetry_ttl)  # seconds the head voltage and temperatures are reused (see pthead.get_telemetry)
+        if head_telemetry_ttl[0]:
+            head.telemetry_ttl = float(head_telemetry_ttl[1])
+        reply = head.initialize(calibration = head_calibration)
         if not check_reply(reply, "worker.measure (head.initialize) "):  # problems during initialization
             toggle_pwr("output2", "off")  # switch head power off
             meas_setup["setup_error"].append(reply)
             db.add_meas(meas_setup)
             return False
+        if head.calibration() not in (None, head_calibration):  # a full initialization, the stored calibration is outdated
+            db.set_setting("head_calibration", head.calibration())
 
         toggle_pwr("output4", "on")  # apply power to multiplexer board
 
@@ -166,7 +191,7 @@ def measure(db = None, taskid = 0):
             #----------------------------------------------------------------------------
             meas_scan = dict()
             meas_scan.update(meas_setup)
-            head_params = head.show_parameters()  # request parameters such as voltage and temperatures
+            head_params = head.get_telemetry()  # voltage and temperatures, refreshed by move_position when older than head.telemetry_ttl
             sun_elevation = float(suncalc.get_sun_elevation(meas_setup["gnss_lat"], meas_setup["gnss_lon"], datetime.datetime.now()))
             sun_heading = float(suncalc.get_sun_heading(meas_setup["gnss_lat"], meas_setup["gnss_lon"], datetime.datetime.now()))
 
@@ -277,8 +302,9 @@ def measure(db = None, taskid = 0):
                     continue
 
                 #----------------------------------------------------------------------------    
-                # 4f. stores measurement data from all repetitions to db
+                # 4f. stores measurement data from all repetitions to db, and the calibrated spectra if enabled
                 #----------------------------------------------------------------------------    
+                stored, ids = [], []
                 for rep in range(len(ret[1])):
                     meas_repeat = dict()
                     meas_repeat.update(meas_scan)
@@ -287,8 +313,14 @@ def measure(db = None, taskid = 0):
                     meas_repeat["rep_error"] = ret[1][rep][0]
                     meas_repeat["rep_serial"] = ret[1][rep][1]
                     meas_repeat["data"] = ret[1][rep][3]
+                    meas_repeat["rep_int_time"] = trippy.trios_int_time_ms(getattr(ret[1][rep][3], "int_time", None))  # reported by the SAM with the trios auto integration (int_time 0)
                     if ret[1][rep][0] == "": meas_repeat["valid"] = "y"
-                    db.add_meas(meas_repeat)
+                    reply = db.add_meas(meas_repeat)
+                    if reply[0]:
+                        stored.append(meas_repeat)
+                        ids.append(reply[1])
+                if trios_calibrate:
+                    store_calibrated_spectra(db, stored, ids)
 
         toggle_pwr("output3", "off")  # cut power to Top box
         toggle_pwr("output4", "off")  # cut power to Multiplexer
@@ -299,7 +331,9 @@ def measure(db = None, taskid = 0):
         # 5. park head and cut power to cam
         #----------------------------------------------------------------------------
         reply = head.park()
-        check_reply(reply, "worker.measure (head.park)")  # if there's an issue during parking, put it in the log
+        if check_reply(reply, "worker.measure (head.park)") and head.calibration() is not None:  # if there's an issue during parking, put it in the log
+            db.set_setting("head_calibration", head.calibration())  # with the parked position, allows a warm start at the next cycle
+        db.add_head_telemetry(meas_setup["cycle_id"], head.pop_telemetry_samples())  # voltage and temperatures queried during this cycle, errors are logged by dbc
         toggle_pwr("output2", "off")  # switch head power off
 
         return True  # finished measurement cycle
@@ -18,10 +18,13 @@ from adc import batt_voltage
 from datetime import datetime
 import suncalc  # calculation of the solar position
 from gpio05 import toggle_pwr  # to switch power to various devices
-from time import sleep
+from time import sleep, time
 import flir_ptu_d48e as pt  # control of the pan/tilt head
+import scan_planner  # orders the scans to minimize the pan/tilt travel time
+from device_worker import device_worker  # dedicated thread for the pan/tilt head
 from ipcam import ipcam
 import trippy  # communication with TriOS Ramses sensors
+from measurements import store_calibrated_spectra  # calibration of the stored spectra
 
 """Define constants."""
 INTERCOAX = 'output6'
@@ -32,8 +35,14 @@ TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 # trios settings
 TRIOS_REQUIRE_CHECKBYTE = False
 TRIOS_INT_TIME = 0
-TRIOS_SLEEP_TIME = 0.5
+TRIOS_SLEEP_TIME = 0.5  # longest wait for new serial data, readings return as soon as all packets are in
 TRIOS_MAX_TIME = 18
+TRIOS_PORTS = {'e': '/dev/ttyO1', 'l': '/dev/ttyO2'}  # irradiance sensor on ttyO1, radiance sensor on ttyO2
+TRIOS_BOTH = 'b'  # protocol instrument that measures irradiance and radiance at the same time
+TRIOS_CAPTURE_FILE = None  # eg '/home/hypermaq/data/trios_capture.bin.gz' to append the raw serial traffic (see trippy.trios_replay)
+# cycle settings
+HEAD_PIPELINE = False  # True to move the head on its own thread, storing the previous scan and preparing the next one meanwhile (see _run_protocol_pipelined)
+MAX_PREPARED_AGE = 30  # seconds, scans prepared longer ago are prepared again before moving (the sun moves up to 0.25 degrees per minute)
 
 
 
@@ -54,6 +63,14 @@ class measurement(object):
         self.sun_position = dict()
         self.add_to_db = False # gets set to True as soon as enough info is gathered to store in db (if failed measurement)
         self.init_done = False
+        self.trios_sessions = dict()  # open TriosSession per sensor ('e', 'l'), kept for one measurement cycle
+        self.trios_int_history = dict()  # auto integration times per sensor and geometry, kept over the cycles
+        self.trios_recorder = None
+        self.predicted_move_times = dict()  # predicted head move time per scan id, by the scan planner
+        self.actual_move_times = dict()  # measured head move time per scan id
+        self.defer_rows = False  # True while measurement rows are collected in pending_rows instead of stored directly
+        self.pending_rows = []
+        self.trios_calibrate = False  # calibrate the spectra when they are stored, from the trios_calibrate setting
 
     def _get_protocol(self):
         """Gets protocol and checks if it's empty.
@@ -78,23 +95,31 @@ class measurement(object):
     
     def _get_meas_variables(self):
         try:
+            ok, settings = self.db.get_settings(('station_id', 'max_sun_zenith', 'measurements_start_hour', 'measurements_stop_hour', 
+                                                 'keepout_heading_low', 'keepout_heading_high', 'head_true_north_offset', 
+                                                 'radiance_angle_offset', 'irradiance_angle_offset', 
+                                                 'gnss_lat', 'gnss_lon', 'gnss_qual', 'gnss_acquired'))
+            if not ok:
+                raise Exception(settings)
             self.set_keepout_heading = [0,0]
             self.set_meas_window = [0,24]
-            self.station_id = self.db.get_setting('station_id')[1]
-            self.set_max_sun_zenith = float(self.db.get_setting('max_sun_zenith')[1])  # minimum sun elevation/max zenith to make measurements
-            self.set_meas_window[0] = int(self.db.get_setting('measurements_start_hour')[1])  # hours between which measurements are to be made
-            self.set_meas_window[1] = int(self.db.get_setting('measurements_stop_hour')[1])
-            self.set_keepout_heading[0] = int(self.db.get_setting('keepout_heading_low')[1])  # defines the lower heading of the keepout zone
-            self.set_keepout_heading[1] = int(self.db.get_setting('keepout_heading_high')[1])  # defines the higher heading of the keepout zone
-            self.head_true_north_offset = int(self.db.get_setting('head_true_north_offset')[1])  # head heading when at 0
-            self.radiance_angle_offset = float(self.db.get_setting('radiance_angle_offset')[1])  # radiance sensor angle to base of head
-            self.irradiance_angle_offset = float(self.db.get_setting('irradiance_angle_offset')[1])  # irradiance sensor angle to base of head
+            self.station_id = settings['station_id']
+            self.set_max_sun_zenith = float(settings['max_sun_zenith'])  # minimum sun elevation/max zenith to make measurements
+            self.set_meas_window[0] = int(settings['measurements_start_hour'])  # hours between which measurements are to be made
+            self.set_meas_window[1] = int(settings['measurements_stop_hour'])
+            self.set_keepout_heading[0] = int(settings['keepout_heading_low'])  # defines the lower heading of the keepout zone
+            self.set_keepout_heading[1] = int(settings['keepout_heading_high'])  # defines the higher heading of the keepout zone
+            self.head_true_north_offset = int(settings['head_true_north_offset'])  # head heading when at 0
+            self.radiance_angle_offset = float(settings['radiance_angle_offset'])  # radiance sensor angle to base of head
+            self.irradiance_angle_offset = float(settings['irradiance_angle_offset'])  # irradiance sensor angle to base of head
+            self.use_scan_planner = self.db.get_optional_setting('scan_planner', 0)[1] == 1  # 1 to reorder the scans (see _plan_protocol)
+            self.trios_calibrate = self.db.get_optional_setting('trios_calibrate', 0)[1] == 1  # 1 to calibrate the spectra when they are stored (see _add_rows)
             self.meas_setup_params = dict()
             self._get_batt_voltage() # added to self.meas_setup_params
-            self.meas_setup_params['gnss_lat'] = float(self.db.get_setting('gnss_lat')[1])  # {:011.7f}
-            self.meas_setup_params['gnss_lon'] = float(self.db.get_setting('gnss_lon')[1])
-            self.meas_setup_params['gnss_qual'] = int(self.db.get_setting('gnss_qual')[1])
-            self.meas_setup_params['gnss_acquired'] = self.db.get_setting('gnss_acquired')[1]
+            self.meas_setup_params['gnss_lat'] = float(settings['gnss_lat'])  # {:011.7f}
+            self.meas_setup_params['gnss_lon'] = float(settings['gnss_lon'])
+            self.meas_setup_params['gnss_qual'] = int(settings['gnss_qual'])
+            self.meas_setup_params['gnss_acquired'] = settings['gnss_acquired']
             self.meas_setup_params['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             self.meas_setup_params['setup_error'] = list()
             # the cycle_id will be the same for all 'scans' in this measurement cycle
@@ -111,8 +136,9 @@ class measurement(object):
     def _get_batt_voltage(self):
         # try to get adc_channel and adc_factor from settings. They might not be in there, if so set to None
         try:
-            adc_channel = int(self.db.get_setting('adc_channel')[1])
-            adc_factor = int(self.db.get_setting('adc_factor')[1])
+            settings = self.db.get_settings(('adc_channel', 'adc_factor'))[1]
+            adc_channel = int(settings['adc_channel'])
+            adc_factor = int(settings['adc_factor'])
         except:
             adc_channel = None
             adc_factor = None
@@ -248,7 +274,14 @@ class measurement(object):
         """
         self.head = pt.pthead()  # create instance
         self.head_needs_parking = True
-        if self.head.setup_socket() and (self.head.initialize() == 'OK'):
+        head_calibration = self.db.get_optional_setting('head_calibration', '')  # resolution and limits from an earlier initialization, allows a warm start without axis resets
+        head_calibration = head_calibration[1] if head_calibration[0] else None
+        head_telemetry_ttl = self.db.get_optional_setting('head_telemetry_ttl', pt.telemetry_ttl)  # seconds the head voltage and temperatures are reused (see pthead.get_telemetry)
+        if head_telemetry_ttl[0]:
+            self.head.telemetry_ttl = float(head_telemetry_ttl[1])
+        if self.head.setup_socket() and (self.head.initialize(calibration = head_calibration) == 'OK'):
+            if self.head.calibration() not in (None, head_calibration):  # a full initialization, the stored calibration is outdated
+                self.db.set_setting('head_calibration', self.head.calibration())
             return True
         else:
             msg = 'Issue during startup_head()'
@@ -256,66 +289,76 @@ class measurement(object):
             return False
 
     def _check_and_prep_scan(self, scan):
-        """check if correct instrument has been defined, updates sun position and sets up self.meas_scan dict
+        """check if correct instrument has been defined, updates sun position and sets up self.meas_scan dict (see _prepare_scan)
+        adds the head voltage and temperatures (cached, see pthead.get_telemetry) to self.meas_scan
         returns:
         *** True if:
         - all good
         *** False
         - invalid instrument
-        -
+        - inside of keepout zone or zenith not reachable
         """
-        if not scan['instrument'] in ('c','l','e'):
+        ok, self.meas_scan = self._prepare_scan(scan)
+        if ok:
+            self._add_head_params(self.meas_scan, self.head.get_telemetry())  # voltage and temperatures, refreshed during the moves
+        return ok
+
+    def _prepare_scan(self, scan):
+        """Returns (ok, meas_scan) with a new meas_scan dict for scan: protocol info, sun position and head target.
+        Doesn't use the head, so it can be done while the head is moving.
+        ok is False (and the reason in meas_scan['scan_error']) if:
+        - invalid instrument
+        - inside of keepout zone or zenith not reachable
+        """
+        # set up meas_scan dict
+        meas_scan = {'valid':'n'}  # create new dict with only 'valid = n'
+        meas_scan['timestamp'] = datetime.now().strftime(TIME_FORMAT)
+        meas_scan['prot_sensor'] = scan['instrument']
+        meas_scan['prot_zenith'] = scan['zenith']
+        meas_scan['prot_azimuth'] = scan['azimuth']
+        meas_scan['scan_error'] = []
+        meas_scan['cycle_scan'] = '{:02d}'.format(scan['id'])
+        meas_scan['prepared'] = time()  # not stored, see MAX_PREPARED_AGE
+
+        if not scan['instrument'] in ('c','l','e',TRIOS_BOTH):
             # incorrect instrument is given
             msg = 'Instrument {} in scan no {} is not a valid instrument choice, continuing with next'.format(scan['instrument'], scan['id'])
             self.log.warning(msg)
-            self.meas_scan['scan_error'].append(msg)
-            return False
+            meas_scan['scan_error'].append(msg)
+            return False, meas_scan
 
-        # set up meas_scan dict
-        self.meas_scan = {'valid':'n'}  # create new dict with only 'valid = n'
-        self.meas_scan['timestamp'] = datetime.now().strftime(TIME_FORMAT)
-        self.meas_scan['prot_sensor'] = scan['instrument']
-        self.meas_scan['prot_zenith'] = scan['zenith']
-        self.meas_scan['prot_azimuth'] = scan['azimuth']
-        self.meas_scan['scan_error'] = []
-        self.meas_scan['cycle_scan'] = '{:02d}'.format(scan['id'])
-        # get vitals from head
-        head_params = self.head.show_parameters()  # request parameters such as voltage and temperatures
-        self.meas_scan['head_temp_hpt'] = '{0[temp_head]:4.1f}/{0[temp_pan]:4.1f}/{0[temp_tilt]:4.1f}'.format(head_params)
-        self.meas_scan['head_voltage'] = '{:4.1f}'.format(head_params['voltage'])
         # update sun position right before measurement
         self._update_sun_position()
-        self.meas_scan['sun_elevation'] = self.sun_position['elevation']
-        self.meas_scan['sun_heading'] = self.sun_position['heading']
-        self.meas_scan["scan_heading"] = round((self.meas_scan['heading'] + scan['azimuth']) % 360, 2)
+        meas_scan['sun_elevation'] = self.sun_position['elevation']
+        meas_scan['sun_heading'] = self.sun_position['heading']
+        meas_scan["scan_heading"] = round((meas_scan['sun_heading'] + scan['azimuth']) % 360, 2)
+        meas_scan['head_heading'] = (meas_scan['scan_heading'] - self.head_true_north_offset) % 360  # heading in the head reference
 
         if not self._check_out_of_keepout(scan['azimuth']):
             msg = 'Target heading {[scan_heading]:6.2f} is inside of defined keepout zone ' \
-                    '({0[0]} to {0[1]}) with offset {2:03d} and current sun heading {[sun_heading]:6.2f}.'.format(self.set_keepout_heading, scan['azimuth'], **self.meas_scan)
+                    '({0[0]} to {0[1]}) with offset {2:03d} and current sun heading {[sun_heading]:6.2f}.'.format(self.set_keepout_heading, scan['azimuth'], **meas_scan)
             self.log.debug(msg)
-            self.meas_scan['scan_error'].append(msg)
-            return False
+            meas_scan['scan_error'].append(msg)
+            return False, meas_scan
 
-        if not self._check_zenith_valid(scan):
-            msg = 'Target zenith {[scan_zenith]:03d} is not possible with instrument {[instrument]} in current offset configuration'.format(**self.meas_scan)
-            self.meas_scan['scan_error'].append(msg)
+        if not self._check_zenith_valid(scan, meas_scan):
+            msg = 'Target zenith {[scan_zenith]:03d} is not possible with instrument {[instrument]} in current offset configuration'.format(**meas_scan)
+            meas_scan['scan_error'].append(msg)
             self.log.debug(msg)
-            return False
+            return False, meas_scan
         
-        return True
+        return True, meas_scan
 
-    def _check_zenith_valid(self,scan):
-        """ Checks if the current scan is within the tilt range of the head (-90 to +30degs from level)
-        If valid, it sets self.meas_scan['head_elevation'] to the correct angle to point the instrument to the right zenith angle
-        Returns:
-        *** True if:
-        - requested combination of instrument and zenith is within head reach (also set self.meas_scan['head_elevation'])
-        *** False if:
-        - out of reach of the head
-        """
+    def _add_head_params(self, meas_scan, head_params):
+        """Adds the head voltage and temperatures (see pthead.show_parameters) to meas_scan."""
+        meas_scan['head_temp_hpt'] = '{0[temp_head]:4.1f}/{0[temp_pan]:4.1f}/{0[temp_tilt]:4.1f}'.format(head_params)
+        meas_scan['head_voltage'] = '{:4.1f}'.format(head_params['voltage'])
+
+    def _head_elevation(self, scan):
+        """Returns the head elevation that points the instrument of scan to the zenith of scan."""
         if scan['instrument'] == 'c':
             instrument_offset = 0
-        if scan['instrument'] == 'l':
+        if scan['instrument'] in ('l', TRIOS_BOTH):  # with both sensors, the zenith is the one of the radiance sensor
             instrument_offset = self.radiance_angle_offset
         if scan['instrument'] == 'e':
             instrument_offset = self.irradiance_angle_offset
@@ -323,9 +366,62 @@ class measurement(object):
         # first compensate for instrument offset, reference is nadir (so 180degs is straight up)
         target_zenith = scan['zenith'] - instrument_offset
         # convert to head axis (0 degs is towards horizon, negative below horizon)
-        self.meas_scan['head_elevation'] = target_zenith - 90
-        # check if this is possible, if so set self.meas_scan['head_elevation'] and return True, else return False
-        if -90 <= self.meas_scan['head_elevation'] <= 30:
+        return target_zenith - 90
+
+    def _plan_protocol(self):
+        """Reorders self.protocol to minimize the travel time of the head, see scan_planner.
+        Targets are calculated for the current sun position, with the speeds and accelerations read from the head.
+        Scans that will not be measured (invalid instrument, keepout zone, zenith out of reach) are kept at the end of their group.
+        The protocol order is kept if anything goes wrong, planning is only an optimization.
+        """
+        self.predicted_move_times = dict()
+        self.actual_move_times = dict()
+        try:
+            self._update_sun_position()
+            targets = dict()
+            for scan in self.protocol:
+                elevation = self._head_elevation(scan) if scan['instrument'] in ('c','l','e',TRIOS_BOTH) else None
+                if elevation is None or not (-90 <= elevation <= 30 and self._check_out_of_keepout(scan['azimuth'])):
+                    continue
+                heading = (self.sun_position['heading'] + scan['azimuth'] - self.head_true_north_offset) % 360
+                targets[scan['id']] = scan_planner.head_positions(heading, elevation, self.head.pan_resolution, self.head.tilt_resolution)
+
+            dynamics = self.head.get_axis_dynamics()
+            position = self.head.get_position()
+            start = (position['pan_pos'], position['tilt_pos'])
+            protocol_time = scan_planner.path_time(start, [targets[i['id']] for i in self.protocol if i['id'] in targets], dynamics)
+            planned, predicted = scan_planner.plan_scans(self.protocol, targets, start, dynamics)
+        except Exception as e:
+            self.log.warning('Issue while planning the scan order, using protocol order: {}'.format(e), exc_info = True)
+            return False
+
+        self.protocol = planned
+        self.predicted_move_times = dict((scan['id'], t) for scan, t in zip(planned, predicted) if t is not None)
+        self.log.info('scan order {}, predicted move time {:.1f} s (protocol order {:.1f} s)'.format(
+            ','.join('{:02d}'.format(scan['id']) for scan in planned), sum(self.predicted_move_times.values()), protocol_time))
+        return True
+
+    def _log_move_times(self):
+        """Logs the predicted and measured move time of the head for each scan in this cycle."""
+        if len(self.predicted_move_times) == 0:
+            return
+        for scan_id in sorted(self.actual_move_times):
+            self.log.debug('scan {:02d}: move time predicted {:5.2f} s, actual {:5.2f} s'.format(
+                scan_id, self.predicted_move_times.get(scan_id, float('nan')), self.actual_move_times[scan_id]))
+        self.log.info('head move time predicted {:.1f} s, actual {:.1f} s'.format(sum(self.predicted_move_times.values()), sum(self.actual_move_times.values())))
+
+    def _check_zenith_valid(self, scan, meas_scan):
+        """ Checks if the current scan is within the tilt range of the head (-90 to +30degs from level)
+        It sets meas_scan['head_elevation'] to the correct angle to point the instrument to the right zenith angle
+        Returns:
+        *** True if:
+        - requested combination of instrument and zenith is within head reach
+        *** False if:
+        - out of reach of the head
+        """
+        meas_scan['head_elevation'] = self._head_elevation(scan)
+        # check if this is possible
+        if -90 <= meas_scan['head_elevation'] <= 30:
             return True
         else:
             return False
@@ -333,18 +429,51 @@ class measurement(object):
 
 
 
-    def _add_meas_to_db(self):
-        """ Combines available information in one dict and stores that in the measurement table
+    def _combined_meas_dict(self):
+        """ Combines available information in one dict.
         To avoid overwriting existing dicts (ie. the meas_setup_params), each time start with a blank dict.
         Then update with existing information (which may be empty dicts).
         """
-
         combined_meas_dict = dict()
         combined_meas_dict.update(self.meas_setup_params)
         combined_meas_dict.update(self.meas_scan)
         combined_meas_dict.update(self.meas_repeat)
+        return combined_meas_dict
 
-        self.db.add_meas(combined_meas_dict)  # store the "results" for reference and troubleshooting
+    def _add_meas_to_db(self):
+        """ Combines available information in one dict and stores that in the measurement table"""
+        self._store_rows([self._combined_meas_dict()])  # store the "results" for reference and troubleshooting
+
+    def _store_rows(self, rows):
+        """Stores measurement rows (dicts, see dbc.add_meas) in one transaction, or keeps them in self.pending_rows while self.defer_rows is set."""
+        if self.defer_rows:
+            self.pending_rows.extend(rows)
+        else:
+            self._add_rows(rows)
+
+    def _flush_rows(self):
+        """Stores the rows kept in self.pending_rows."""
+        rows, self.pending_rows = self.pending_rows, []
+        if len(rows) > 0:
+            self._add_rows(rows)
+
+    def _add_rows(self, rows):
+        """Adds measurement rows to the db in one transaction, and their calibrated spectra if trios_calibrate is set."""
+        ok, ids = self.db.add_meas_many(rows)
+        if ok and self.trios_calibrate:
+            store_calibrated_spectra(self.db, rows, ids)
+
+    def _park_head(self):
+        """Parks the head and stores its calibration with the parked position, allows a warm start at the next cycle."""
+        if self.head.park() == 'OK' and self.head.calibration() is not None:
+            self.db.set_setting('head_calibration', self.head.calibration())
+
+    def _store_head_telemetry(self):
+        """Stores the head voltage and temperatures queried during this cycle in the head_telemetry table."""
+        samples = self.head.pop_telemetry_samples()
+        ok, ret = self.db.add_head_telemetry(self.meas_setup_params['cycle_id'], samples)
+        if not ok:
+            self.log.warning(ret)
 
     def _take_picture(self, scan):
         """Prepares IP Cam and takes still frame
@@ -368,6 +497,7 @@ class measurement(object):
     def _measure_ramses(self, scan):
         """Takes measurements as described in scan.
         Takes into account the number of repetitions required.
+        Instrument 'b' measures irradiance and radiance at the same time, see _measure_ramses_both.
         adds errors during setup to self.meas_scan['scan_error']
         errors belonging to specific scan are added to self.meas_repeat['rep_error']
         
@@ -382,27 +512,20 @@ class measurement(object):
         # clear the self.meas_repeat dict so we don't have data from a previous scan if this fails before starting the first repetition
         self.meas_repeat = dict()
 
-        # set up correct port
-        if scan['instrument'].lower() == 'e':
-            instrument_port = '/dev/ttyO1'  # irradiance sensor on ttyO1
-        elif scan['instrument'].lower() == 'l':
-            instrument_port = '/dev/ttyO2'  # radiance sensor on ttyO2
-        
-        # perform the measurement
-        ret = trippy.trios_single(  port = instrument_port, 
-                                    int_time = TRIOS_INT_TIME, 
-                                    repeat = scan['repeat'], 
-                                    require_checkbyte = TRIOS_REQUIRE_CHECKBYTE, 
-                                    verbosity = 0, 
-                                    sleep = TRIOS_SLEEP_TIME, 
-                                    max_time = TRIOS_MAX_TIME)
+        if scan['instrument'].lower() == TRIOS_BOTH:
+            return self._measure_ramses_both(scan)
+
+        # perform the measurement, on the connection that is kept open for the cycle
+        ret = self._trios_session(scan['instrument'].lower()).measure(int_time = TRIOS_INT_TIME, repeat = scan['repeat'], 
+                                                                      int_key = (scan['zenith'], scan['azimuth']))
 
         # check if init of the instrument went ok
         if ret[0]:  # error during initialization of port or instrument
                     self.meas_scan["scan_error"].append(ret[1])  # store error info
                     return False
 
-        # store measurement data from all repetitions to db
+        # store measurement data from all repetitions to db, in one transaction
+        rows = []
         for rep in range(len(ret[1])):
                     self.meas_scan['valid'] = 'n'
                     self.meas_repeat['rep_unix'] = ret[1][rep][2]
@@ -410,13 +533,154 @@ class measurement(object):
                     self.meas_repeat['rep_error'] = ret[1][rep][0]
                     self.meas_repeat['rep_serial'] = ret[1][rep][1]
                     self.meas_repeat['data'] = ret[1][rep][3]
+                    self.meas_repeat['rep_int_time'] = trippy.trios_int_time_ms(getattr(ret[1][rep][3], 'int_time', None))  # reported by the SAM with the trios auto integration
                     if ret[1][rep][0] == '': 
                         self.meas_scan['valid'] = 'y'
-                    self._add_meas_to_db()
+                    rows.append(self._combined_meas_dict())
                     # The next measurement could be a camera still. 
                     # If we don't empty the self.meas_repeat dict, it will be saved as part of the camera meas data.
                     self.meas_repeat = dict()  
+        self._store_rows(rows)
+        return True
+
+    def _trios_session(self, sensor):
+        """Returns the TriosSession of sensor ('e' or 'l').
+        The serial port and the sensor identity are kept for the whole measurement cycle, see _close_trios_sessions.
+        """
+        if sensor not in self.trios_sessions:
+            if TRIOS_CAPTURE_FILE and (self.trios_recorder is None):
+                self.trios_recorder = trippy.TriosRecorder(TRIOS_CAPTURE_FILE)
+            self.trios_sessions[sensor] = trippy.TriosSession(  port = TRIOS_PORTS[sensor], 
+                                                                require_checkbyte = TRIOS_REQUIRE_CHECKBYTE, 
+                                                                verbosity = 0, 
+                                                                sleep = TRIOS_SLEEP_TIME, 
+                                                                max_time = TRIOS_MAX_TIME, 
+                                                                recorder = self.trios_recorder)
+            # the auto integration (TRIOS_INT_TIME = -1) starts from the integration time of the same geometry in the previous cycle
+            self.trios_sessions[sensor].int_history = self.trios_int_history.setdefault(sensor, dict())
+        return self.trios_sessions[sensor]
+
+    def _close_trios_sessions(self):
+        for session in self.trios_sessions.values():
+            session.close()
+        self.trios_sessions = dict()
+        if self.trios_recorder is not None:
+            self.trios_recorder.close()
+            self.trios_recorder = None
+
+    def _measure_ramses_both(self, scan):
+        """Takes irradiance and radiance measurements at the same time, with one trigger for both sensors.
+        Each repetition is stored as two rows (prot_sensor 'e' and 'l'), linked by cycle_id, cycle_scan, scan_rep and rep_unix (the trigger time).
+        The head points the radiance sensor to the protocol zenith (see _head_elevation). The 'e' rows store the geometry of the
+        irradiance sensor in that head position: prot_zenith shifted by irradiance_angle_offset - radiance_angle_offset, same prot_azimuth.
+        Returns True/False as _measure_ramses.
+        """
+        sensors = ('e', 'l')
+        zeniths = {'l': scan['zenith'], 
+                   'e': int(round(scan['zenith'] - self.radiance_angle_offset + self.irradiance_angle_offset))}
+        ret = trippy.trios_multi(   ports = [self._trios_session(i) for i in sensors], 
+                                    int_time = TRIOS_INT_TIME, 
+                                    repeat = scan['repeat'], 
+                                    require_checkbyte = TRIOS_REQUIRE_CHECKBYTE, 
+                                    verbosity = 0, 
+                                    sleep = TRIOS_SLEEP_TIME, 
+                                    max_time = TRIOS_MAX_TIME)
 
+        # check if init of the instruments went ok
+        if ret[0]:
+            self.meas_scan["scan_error"].append(ret[1])
+            return False
+
+        # store measurement data from all repetitions to db, in one transaction
+        rows = []
+        for rep in range(len(ret[1])):
+            for sensor, result in zip(sensors, ret[1][rep]):
+                self.meas_scan['prot_sensor'] = sensor
+                self.meas_scan['prot_zenith'] = zeniths[sensor]
+                self.meas_scan['valid'] = 'y' if result[0] == '' else 'n'
+                self.meas_repeat = {'rep_unix': result[2], 'scan_rep': rep + 1, 'rep_error': result[0], 
+                                    'rep_serial': result[1], 'data': result[3], 
+                                    'rep_int_time': trippy.trios_int_time_ms(getattr(result[3], 'int_time', None))}
+                rows.append(self._combined_meas_dict())
+        self.meas_scan['prot_sensor'] = TRIOS_BOTH
+        self.meas_scan['prot_zenith'] = scan['zenith']
+        self.meas_repeat = dict()
+        self._store_rows(rows)
+        return True
+
+
+    def _measure_scan(self, scan):
+        """Takes the picture or (ir)radiance measurement of scan, with the head in position, and stores the results."""
+        if scan['instrument'].lower() == 'c':
+            if self._take_picture(scan) and len(self.meas_scan['scan_error']) == 0:
+                self.meas_scan['valid'] = 'y'
+            self._add_meas_to_db()
+
+        if scan['instrument'].lower() in ('l', 'e', TRIOS_BOTH):
+            # radiance or irradiance measurement, or both at the same time
+            # measurements are stored after each repeated meas is deconstructed, unless something went wrong
+            # in that case make sure the measurement is set to not valid and logged for reference
+            if not self._measure_ramses(scan):
+                # returned from function before last measurement was unsuccesful
+                self.meas_scan['valid'] = 'n'
+                self._add_meas_to_db()
+
+    def _head_step(self, meas_scan):
+        """Runs on the head thread: moves the head to the target of meas_scan, then gets the head voltage and temperatures
+        (cached, move_position refreshes them during the move when expired).
+        Returns (head parameters, reply of move_position, move time in s).
+        """
+        move_start = time()
+        ret = self.head.move_position(meas_scan['head_heading'], meas_scan['head_elevation'])
+        move_time = time() - move_start
+        return self.head.get_telemetry(), ret, move_time
+
+    def _run_protocol_pipelined(self):
+        """Performs the scans in self.protocol, overlapping the head movement with the work that doesn't need the head.
+        The head is only used from its own thread (device_worker) during the protocol. While it moves to scan N:
+        - the rows of scan N-1 are stored (rows are collected in self.pending_rows during a scan)
+        - scan N+1 is prepared (sun position, keepout zone, zenith, see _prepare_scan)
+        The head voltage and temperatures are the cached telemetry, as in the serial loop.
+        """
+        head_thread = device_worker(name = 'pan_tilt_head')
+        self.defer_rows = True
+        try:
+            prepared = self._prepare_scan(self.protocol[0]) if len(self.protocol) > 0 else None
+            for index, scan in enumerate(self.protocol):
+                self.log.debug("scan {id:02d}/instr {instrument}/zen {zenith:03d}/azi {azimuth:03d}/rpt {repeat:02d}/wait {wait:02d}".format(**scan))
+                ok, self.meas_scan = prepared
+                next_scan = self.protocol[index + 1] if index + 1 < len(self.protocol) else None
+                if ok and int(scan['wait']) > 0:  # wait defined in the protocol
+                    self._flush_rows()
+                    sleep(int(scan['wait']))
+                if ok and time() - self.meas_scan['prepared'] > MAX_PREPARED_AGE:
+                    ok, self.meas_scan = self._prepare_scan(scan)
+                if not ok:
+                    # scan has invalid instr, is inside of keepout zone or target zenith not reacheable in current config
+                    # log anyway to document full measurement cycle
+                    self._add_meas_to_db()
+                    prepared = self._prepare_scan(next_scan) if next_scan else None
+                    continue
+
+                head_step = head_thread.submit(self._head_step, self.meas_scan)
+
+                # while the head moves
+                self._flush_rows()
+                prepared = self._prepare_scan(next_scan) if next_scan else None
+
+                head_params, ret, self.actual_move_times[scan['id']] = head_step.result()
+                self._add_head_params(self.meas_scan, head_params)
+                if not ret == 'OK':
+                    self.meas_scan['scan_error'].append(ret)
+                    self._add_meas_to_db()
+                    continue
+
+                self._measure_scan(scan)
+
+        finally:
+            head_thread.close()
+            self.defer_rows = False
+            self._flush_rows()
 
     def measure(self, taskid = 666):
         """The high level/main function.
@@ -480,7 +744,7 @@ class measurement(object):
         finally:
             if not self.init_done:
                 if self.head_needs_parking:
-                    self.head.park()
+                    self._park_head()
                 self._power_off((INTERCOAX, PAN_TILT, MULTIPLEXER, TOP_BOX))
                 if self.add_to_db:
                     # something went wrong during the init, but after enough info has been gathered to store in db
@@ -494,6 +758,14 @@ class measurement(object):
             if not self.init_done:
                 return False
 
+            if self.use_scan_planner:
+                self._plan_protocol()
+
+            if HEAD_PIPELINE:
+                self._run_protocol_pipelined()
+                self._log_move_times()
+                return True
+
             for scan in self.protocol:  # iterate over the list of scans, and perform them one by one
 
                 self.log.debug("scan {id:02d}/instr {instrument}/zen {zenith:03d}/azi {azimuth:03d}/rpt {repeat:02d}/wait {wait:02d}".format(**scan))
@@ -508,28 +780,17 @@ class measurement(object):
                     sleep(int(scan['wait']))
 
                 # position the head
-                ret = self.head.move_position(self.meas_scan['scan_heading'], self.meas_scan['head_elevation'])
+                move_start = time()
+                ret = self.head.move_position(self.meas_scan['head_heading'], self.meas_scan['head_elevation'])
+                self.actual_move_times[scan['id']] = time() - move_start
                 if not ret == 'OK':
                     self.meas_scan['scan_error'].append(ret)
                     self._add_meas_to_db()
                     continue
 
-                if scan['instrument'].lower() == 'c':
-                    if self._take_picture(scan) and len(self.meas_scan['scan_error']) == 0:
-                        self.meas_scan['valid'] = 'y'
-                    self._add_meas_to_db()
-
-                if scan['instrument'].lower() in ('l', 'e'):
-                    # radiance or irradiance measurement
-                    # measurements are stored after each repeated meas is deconstructed, unless something went wrong
-                    # in that case make sure the measurement is set to not valid and logged for reference
-                    if not self._measure_ramses(scan):
-                        # returned from function before last measurement was unsuccesful
-                        self.meas_scan['valid'] = 'n'
-                        self._add_meas_to_db()
-
-                continue
+                self._measure_scan(scan)
 
+            self._log_move_times()
             return True
 
         except Exception as e:
@@ -537,5 +798,7 @@ class measurement(object):
             return False
         
         finally:
-            self.head.park()
+            self._close_trios_sessions()
+            self._park_head()
+            self._store_head_telemetry()
             self._power_off((INTERCOAX, PAN_TILT, MULTIPLEXER, TOP_BOX))
\ No newline at end of file
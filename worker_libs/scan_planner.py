@@ -0,0 +1,125 @@
+#! /usr/bin/python
+# coding: utf-8
+"""Orders the scans of a measurement protocol to minimize the pan/tilt travel time.
+
+Project: Hypermaq
+
+The head moves both axes at the same time (PP and TP, then A), so the time of a move is the time of the slowest axis.
+Each axis accelerates to its speed and decelerates to standstill (trapezoidal profile, or triangular for short moves).
+The pan axis does not wrap around (pan limits are +/- 174 degrees), so the travel is the difference in positions.
+
+Scans are only reordered within their ordering group, groups keep the protocol order.
+A scan with a wait stays in its place: the scans before it form a group, the scans after it the next one.
+If the scans have a 'group' key, a change of its value also starts a new group.
+"""
+from itertools import permutations
+
+"""Define constants."""
+EXACT_MAX_SCANS = 6  # groups up to this size are solved exactly (all orders), larger groups by nearest neighbour + 2-opt
+
+
+"""Functions."""
+def move_time(distance, speed, acceleration):
+    """Returns the time (s) to move distance positions from and to standstill, with speed in positions/s and acceleration in positions/s^2."""
+    distance = abs(distance)
+    if distance == 0:
+        return 0.
+    if distance <= float(speed) ** 2 / acceleration:  # speed is never reached
+        return 2 * (float(distance) / acceleration) ** 0.5
+    return float(distance) / speed + float(speed) / acceleration
+
+
+def head_positions(heading, elevation, pan_resolution, tilt_resolution):
+    """Returns (pan position, tilt position) for heading (0 <= x < 360) and elevation, the way pthead.move_position converts them."""
+    if 180 <= heading <= 360:
+        heading = heading - 360
+    return (int(float(heading) / pan_resolution), int(float(elevation) / tilt_resolution))
+
+
+def pan_tilt_move_time(start, target, dynamics):
+    """Returns the time (s) to move from start to target (pan position, tilt position), see pthead.get_axis_dynamics for dynamics."""
+    return max(move_time(target[0] - start[0], dynamics['pan_speed'], dynamics['pan_acceleration']),
+               move_time(target[1] - start[1], dynamics['tilt_speed'], dynamics['tilt_acceleration']))
+
+
+def path_time(start, targets, dynamics):
+    """Returns the total move time (s) from start along the list of targets."""
+    total = 0.
+    for target in targets:
+        total += pan_tilt_move_time(start, target, dynamics)
+        start = target
+    return total
+
+
+def ordering_groups(scans):
+    """Splits scans in a list of groups (lists of scans) that can be reordered, keeping the protocol order of the groups."""
+    groups = [[]]
+    for scan in scans:
+        if int(scan.get('wait', 0)) > 0:  # the wait is done right before this scan, keep it in place
+            groups.extend([[scan], []])
+            continue
+        if len(groups[-1]) > 0 and groups[-1][-1].get('group') != scan.get('group'):
+            groups.append([])
+        groups[-1].append(scan)
+    return [group for group in groups if len(group) > 0]
+
+
+def _order_exact(start, targets, dynamics):
+    """Returns the indexes of targets in the fastest order, trying all orders."""
+    return list(min(permutations(range(len(targets))), key=lambda order: path_time(start, [targets[i] for i in order], dynamics)))
+
+
+def _order_nearest(start, targets, dynamics):
+    """Returns the indexes of targets ordered by nearest neighbour, improved by 2-opt (reversing parts of the path) until no reversal helps."""
+    order = []
+    remaining = list(range(len(targets)))
+    position = start
+    while remaining:
+        nearest = min(remaining, key=lambda i: pan_tilt_move_time(position, targets[i], dynamics))
+        remaining.remove(nearest)
+        order.append(nearest)
+        position = targets[nearest]
+
+    best = path_time(start, [targets[i] for i in order], dynamics)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                candidate_time = path_time(start, [targets[k] for k in candidate], dynamics)
+                if candidate_time < best - 1e-9:
+                    order, best, improved = candidate, candidate_time, True
+    return order
+
+
+def plan_scans(scans, targets, start, dynamics):
+    """Orders scans to minimize the total move time of the head.
+
+    scans: list of protocol scan dicts (see dbc.get_protocol), in protocol order
+    targets: dict {scan id: (pan position, tilt position)}, None (or missing) for scans the head will not move for (eg in the keepout zone)
+    start: (pan position, tilt position) of the head
+    dynamics: dict with pan_speed, tilt_speed (positions/s), pan_acceleration, tilt_acceleration (positions/s^2)
+
+    Scans without target are kept at the end of their group.
+    Returns (list of scans in planned order, list of predicted move times (s) in the same order, None for scans without target).
+    """
+    ordered = []
+    predicted = []
+    position = start
+    for group in ordering_groups(scans):
+        moving = [scan for scan in group if targets.get(scan['id']) is not None]
+        moving_targets = [targets[scan['id']] for scan in moving]
+        if len(moving) <= EXACT_MAX_SCANS:
+            order = _order_exact(position, moving_targets, dynamics)
+        else:
+            order = _order_nearest(position, moving_targets, dynamics)
+        for i in order:
+            predicted.append(pan_tilt_move_time(position, moving_targets[i], dynamics))
+            ordered.append(moving[i])
+            position = moving_targets[i]
+        for scan in group:
+            if targets.get(scan['id']) is None:
+                ordered.append(scan)
+                predicted.append(None)
+    return ordered, predicted